@@ -0,0 +1,318 @@
+"""Medições de desempenho do PMOC.
+
+Gera frotas sintéticas (com semente fixa) no mesmo esquema de pmoc.csv e mede
+os caminhos mais usados do app. Os resultados podem ser gravados em JSON e
+comparados entre versões:
+
+    python benchmark_pmoc.py --rows 41 10000 100000 --output antes.json
+    python benchmark_pmoc.py --rows 41 10000 100000 --output depois.json
+    python benchmark_pmoc.py --compare antes.json depois.json
+
+Para medir apenas algumas áreas: ``python benchmark_pmoc.py pdf schema --rows 10000``.
+"""
+import argparse
+import io
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import pmoc
+from fake_github import FakeGitHubServer
+from fake_sheets import FakeSheetsClient
+
+BASE_CSV = Path(__file__).with_name("pmoc.csv")
+
+
+def make_fleet(rows, seed=42):
+    """Gera uma frota sintética com o mesmo esquema de pmoc.csv"""
+    base = pd.read_csv(BASE_CSV, keep_default_na=False)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base), rows)
+    fleet = base.iloc[picks].reset_index(drop=True)
+    fleet['TAG'] = np.arange(1, rows + 1)
+    days_ago = rng.integers(0, 400, rows)
+    service = pd.Timestamp.now().normalize() - pd.to_timedelta(days_ago, unit='D')
+    service = pd.Series(service)
+    next_due = service + pd.Timedelta(days=pmoc.MAINTENANCE_INTERVAL_DAYS)
+    never = rng.random(rows) < 0.1
+    fleet['Data Manutenção'] = pmoc.format_br_dates(service).where(~never, '')
+    fleet['Próxima manutenção'] = pmoc.format_br_dates(next_due).where(~never, '')
+    return fleet
+
+
+def timed(fn, repeat=3):
+    """Menor tempo de `repeat` execuções, em segundos"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_due(rows, seed=42):
+    """Cálculo de próxima manutenção e contagem de atrasos da página de consulta"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    seconds, counts = timed(lambda: pmoc.maintenance_status_counts(pmoc.compute_maintenance_schedule(fleet)))
+    return {"seconds": round(seconds, 4), "overdue": counts[pmoc.STATUS_OVERDUE]}
+
+
+def bench_filters(rows, seed=42):
+    """Cadeia de filtros Local/Setor/Marca da página de consulta"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    # Combinação que existe na frota, para o filtro não terminar vazio
+    local, setor, marca = fleet.loc[0, ['Local', 'Setor', 'Marca']]
+    seconds, filtered = timed(lambda: pmoc.filter_devices(fleet, local, setor, marca))
+    return {"seconds": round(seconds, 4), "matches": len(filtered)}
+
+
+def bench_pdf(rows, seed=42):
+    """Mede páginas por segundo e pico de memória da geração do relatório PDF"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    title = f"Relatório Completo de Aparelhos ({rows} itens)"
+    # O app só importa o fpdf2 na primeira geração; a importação fica fora da medição
+    pmoc.build_pdf_report(fleet.head(1), title)
+    start = time.perf_counter()
+    pdf = pmoc.build_pdf_report(fleet, title)
+    output = pdf.output()
+    elapsed = time.perf_counter() - start
+    # O tracemalloc deixa a geração bem mais lenta; a memória é medida numa segunda execução
+    tracemalloc.start()
+    pmoc.build_pdf_report(fleet, title).output()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "pages": pdf.pages_count,
+        "seconds": round(elapsed, 4),
+        "pages_per_second": round(pdf.pages_count / elapsed, 1),
+        "peak_memory_mb": round(peak / 2**20, 2),
+        "pdf_bytes": len(output),
+    }
+
+
+def bench_export(rows, seed=42):
+    """Exportação da visão filtrada da consulta, em cada formato gravado em blocos"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    positions = np.arange(len(fleet))
+    result = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ("csv", "csv.gz", "parquet"):
+            target = str(Path(directory) / f"export.{extension}")
+            seconds, _ = timed(lambda: pmoc.write_export(fleet, positions, extension, target))
+            name = extension.replace(".", "_")
+            result[f"{name}_seconds"] = round(seconds, 4)
+            result[f"{name}_bytes"] = Path(target).stat().st_size
+    return result
+
+
+def bench_schema(rows, seed=42):
+    """Compara memória e tempo de leitura do quadro tipado com o quadro de objetos antigo"""
+    csv_text = make_fleet(rows, seed).to_csv(index=False)
+
+    def read_object():
+        frame = pd.read_csv(io.StringIO(csv_text))
+        frame['BTU'] = frame['BTU'].astype(str)
+        return frame
+
+    object_seconds, object_frame = timed(read_object)
+    typed_seconds, typed_frame = timed(lambda: pmoc.read_devices_csv(io.StringIO(csv_text)))
+    object_due, _ = timed(lambda: pmoc.compute_maintenance_schedule(object_frame))
+    typed_due, _ = timed(lambda: pmoc.compute_maintenance_schedule(typed_frame))
+    object_mb = object_frame.memory_usage(deep=True).sum() / 2**20
+    typed_mb = typed_frame.memory_usage(deep=True).sum() / 2**20
+    return {
+        "object_memory_mb": round(object_mb, 2),
+        "typed_memory_mb": round(typed_mb, 2),
+        "memory_ratio": round(object_mb / typed_mb, 1),
+        "object_parse_seconds": round(object_seconds, 4),
+        "typed_parse_seconds": round(typed_seconds, 4),
+        "object_due_seconds": round(object_due, 4),
+        "typed_due_seconds": round(typed_due, 4),
+    }
+
+
+def bench_github(rows, seed=42):
+    """Leitura e gravação via API de conteúdos, contra o servidor simulado local"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    server = FakeGitHubServer().start()
+    cache_dir = tempfile.mkdtemp()
+    original = (pmoc.GITHUB_API_URL, pmoc.CACHE_DIR)
+    pmoc.GITHUB_API_URL, pmoc.CACHE_DIR = server.url, cache_dir
+    try:
+        save_seconds, _ = timed(lambda: pmoc.push_to_github(pmoc.REPO, pmoc.FILE_PATH, fleet, "token"))
+
+        def cold_load():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            pmoc.get_shared_state("github_frames").clear()
+            return pmoc.fetch_github_frame(pmoc.REPO, pmoc.FILE_PATH, "token")
+
+        cold_seconds, loaded = timed(cold_load)
+        warm_seconds, _ = timed(lambda: pmoc.fetch_github_frame(pmoc.REPO, pmoc.FILE_PATH, "token"))
+        assert len(loaded) == rows
+        return {
+            "save_seconds": round(save_seconds, 4),
+            "cold_load_seconds": round(cold_seconds, 4),
+            "warm_load_seconds": round(warm_seconds, 4),
+            "payload_bytes": len(server.get_file(pmoc.REPO, pmoc.FILE_PATH).encode("utf-8")),
+            "not_modified_responses": server.count("GET", 304),
+        }
+    finally:
+        pmoc.GITHUB_API_URL, pmoc.CACHE_DIR = original
+        pmoc.get_shared_state("github_frames").clear()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        server.stop()
+
+
+def bench_sheets(rows, seed=42):
+    """Google Sheets simulado: carga inicial, leitura e gravação de uma alteração (só a linha alterada)"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    client = FakeSheetsClient()
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    initial_seconds, _ = timed(lambda: storage.save(fleet, "credencial"), repeat=1)
+    load_seconds, loaded = timed(lambda: storage.load("credencial"))
+    assert len(loaded) == rows
+    fleet.loc[fleet.index[rows // 2], 'Observações'] = "Alterado pela medição"
+    client.reset()
+    edit_seconds, _ = timed(lambda: storage.save(fleet, "credencial"), repeat=1)
+    return {
+        "initial_save_seconds": round(initial_seconds, 4),
+        "load_seconds": round(load_seconds, 4),
+        "edit_save_seconds": round(edit_seconds, 4),
+        "edit_requests": client.count(),
+        "edit_cells_written": client.cells_written(),
+    }
+
+
+def bench_plan(rows, seed=42):
+    """Calendário de um ano com distribuição entre dois técnicos (página de planejamento)"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    today = pd.Timestamp.now().normalize()
+    seconds, plan = timed(lambda: pmoc.build_maintenance_plan(
+        fleet, today, 365, ["Guilherme", "Ismael"], 6, btu_intervals={"30000": 120}))
+    weekly_seconds, _ = timed(lambda: pmoc.weekly_workload(plan))
+    return {"seconds": round(seconds, 4), "weekly_seconds": round(weekly_seconds, 4), "occurrences": len(plan)}
+
+
+def bench_dashboard(rows, seed=42):
+    """Agregados do painel: carga completa, alteração de 100 aparelhos e leitura das quatro dimensões"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    with tempfile.TemporaryDirectory() as directory:
+        store = pmoc.LocalStore(str(Path(directory) / "pmoc.db"))
+        replace_seconds, _ = timed(lambda: store.replace_all(fleet), repeat=1)
+        labels = fleet.index[:100]
+        fleet.loc[labels, 'Data Manutenção'] = pd.Timestamp.now().normalize()
+        update_seconds, _ = timed(lambda: store.apply_changes(fleet, labels, []), repeat=1)
+        query_seconds, _ = timed(lambda: [store.rollups(dimension) for dimension in pmoc.ROLLUP_DIMENSIONS])
+        rollup_rows = store.conn.execute("SELECT COUNT(*) FROM fleet_rollups").fetchone()[0]
+        store.conn.close()
+    return {
+        "replace_seconds": round(replace_seconds, 4),
+        "update_seconds": round(update_seconds, 4),
+        "query_seconds": round(query_seconds, 4),
+        "rollup_rows": rollup_rows,
+    }
+
+
+def bench_search(rows, seed=42):
+    """Busca textual pelo índice da base local: termo comum, código parcial e dois termos"""
+    fleet = pmoc.to_typed(make_fleet(rows, seed))
+    with tempfile.TemporaryDirectory() as directory:
+        store = pmoc.LocalStore(str(Path(directory) / "pmoc.db"))
+        store.replace_all(fleet)
+        result = {}
+        for name, text in (("word", "reuniao"), ("prefix", "GWC24"), ("two_terms", "gree gwc24")):
+            seconds, tags = timed(lambda: store.search(text))
+            result[f"{name}_seconds"] = round(seconds, 4)
+            result[f"{name}_matches"] = len(tags)
+        store.conn.close()
+    return result
+
+
+BENCHMARKS = {
+    "due": bench_due,
+    "filters": bench_filters,
+    "pdf": bench_pdf,
+    "export": bench_export,
+    "schema": bench_schema,
+    "github": bench_github,
+    "sheets": bench_sheets,
+    "plan": bench_plan,
+    "dashboard": bench_dashboard,
+    "search": bench_search,
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def run(targets, sizes, seed=42, pdf_max_rows=10000):
+    results = []
+    for target in targets:
+        for rows in sizes:
+            if target == "pdf" and rows > pdf_max_rows:
+                continue
+            result = {"benchmark": target, "rows": rows, **BENCHMARKS[target](rows, seed)}
+            print(json.dumps(result, ensure_ascii=False))
+            results.append(result)
+    return {"environment": environment(), "seed": seed, "results": results}
+
+
+def compare(before_path, after_path):
+    """Mostra a razão depois/antes de cada métrica de tempo (acima de 1 = mais lento)"""
+    with open(before_path) as f:
+        before = {(r["benchmark"], r["rows"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = {(r["benchmark"], r["rows"]): r for r in json.load(f)["results"]}
+    for key in sorted(before.keys() & after.keys()):
+        for metric, value in after[key].items():
+            if metric.endswith("seconds") and before[key].get(metric):
+                ratio = value / before[key][metric]
+                flag = "  <-- regressão" if ratio > 1.2 else ""
+                print(f"{key[0]:>8} {key[1]:>8} {metric:<22} {before[key][metric]:>9.4f} -> "
+                      f"{value:>9.4f} ({ratio:.2f}x){flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", help=f"áreas a medir: {', '.join(BENCHMARKS)} (padrão: todas)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[41, 1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pdf-max-rows", type=int, default=10000,
+                        help="o PDF não é medido acima deste tamanho de frota")
+    parser.add_argument("--output", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="compara dois arquivos JSON de resultados")
+    args = parser.parse_args()
+    unknown = [target for target in args.targets if target not in BENCHMARKS]
+    if unknown:
+        parser.error(f"área desconhecida: {', '.join(unknown)}")
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args.targets or list(BENCHMARKS), args.rows, args.seed, args.pdf_max_rows)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,109 @@
+"""Verifica o orçamento de partida do PMOC.
+
+Mede, em processos novos, o tempo de importação de pmoc.py e da primeira
+renderização da página de Consulta, e confere que as dependências pesadas
+(PDF, planilhas, Parquet, Google Sheets) não são carregadas nesse caminho.
+Termina com código 1 se algum limite for ultrapassado:
+
+    python check_startup.py
+    python check_startup.py --import-budget 1.5 --render-budget 4 --runs 5
+
+Os mesmos limites são conferidos por tests/test_startup.py.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+IMPORT_BUDGET_SECONDS = 1.2
+RENDER_BUDGET_SECONDS = 3.0
+
+# Módulos que só devem ser importados quando o recurso correspondente é usado
+DEFERRED_MODULES = [
+    "fpdf", "openpyxl", "pyarrow.parquet", "gspread",
+]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import pmoc
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+RENDER_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file(%r, default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "errors": [str(e.value) for e in at.exception] + [e.value for e in at.error],
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (str(ROOT / "pmoc.py"), DEFERRED_MODULES)
+
+
+def probe(code, env):
+    """Executa o código num interpretador novo e retorna o JSON impresso"""
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs):
+    with tempfile.TemporaryDirectory() as directory:
+        # Base local e cache isolados; sem token, nada é buscado na rede
+        env = dict(os.environ, PMOC_DB=os.path.join(directory, "pmoc.db"),
+                   PMOC_CACHE_DIR=os.path.join(directory, "cache"))
+        env.pop("PMOC_GITHUB_TOKEN", None)
+        imports = [probe(IMPORT_PROBE, env) for _ in range(runs)]
+        # A primeira execução cria a base local; as seguintes medem a partida normal
+        probe(RENDER_PROBE, env)
+        renders = [probe(RENDER_PROBE, env) for _ in range(runs)]
+    return {
+        "import_seconds": round(statistics.median(r["seconds"] for r in imports), 3),
+        "render_seconds": round(statistics.median(r["seconds"] for r in renders), 3),
+        "loaded_on_import": sorted({m for r in imports for m in r["loaded"]}),
+        "loaded_on_render": sorted({m for r in renders for m in r["loaded"]}),
+        "render_errors": sorted({e for r in renders for e in r["errors"]}),
+    }
+
+
+def budget_failures(result, import_budget=IMPORT_BUDGET_SECONDS, render_budget=RENDER_BUDGET_SECONDS):
+    """Lista os limites ultrapassados na medição"""
+    failures = []
+    if result["import_seconds"] > import_budget:
+        failures.append(f"importação em {result['import_seconds']} s (limite {import_budget} s)")
+    if result["render_seconds"] > render_budget:
+        failures.append(f"primeira renderização em {result['render_seconds']} s (limite {render_budget} s)")
+    for stage in ("import", "render"):
+        if result[f"loaded_on_{stage}"]:
+            failures.append(f"módulos adiados carregados na partida: {', '.join(result[f'loaded_on_{stage}'])}")
+    if result["render_errors"]:
+        failures.append(f"erros na renderização: {'; '.join(result['render_errors'])}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_SECONDS,
+                        help="limite da mediana do tempo de importação, em segundos")
+    parser.add_argument("--render-budget", type=float, default=RENDER_BUDGET_SECONDS,
+                        help="limite da mediana da primeira renderização, em segundos")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    failures = budget_failures(result, args.import_budget, args.render_budget)
+    for failure in failures:
+        print(f"FALHA: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,178 @@
+"""Servidor HTTP local que imita a API de conteúdos do GitHub.
+
+Usado para testes e medições sem acessar a rede:
+
+    server = FakeGitHubServer()
+    server.start()
+    os.environ["PMOC_GITHUB_API_URL"] = server.url  # antes de importar pmoc
+    ...
+    server.stop()
+
+Também pode ser executado diretamente: ``python fake_github.py --port 8765``.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENTS_PATH = re.compile(r"^/repos/([^/]+/[^/]+)/contents/(.+)$")
+
+
+def blob_sha(content):
+    """Calcula o SHA do blob da mesma forma que o git"""
+    header = f"blob {len(content)}\0".encode("utf-8")
+    return hashlib.sha1(header + content).hexdigest()
+
+
+class FakeGitHubServer:
+    """Armazena arquivos em memória e responde GET/PUT como a API de conteúdos"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.files = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.fail_next = []
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def put_file(self, repo, file_path, text):
+        """Grava um arquivo diretamente no repositório simulado"""
+        content = text.encode("utf-8")
+        with self.lock:
+            self.files[(repo, file_path)] = content
+        return blob_sha(content)
+
+    def get_file(self, repo, file_path):
+        with self.lock:
+            content = self.files.get((repo, file_path))
+        return content.decode("utf-8") if content is not None else None
+
+    def count(self, method=None, status=None):
+        """Conta as requisições recebidas, opcionalmente por método e status"""
+        with self.lock:
+            return sum(
+                1 for m, _, s in self.requests
+                if (method is None or m == method) and (status is None or s == status)
+            )
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                # Registrada antes da resposta: quem recebe a resposta já a vê em `count`
+                with server.lock:
+                    server.requests.append((self.command, self.path, status))
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if body is not None:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if payload:
+                    self.wfile.write(payload)
+
+            def _injected_failure(self):
+                with server.lock:
+                    if not server.fail_next:
+                        return False
+                    status, headers = server.fail_next.pop(0)
+                self._send(status, {"message": "falha simulada"}, headers)
+                return True
+
+            def _target(self):
+                match = CONTENTS_PATH.match(self.path.split("?")[0])
+                if not match:
+                    self._send(404, {"message": "Not Found"})
+                    return None
+                return match.group(1), match.group(2)
+
+            def do_GET(self):
+                if self._injected_failure():
+                    return
+                target = self._target()
+                if target is None:
+                    return
+                with server.lock:
+                    content = server.files.get(target)
+                if content is None:
+                    self._send(404, {"message": "Not Found"})
+                    return
+                sha = blob_sha(content)
+                etag = f'"{sha}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, headers={"ETag": etag})
+                    return
+                self._send(200, {
+                    "name": target[1].rsplit("/", 1)[-1],
+                    "path": target[1],
+                    "sha": sha,
+                    "size": len(content),
+                    "encoding": "base64",
+                    "content": base64.b64encode(content).decode("ascii"),
+                }, {"ETag": etag})
+
+            def do_PUT(self):
+                # O corpo é lido antes de qualquer resposta para não sobrar na conexão reaproveitada
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self._injected_failure():
+                    return
+                target = self._target()
+                if target is None:
+                    return
+                with server.lock:
+                    current = server.files.get(target)
+                    current_sha = blob_sha(current) if current is not None else None
+                    if current is not None and body.get("sha") != current_sha:
+                        conflict = True
+                    else:
+                        conflict = False
+                        content = base64.b64decode(body.get("content", ""))
+                        server.files[target] = content
+                if conflict:
+                    self._send(409, {"message": f"{target[1]} does not match {body.get('sha')}"})
+                    return
+                self._send(201 if current is None else 200, {
+                    "content": {"path": target[1], "sha": blob_sha(content)},
+                    "commit": {"message": body.get("message", "")},
+                })
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API de conteúdos do GitHub simulada")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", help="CSV inicial publicado como vilelarobson0971/pmoc/pmoc.csv")
+    args = parser.parse_args()
+    fake = FakeGitHubServer(port=args.port)
+    if args.seed:
+        with open(args.seed, encoding="utf-8") as f:
+            fake.put_file("vilelarobson0971/pmoc", "pmoc.csv", f.read())
+    print(f"Servidor simulado em {fake.url}")
+    fake.httpd.serve_forever()
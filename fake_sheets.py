@@ -0,0 +1,175 @@
+"""Google Sheets simulado em memória, com a parte da API do gspread usada pelo PMOC.
+
+Usado para testes e medições sem acessar a rede:
+
+    client = FakeSheetsClient()
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    storage.save(data, "credencial")
+    client.count("batch_update")  # requisições por método
+    client.cells_written()        # células enviadas pelas gravações
+
+Cada chamada equivale a uma requisição à API do Sheets. As células guardam
+texto, como numa gravação com value_input_option="RAW".
+"""
+import re
+import threading
+
+A1_RANGE = re.compile(r"^([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?$")
+
+
+def column_index(letters):
+    """'A' -> 0, 'K' -> 10, 'AA' -> 26"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+class FakeWorksheet:
+    """Aba com as células numa lista de linhas (sem as células vazias do fim)"""
+
+    def __init__(self, spreadsheet, title, sheet_id, rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.row_count = rows
+        self.col_count = cols
+        self.values = []
+
+    def _bounds(self, a1):
+        """Converte 'A2:K' em índices (linha inicial, linha final, coluna inicial, coluna final)"""
+        match = A1_RANGE.match(a1.split("!")[-1])
+        if not match:
+            raise ValueError(f"Intervalo inválido: {a1}")
+        first_col, first_row, last_col, last_row = match.groups()
+        if ":" not in a1:
+            last_col, last_row = first_col, first_row
+        return (
+            int(first_row) - 1 if first_row else 0,
+            int(last_row) - 1 if last_row else self.row_count - 1,
+            column_index(first_col) if first_col else 0,
+            column_index(last_col) if last_col else self.col_count - 1,
+        )
+
+    def _used_rows(self):
+        """Número de linhas até a última com algum valor"""
+        used = len(self.values)
+        while used and not any(self.values[used - 1]):
+            used -= 1
+        return used
+
+    def _write(self, row, col, values):
+        if row + len(values) > self.row_count:
+            raise ValueError(f"Intervalo além do limite da aba '{self.title}' ({self.row_count} linhas)")
+        while len(self.values) < row + len(values):
+            self.values.append([])
+        for offset, new_values in enumerate(values):
+            current = self.values[row + offset]
+            current.extend([""] * (col + len(new_values) - len(current)))
+            current[col:col + len(new_values)] = [str(value) for value in new_values]
+        return sum(len(new_values) for new_values in values)
+
+    def batch_get(self, ranges, **kwargs):
+        """Valores de cada intervalo, sem as linhas e células vazias do fim (como a API)"""
+        self.spreadsheet.client.record("batch_get")
+        result = []
+        for a1 in ranges:
+            first_row, last_row, first_col, last_col = self._bounds(a1)
+            rows = []
+            for row in self.values[first_row:last_row + 1]:
+                cells = row[first_col:last_col + 1]
+                while cells and cells[-1] == "":
+                    cells = cells[:-1]
+                rows.append(list(cells))
+            while rows and not rows[-1]:
+                rows.pop()
+            result.append(rows)
+        return result
+
+    def batch_update(self, data, value_input_option=None, **kwargs):
+        cells = 0
+        for item in data:
+            first_row, _, first_col, _ = self._bounds(item["range"])
+            cells += self._write(first_row, first_col, item["values"])
+        self.spreadsheet.client.record("batch_update", cells)
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        """Acrescenta após a última linha com valores, ampliando a aba se preciso"""
+        start = self._used_rows()
+        del self.values[start:]
+        self.row_count = max(self.row_count, start + len(values))
+        self.spreadsheet.client.record("append_rows", self._write(start, 0, values))
+
+    def get_all_values(self):
+        width = max((len(row) for row in self.values), default=0)
+        return [row + [""] * (width - len(row)) for row in self.values[:self._used_rows()]]
+
+    def set_row(self, row, values):
+        """Altera uma linha (1 = cabeçalho) como outro usuário faria, sem contar requisição"""
+        self.values.extend([] for _ in range(row - len(self.values)))
+        self.values[row - 1] = [str(value) for value in values]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self.sheets = []
+
+    def worksheets(self):
+        self.client.record("fetch_sheet_metadata")
+        return list(self.sheets)
+
+    def worksheet(self, title):
+        return next(sheet for sheet in self.sheets if sheet.title == title)
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        self.client.record("add_worksheet")
+        sheet = FakeWorksheet(self, title, len(self.sheets), rows, cols)
+        self.sheets.append(sheet)
+        return sheet
+
+    def batch_update(self, body):
+        """Só as requisições deleteDimension de linhas, na ordem recebida"""
+        for request in body["requests"]:
+            target = request["deleteDimension"]["range"]
+            if target["dimension"] != "ROWS":
+                raise ValueError("Somente remoção de linhas é suportada")
+            sheet = next(sheet for sheet in self.sheets if sheet.id == target["sheetId"])
+            del sheet.values[target["startIndex"]:target["endIndex"]]
+            sheet.row_count -= target["endIndex"] - target["startIndex"]
+        self.client.record("spreadsheet_batch_update")
+        return {"replies": [{} for _ in body["requests"]]}
+
+
+class FakeSheetsClient:
+    """Substitui o cliente do gspread; registra cada requisição como (método, células gravadas)"""
+
+    def __init__(self):
+        self.spreadsheets = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def open_by_key(self, key):
+        self.record("open_by_key")
+        with self.lock:
+            if key not in self.spreadsheets:
+                self.spreadsheets[key] = FakeSpreadsheet(self, key)
+            return self.spreadsheets[key]
+
+    def record(self, method, cells=0):
+        with self.lock:
+            self.requests.append((method, cells))
+
+    def count(self, method=None):
+        with self.lock:
+            return sum(1 for m, _ in self.requests if method is None or m == method)
+
+    def cells_written(self):
+        with self.lock:
+            return sum(cells for _, cells in self.requests)
+
+    def reset(self):
+        """Zera as contagens, mantendo as planilhas"""
+        with self.lock:
+            self.requests.clear()
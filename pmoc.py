@@ -1,16 +1,30 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import pytz
-from fpdf import FPDF
-import tempfile
 import os
+import sys
 import numpy as np
 import requests
+import random
 import base64
 import io
 import time
 import json
+import sqlite3
+import threading
+import atexit
+import hashlib
+import gzip
+import tempfile
+import re
+import unicodedata
+import importlib
+import functools
+import contextlib
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 # Configuração inicial da página
@@ -25,235 +39,2618 @@ def setup_page():
 CONFIG_FILE = "pmoc_config.json"
 REPO = "vilelarobson0971/pmoc"
 FILE_PATH = "pmoc.csv"
+# "single": tudo em pmoc.csv; "sharded": um CSV por Local + manifesto
+STORAGE_LAYOUT = os.environ.get("PMOC_STORAGE_LAYOUT", "single")
+SHARD_DIR = "pmoc_locais"
+SHARD_MANIFEST = f"{SHARD_DIR}/manifest.json"
+SHARD_FETCH_WORKERS = 8
+GITHUB_MERGE_ATTEMPTS = 3  # gravações com mesclagem antes de desistir por conflitos seguidos
+SHEETS_WORKSHEET = "pmoc"  # aba da planilha com os aparelhos
+HTTP_TIMEOUT = (5, 30)  # (conexão, leitura) em segundos
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_SECONDS = 0.5
+HTTP_MAX_BACKOFF_SECONDS = 30
+GITHUB_API_URL = os.environ.get("PMOC_GITHUB_API_URL", "https://api.github.com")
+CACHE_DIR = os.environ.get("PMOC_CACHE_DIR", ".pmoc_cache")
+MAINTENANCE_INTERVAL_DAYS = 180
+DUE_SOON_DAYS = 30
+DATE_FORMAT = '%d/%m/%Y'
+SAVE_WINDOW_SECONDS = float(os.environ.get("PMOC_SAVE_WINDOW", "10"))
+SAVE_MAX_BACKOFF_SECONDS = 15 * 60  # teto da espera entre envios após falhas seguidas
+LOCAL_DB = os.environ.get("PMOC_DB", "pmoc.db")
+SYNC_INTERVAL_SECONDS = 60
+PDF_TEMPLATE_VERSION = 1  # incrementar ao mudar o layout do relatório
+PDF_WORKERS = 2
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PMOC_PDF_CACHE_MB", "200")) * 2**20
+EXPORT_CHUNK_ROWS = 50000
+SPAN_LOG = os.environ.get("PMOC_SPAN_LOG", "")  # arquivo JSONL dos spans; vazio = só em memória
+SPAN_LOG_MAX_BYTES = int(os.environ.get("PMOC_SPAN_LOG_MB", "10")) * 2**20  # ao passar, vira <arquivo>.1
+SPAN_HISTORY = 1000  # últimas execuções guardadas por span para os percentis
+
+# Situações de manutenção
+STATUS_OVERDUE = 'atrasada'
+STATUS_DUE_SOON = 'vence em breve'
+STATUS_OK = 'em dia'
+STATUS_PENDING = 'aguardando programação'
+STATUS_INVALID = 'data inválida'
 
 # Funções para sincronização com GitHub
 def get_github_file_url(repo, file_path):
-    return f"https://api.github.com/repos/{repo}/contents/{file_path}"
+    return f"{GITHUB_API_URL}/repos/{repo}/contents/{file_path}"
 
-def load_config():
-    """Carrega as configurações do arquivo JSON"""
+# Estado compartilhado do processo. O Streamlit reexecuta este script a cada
+# interação, então variáveis globais do módulo não sobrevivem entre execuções.
+_local_state = {}
+
+@st.cache_resource
+def _cached_shared_state(name):
+    return {}
+
+def get_shared_state(name):
+    """Dicionário compartilhado entre sessões e reexecuções do script"""
+    if st.runtime.exists():
+        return _cached_shared_state(name)
+    # Fora do `streamlit run` (scripts e medições) o cache do Streamlit não persiste
+    return _local_state.setdefault(name, {})
+
+# Instrumentação: tempos de execução (spans) num log JSON e no painel de desempenho
+_span_context = threading.local()
+
+class SpanRecorder:
+    """Guarda as últimas execuções de cada span em memória.
+
+    Com `log_path` (PMOC_SPAN_LOG), também grava cada uma como uma linha JSON.
+    O arquivo fica aberto e, ao passar de `max_bytes`, é renomeado para
+    `<arquivo>.1` (substituindo o anterior) e recomeçado.
+    """
+    
+    def __init__(self, log_path=SPAN_LOG, history=SPAN_HISTORY, max_bytes=SPAN_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.history = history
+        self.max_bytes = max_bytes
+        self.samples = {}
+        self.lock = threading.Lock()
+        self._log = None
+        self._log_size = 0
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    
+    def record(self, entry):
+        with self.lock:
+            self.samples.setdefault(entry['span'], deque(maxlen=self.history)).append(entry)
+            if self.log_path:
+                try:
+                    self._write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                except OSError:
+                    # O log é só diagnóstico; sem disco, os spans continuam em memória
+                    self._close()
+    
+    def _write(self, line):
+        size = len(line.encode('utf-8'))
+        if self._log is None:
+            self._open()
+        if self._log_size and self._log_size + size > self.max_bytes:
+            self._close()
+            os.replace(self.log_path, self.log_path + ".1")
+            self._open()
+        self._log.write(line)
+        self._log_size += size
+    
+    def _open(self):
+        self._log = open(self.log_path, 'a', encoding='utf-8', buffering=1)
+        self._log_size = os.path.getsize(self.log_path)
+    
+    def _close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+    
+    def summary(self):
+        """Percentis de duração por span, do p95 mais lento para o mais rápido"""
+        with self.lock:
+            items = [(name, list(entries)) for name, entries in self.samples.items()]
+        rows = []
+        for name, entries in items:
+            ms = np.array([entry['ms'] for entry in entries])
+            http = [entry for entry in entries if 'status' in entry]
+            sized = [entry['bytes'] for entry in entries if 'bytes' in entry]
+            rows.append({
+                'Span': name,
+                'Execuções': len(entries),
+                'p50 (ms)': round(float(np.percentile(ms, 50)), 1),
+                'p95 (ms)': round(float(np.percentile(ms, 95)), 1),
+                'Máx. (ms)': round(float(ms.max()), 1),
+                'Erros': sum(1 for entry in entries if 'error' in entry),
+                'Status HTTP': ", ".join(sorted({str(entry['status']) for entry in http})),
+                'Bytes (média)': int(np.mean(sized)) if sized else None,
+                'Novas tentativas': sum(entry.get('retries', 0) for entry in entries),
+            })
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows).sort_values('p95 (ms)', ascending=False, ignore_index=True)
+    
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+def get_span_recorder():
+    state = get_shared_state("spans")
+    if "recorder" not in state:
+        state["recorder"] = SpanRecorder()
+    return state["recorder"]
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Mede o trecho do bloco `with`.
+
+    Retorna o dicionário do registro, onde o trecho pode anexar atributos
+    (status HTTP, bytes, novas tentativas...).
+    """
+    stack = _span_context.__dict__.setdefault('stack', [])
+    entry = {'span': name, 'parent': stack[-1]['span'] if stack else None, **attrs}
+    stack.append(entry)
+    start = time.perf_counter()
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE) as f:
-                return json.load(f)
-        return {}
+        yield entry
     except Exception as e:
-        st.error(f"Erro ao carregar configurações: {str(e)}")
+        # Só erros reais; st.stop()/st.rerun() não herdam de Exception
+        entry['error'] = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        entry['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        entry['at'] = datetime.now().isoformat(timespec='milliseconds')
+        get_span_recorder().record(entry)
+
+def traced(name=None):
+    """Decorador que mede cada chamada da função como um span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Cliente HTTP do GitHub: conexões reaproveitadas, timeouts e novas tentativas
+class GitHubClient:
+    """Sessão HTTP compartilhada com timeouts e backoff exponencial com jitter.
+
+    Repete a requisição em erros 5xx, 429 e limites secundários do GitHub (403 com
+    Retry-After ou cota esgotada), respeitando o cabeçalho Retry-After quando presente.
+    """
+    
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    
+    def __init__(self, timeout=HTTP_TIMEOUT, max_retries=HTTP_MAX_RETRIES,
+                 backoff=HTTP_BACKOFF_SECONDS, max_backoff=HTTP_MAX_BACKOFF_SECONDS, sleep=time.sleep):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SHARD_FETCH_WORKERS * 2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {"requests": 0, "retries": 0}
+        self._lock = threading.Lock()
+    
+    def should_retry(self, response):
+        if response.status_code in self.RETRY_STATUS:
+            return True
+        if response.status_code == 403:
+            # Limite secundário (Retry-After) ou cota primária esgotada
+            return "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0"
+        return False
+    
+    def retry_delay(self, attempt, response=None):
+        """Tempo de espera antes da próxima tentativa, em segundos"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+            reset = response.headers.get("X-RateLimit-Reset")
+            if response.headers.get("X-RateLimit-Remaining") == "0" and reset:
+                try:
+                    return min(max(float(reset) - time.time(), 0), self.max_backoff)
+                except ValueError:
+                    pass
+        # "Full jitter": sorteia entre zero e o teto exponencial
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+    
+    def request(self, method, url, **kwargs):
+        with span("github_http", method=method, url=url.split("?")[0]) as entry:
+            response = self._request_with_retries(method, url, **kwargs)
+            entry.update(status=response.status_code, bytes=len(response.content), retries=response.retries)
+            return response
+    
+    def _request_with_retries(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                response = None
+            if response is not None and (attempt >= self.max_retries or not self.should_retry(response)):
+                response.retries = attempt
+                return response
+            self.sleep(self.retry_delay(attempt, response))
+            attempt += 1
+            with self._lock:
+                self.stats["retries"] += 1
+    
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+    
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+def get_github_client():
+    """Cliente HTTP do GitHub compartilhado pelo processo"""
+    state = get_shared_state("github_client")
+    if "client" not in state:
+        state["client"] = GitHubClient()
+    return state["client"]
+
+# Cache local das leituras do GitHub (ETag + SHA + conteúdo em disco)
+
+def _github_cache_paths(repo, file_path):
+    key = f"{repo}/{file_path}".replace("/", "__")
+    base = Path(CACHE_DIR)
+    return base / f"{key}.meta.json", base / f"{key}.payload.csv"
+
+def read_github_cache(repo, file_path):
+    """Lê os metadados (ETag, SHA) do último conteúdo baixado do GitHub"""
+    meta_path, payload_path = _github_cache_paths(repo, file_path)
+    try:
+        if meta_path.exists() and payload_path.exists():
+            with open(meta_path) as f:
+                return json.load(f)
+    except Exception:
+        pass
+    return None
+
+def write_github_cache(repo, file_path, content, etag=None, sha=None):
+    """Grava conteúdo, ETag e SHA no cache em disco"""
+    meta_path, payload_path = _github_cache_paths(repo, file_path)
+    try:
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_payload = payload_path.with_name(payload_path.name + ".tmp")
+        tmp_payload.write_text(content, encoding="utf-8")
+        os.replace(tmp_payload, payload_path)
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        with open(tmp_meta, 'w') as f:
+            json.dump({"etag": etag, "sha": sha, "updated_at": time.time()}, f)
+        os.replace(tmp_meta, meta_path)
+    except Exception:
+        # O cache é apenas uma otimização; falhas não impedem a sincronização
+        pass
+    get_shared_state("github_frames").pop((repo, file_path), None)
+
+def load_cached_frame(repo, file_path, meta):
+    """Retorna o DataFrame em cache, lendo o CSV do disco apenas uma vez por processo"""
+    key = (repo, file_path)
+    version = (meta.get("etag"), meta.get("sha"))
+    frames = get_shared_state("github_frames")
+    cached = frames.get(key)
+    if cached is None or cached[0] != version:
+        _, payload_path = _github_cache_paths(repo, file_path)
+        frame = read_devices_csv(payload_path)
+        frames[key] = (version, frame)
+        cached = frames[key]
+    return cached[1].copy()
+
+# Configurações: padrões < arquivo JSON < st.secrets < variáveis de ambiente
+CONFIG_DEFAULTS = {
+    "storage_backend": "github",  # "github" (CSV) ou "sheets" (Google Sheets)
+    "github_token": "",
+    "repo": REPO,
+    "file_path": FILE_PATH,
+    "sheets_key": "",  # ID da planilha (trecho da URL entre /d/ e /edit)
+    "sheets_worksheet": SHEETS_WORKSHEET,
+    "sheets_credentials": "",  # JSON da conta de serviço ou caminho do arquivo
+    "maintenance_interval_days": MAINTENANCE_INTERVAL_DAYS,
+    "technicians": ["Guilherme", "Ismael"],
+    "supervisor": "Ismael",
+    "daily_capacity": 6,  # manutenções por técnico por dia útil
+    "model_intervals": {},  # {"Modelo": dias}
+    "btu_intervals": {},  # {"BTU": dias}
+}
+CONFIG_ENV = {
+    "storage_backend": "PMOC_STORAGE_BACKEND",
+    "github_token": "PMOC_GITHUB_TOKEN",
+    "repo": "PMOC_REPO",
+    "file_path": "PMOC_FILE_PATH",
+    "sheets_key": "PMOC_SHEETS_KEY",
+    "sheets_worksheet": "PMOC_SHEETS_WORKSHEET",
+    "sheets_credentials": "PMOC_SHEETS_CREDENTIALS",
+    "maintenance_interval_days": "PMOC_MAINTENANCE_INTERVAL_DAYS",
+    "technicians": "PMOC_TECHNICIANS",  # nomes separados por vírgula
+    "supervisor": "PMOC_SUPERVISOR",
+    "daily_capacity": "PMOC_DAILY_CAPACITY",
+    "model_intervals": "PMOC_MODEL_INTERVALS",  # JSON
+    "btu_intervals": "PMOC_BTU_INTERVALS",  # JSON
+}
+
+def parse_config_value(key, value):
+    """Converte o valor para o tipo do padrão (ambiente e secrets chegam como texto)"""
+    default = CONFIG_DEFAULTS[key]
+    if isinstance(default, dict):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return {str(name): int(days) for name, days in dict(value).items()}
+    if isinstance(default, list):
+        if isinstance(value, str):
+            value = value.split(',')
+        return [str(item).strip() for item in value if str(item).strip()]
+    if isinstance(default, int):
+        return int(value)
+    if hasattr(value, 'keys'):
+        # Tabela do secrets.toml (ex.: conta de serviço do Google) guardada como JSON
+        return json.dumps(dict(value))
+    return str(value)
+
+def read_secrets_config():
+    """Valores definidos em .streamlit/secrets.toml (se o arquivo existir)"""
+    try:
+        if not st.secrets.load_if_toml_exists():
+            return {}
+        return {key: st.secrets[key] for key in CONFIG_DEFAULTS if key in st.secrets}
+    except Exception:
         return {}
 
-def save_config(config):
-    """Salva as configurações no arquivo JSON"""
+def read_env_config():
+    return {key: os.environ[name] for key, name in CONFIG_ENV.items() if os.environ.get(name)}
+
+class ConfigProvider:
+    """Configurações em memória; o arquivo JSON só é relido quando muda no disco"""
+    
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self._stamp = None
+        self._file = {}
+        self._merged = None
+        self._sources = {}
+    
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _read_file(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except Exception as e:
+            st.error(f"Erro ao carregar configurações: {str(e)}")
+            return {}
+    
+    def _merge(self):
+        merged, sources = dict(CONFIG_DEFAULTS), dict.fromkeys(CONFIG_DEFAULTS, "padrão")
+        layers = (("arquivo", self._file), ("secrets", read_secrets_config()), ("ambiente", read_env_config()))
+        for source, layer in layers:
+            for key, value in layer.items():
+                if key not in CONFIG_DEFAULTS or value in ('', None):
+                    continue
+                try:
+                    merged[key] = parse_config_value(key, value)
+                    sources[key] = source
+                except (TypeError, ValueError):
+                    pass
+        self._merged, self._sources = merged, sources
+    
+    def get(self):
+        """Configuração em vigor; só um `stat` do arquivo quando nada mudou"""
+        stamp = self._file_stamp()
+        with self.lock:
+            if self._merged is None or stamp != self._stamp:
+                self._file = self._read_file() if stamp is not None else {}
+                self._stamp = stamp
+                self._merge()
+            return dict(self._merged)
+    
+    def sources(self):
+        """Origem de cada valor: padrão, arquivo, secrets ou ambiente"""
+        self.get()
+        with self.lock:
+            return dict(self._sources)
+    
+    def update(self, changes):
+        """Grava as alterações no arquivo JSON (secrets e ambiente continuam prevalecendo)"""
+        self.get()
+        with self.lock:
+            file_config = {**self._file, **changes}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(file_config, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._file = file_config
+            self._stamp = self._file_stamp()
+            self._merge()
+
+def get_config_provider():
+    state = get_shared_state("config")
+    if state.get("provider") is None or state["provider"].path != CONFIG_FILE:
+        state["provider"] = ConfigProvider(CONFIG_FILE)
+    return state["provider"]
+
+def load_config():
+    """Retorna as configurações em vigor (cacheadas em memória)"""
+    return get_config_provider().get()
+
+def save_config(changes):
+    """Salva no arquivo JSON as configurações alteradas"""
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f)
+        get_config_provider().update(changes)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar configurações: {str(e)}")
         return False
 
-def load_from_github(repo, file_path, token=None):
-    try:
-        url = get_github_file_url(repo, file_path)
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        } if token else {}
-        
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 404:
-            return None
-            
-        response.raise_for_status()
+def github_headers(token=None):
+    return {
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.v3+json"
+    } if token else {}
+
+@traced()
+def fetch_github_frame(repo, file_path, token=None):
+    """Baixa e lê um CSV de aparelhos do GitHub, levantando exceção em caso de falha"""
+    url = get_github_file_url(repo, file_path)
+    headers = github_headers(token)
+    
+    # Requisição condicional: se o ETag não mudou o GitHub responde 304 sem corpo
+    meta = read_github_cache(repo, file_path)
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    
+    response = get_github_client().get(url, headers=headers)
+    
+    if response.status_code == 304 and meta:
+        return load_cached_frame(repo, file_path, meta)
+    
+    if response.status_code == 404:
+        return None
         
-        content = response.json().get("content", "")
-        if not content:
-            return None
-            
-        decoded_content = base64.b64decode(content).decode("utf-8")
+    response.raise_for_status()
+    
+    body = response.json()
+    content = body.get("content", "")
+    if not content:
+        return None
         
-        if not decoded_content.strip():
-            return None
-            
-        return pd.read_csv(io.StringIO(decoded_content))
-    except Exception as e:
-        st.error(f"Erro ao carregar dados do GitHub: {str(e)}")
+    decoded_content = base64.b64decode(content).decode("utf-8")
+    
+    if not decoded_content.strip():
+        return None
+    
+    etag, sha = response.headers.get("ETag"), body.get("sha")
+    write_github_cache(repo, file_path, decoded_content, etag=etag, sha=sha)
+    
+    # Guarda o DataFrame lido para que o próximo 304 não precise ler o CSV de novo
+    frame = read_devices_csv(io.StringIO(decoded_content))
+    get_shared_state("github_frames")[(repo, file_path)] = ((etag, sha), frame)
+    return frame.copy()
+
+def fetch_github_file(repo, file_path, token=None):
+    """Baixa um arquivo de texto do GitHub e retorna (texto, SHA); (None, None) se não existir"""
+    response = get_github_client().get(get_github_file_url(repo, file_path), headers=github_headers(token))
+    if response.status_code == 404:
+        return None, None
+    response.raise_for_status()
+    body = response.json()
+    return base64.b64decode(body.get("content", "")).decode("utf-8"), body.get("sha")
+
+def fetch_github_text(repo, file_path, token=None):
+    """Baixa um arquivo de texto do GitHub; retorna None se não existir"""
+    return fetch_github_file(repo, file_path, token)[0]
+
+class GitHubConflict(Exception):
+    """O arquivo no GitHub mudou desde a versão (SHA) em que a gravação se baseou"""
+
+def put_github_text(repo, file_path, text, token=None, message=None, sha=None):
+    """Grava o texto sobre a versão `sha` do arquivo (None para criá-lo) e retorna o novo SHA.
+
+    Levanta GitHubConflict se o arquivo não estiver mais nessa versão.
+    """
+    payload = {
+        "message": message or f"Atualização PMOC - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "content": base64.b64encode(text.encode("utf-8")).decode("utf-8"),
+        "sha": sha or None
+    }
+    response = get_github_client().put(get_github_file_url(repo, file_path), json=payload,
+                                       headers=github_headers(token))
+    # 409: SHA diferente do atual; 422: arquivo já existe e nenhum SHA foi enviado
+    if response.status_code == 409 or (response.status_code == 422 and not sha):
+        raise GitHubConflict(f"{file_path} foi alterado no GitHub por outra gravação")
+    response.raise_for_status()
+    
+    # Mantém o cache coerente com o que acabou de ser gravado; o ETag da
+    # leitura anterior não vale mais, então a próxima leitura baixa o arquivo
+    new_sha = (response.json().get("content") or {}).get("sha")
+    write_github_cache(repo, file_path, text, etag=None, sha=new_sha)
+    return new_sha
+
+@traced()
+def push_to_github(repo, file_path, data, token=None, sha=None, message=None):
+    """Grava os aparelhos no GitHub com controle otimista de versão.
+
+    A gravação é feita sobre a versão `sha` (por padrão, a última lida ou gravada
+    por este processo). Se outra gravação chegou antes (409), baixa o arquivo
+    atual, mescla as edições por TAG com `merge_device_frames` usando o conteúdo
+    da versão `sha` como base e tenta de novo.
+
+    Retorna None se os dados foram gravados como estavam, ou (dados gravados,
+    conflitos) quando houve mesclagem.
+    """
+    meta = read_github_cache(repo, file_path) or {}
+    sha = sha or meta.get("sha")
+    base = load_cached_frame(repo, file_path, meta) if sha and meta.get("sha") == sha else None
+    ours, conflicts, merged = data, [], False
+    for _ in range(GITHUB_MERGE_ATTEMPTS):
+        try:
+            put_github_text(repo, file_path, to_csv_text(ours), token, message, sha)
+            return (ours, conflicts) if merged else None
+        except GitHubConflict:
+            text, sha = fetch_github_file(repo, file_path, token)
+            theirs = read_devices_csv(io.StringIO(text)) if text else to_typed(pd.DataFrame(columns=DEVICE_COLUMNS))
+            ours, found = merge_device_frames(base, ours, theirs)
+            # Numa nova tentativa, a versão que acabou de ser mesclada passa a ser a base
+            conflicts = [c for c in conflicts if c['TAG'] not in {f['TAG'] for f in found}] + found
+            base, merged = theirs, True
+    raise GitHubConflict(f"{file_path} continuou mudando no GitHub após {GITHUB_MERGE_ATTEMPTS} tentativas")
+
+# Mesclagem de edições concorrentes (três vias, por TAG)
+def merge_device_frames(base, ours, theirs):
+    """Mescla as nossas edições com as do GitHub, linha a linha pela TAG.
+
+    Para cada TAG que difere entre `ours` e `theirs`: se só um lado mudou em
+    relação à `base`, vale esse lado (inclusive inclusões e remoções); se os dois
+    mudaram, é um conflito e fica a versão do GitHub. Sem base conhecida (None),
+    toda diferença é tratada como conflito.
+
+    Retorna (dados mesclados, conflitos), onde cada conflito é
+    {'TAG', 'local', 'remoto'} com as linhas como dicionários (None se removida).
+    """
+    names = list(STORE_COLUMNS)
+    rows = [{} if frame is None else {record[0]: record for record in store_records(frame)}
+            for frame in (base, ours, theirs)]
+    base_rows, our_rows, their_rows = rows
+    unknown = object()
+    take_ours, conflicts = set(), []
+    for tag in our_rows.keys() | their_rows.keys():
+        mine, remote = our_rows.get(tag), their_rows.get(tag)
+        if mine == remote:
+            continue
+        original = unknown if base is None else base_rows.get(tag)
+        if original == remote:
+            take_ours.add(tag)
+        elif original != mine:
+            conflicts.append({
+                'TAG': tag,
+                'local': None if mine is None else dict(zip(names, mine)),
+                'remoto': None if remote is None else dict(zip(names, remote)),
+            })
+    if not take_ours:
+        return theirs, conflicts
+    keep = ~theirs['TAG'].astype(str).isin(take_ours)
+    added = ours[ours['TAG'].astype(str).isin(take_ours)]
+    merged = concat_devices([theirs[keep], added], ignore_index=True)
+    return merged, conflicts
+
+# Armazenamento dividido por local (um CSV por Local + manifesto)
+def shard_file_path(local):
+    """Caminho do CSV de um local, ex.: 'Filial 01' -> 'pmoc_locais/filial-01.csv'"""
+    ascii_name = unicodedata.normalize('NFKD', str(local)).encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_name.lower()).strip('-') or 'sem-local'
+    return f"{SHARD_DIR}/{slug}.csv"
+
+def build_shards(data):
+    """Separa os aparelhos por Local, retornando {local: {path, text, digest, rows}}"""
+    shards = {}
+    used_paths = set()
+    for local, group in data.groupby('Local', observed=True, sort=True):
+        text = to_csv_text(group)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        path = shard_file_path(local)
+        if path in used_paths:
+            # Locais que diferem só em acentos/maiúsculas ganham um sufixo próprio
+            suffix = hashlib.sha1(str(local).encode("utf-8")).hexdigest()[:6]
+            path = path[:-len(".csv")] + f"-{suffix}.csv"
+        used_paths.add(path)
+        shards[str(local)] = {"path": path, "text": text, "digest": digest, "rows": len(group)}
+    return shards
+
+@traced()
+def fetch_sharded_frame(repo, manifest_path=SHARD_MANIFEST, token=None):
+    """Baixa todos os locais do manifesto em paralelo e junta num único DataFrame.
+
+    Retorna None se o repositório ainda não usa o formato dividido.
+    """
+    manifest_text, sha = fetch_github_file(repo, manifest_path, token)
+    if manifest_text is None:
+        return None
+    # O SHA do manifesto é a identidade da versão remota (GitHubStorage.identity)
+    write_github_cache(repo, manifest_path, manifest_text, sha=sha)
+    manifest = json.loads(manifest_text)
+    paths = [shard["path"] for shard in manifest.get("shards", {}).values()]
+    with ThreadPoolExecutor(max_workers=SHARD_FETCH_WORKERS) as pool:
+        frames = [frame for frame in pool.map(lambda path: fetch_github_frame(repo, path, token), paths)
+                  if frame is not None]
+    if not frames:
+        return None
+    merged = concat_devices(frames, ignore_index=True)
+    return merged.sort_values('TAG', kind='stable', ignore_index=True)
+
+@traced()
+def push_sharded_to_github(repo, manifest_path, data, token=None):
+    """Grava apenas os locais cujo conteúdo mudou e, se preciso, o manifesto.
+
+    Cada local é gravado como `push_to_github` (com mesclagem em caso de conflito);
+    um local que ficou sem aparelhos é gravado vazio para que a remoção também
+    seja mesclada. O retorno segue o de `push_to_github`.
+    """
+    manifest_text = fetch_github_text(repo, manifest_path, token)
+    remote = json.loads(manifest_text).get("shards", {}) if manifest_text else {}
+    shards = build_shards(data)
+    groups = {str(local): group for local, group in data.groupby('Local', observed=True, sort=True)}
+    empty = data.iloc[:0]
+    changed = [local for local, shard in shards.items() if remote.get(local, {}).get("digest") != shard["digest"]]
+    changed += [local for local in remote if local not in shards]
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    def push_shard(local):
+        path = shards[local]["path"] if local in shards else remote[local]["path"]
+        return push_to_github(repo, path, groups.get(local, empty), token,
+                              message=f"Atualização PMOC ({path}) - {timestamp}")
+    
+    with ThreadPoolExecutor(max_workers=SHARD_FETCH_WORKERS) as pool:
+        results = dict(zip(changed, pool.map(push_shard, changed)))
+    
+    # Locais mesclados com edições de outra gravação entram no manifesto pelo conteúdo gravado
+    conflicts, written = [], dict(groups)
+    entries = {local: {"path": shard["path"], "rows": shard["rows"], "digest": shard["digest"]}
+               for local, shard in shards.items()}
+    for local, result in results.items():
+        if result is None:
+            continue
+        written[local], found = result
+        conflicts += found
+        entries.pop(local, None)
+        if len(written[local]):
+            text = to_csv_text(written[local])
+            path = shards[local]["path"] if local in shards else remote[local]["path"]
+            entries[local] = {"path": path, "rows": len(written[local]),
+                              "digest": hashlib.sha1(text.encode("utf-8")).hexdigest()}
+    
+    # O manifesto é derivado dos arquivos: em conflito, vale o remoto para os locais não gravados aqui
+    for _ in range(GITHUB_MERGE_ATTEMPTS):
+        current_text, sha = fetch_github_file(repo, manifest_path, token)
+        current = json.loads(current_text).get("shards", {}) if current_text else {}
+        shard_entries = {local: entry for local, entry in current.items() if local not in results}
+        shard_entries.update({local: entries[local] for local in results if local in entries})
+        if shard_entries == current:
+            if current_text is not None:
+                write_github_cache(repo, manifest_path, current_text, sha=sha)
+            break
+        manifest = {"version": 1, "shards": dict(sorted(shard_entries.items()))}
+        try:
+            put_github_text(repo, manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2),
+                            token, f"Atualização PMOC (manifesto) - {timestamp}", sha)
+            break
+        except GitHubConflict:
+            continue
+    else:
+        raise GitHubConflict(f"{manifest_path} continuou mudando no GitHub após {GITHUB_MERGE_ATTEMPTS} tentativas")
+    
+    if not any(result is not None for result in results.values()):
         return None
+    frames = [frame for frame in written.values() if len(frame)]
+    merged = concat_devices(frames, ignore_index=True) if frames else data.iloc[:0]
+    return merged.sort_values('TAG', kind='stable', ignore_index=True), conflicts
+
+# Armazenamento remoto plugável: CSV no GitHub ou aba do Google Sheets.
+# Os backends têm a mesma interface:
+#   credentials(config) -> credencial configurada ('' se faltar algo)
+#   load(credentials)   -> aparelhos remotos (None se ainda não houver); levanta exceção em falha
+#   save(data, credentials, base_id) -> None, ou (dados gravados, conflitos) quando houve mesclagem
+#   identity()          -> identificador da última versão remota lida ou gravada
+class GitHubStorage:
+    """Aparelhos em CSV no GitHub, num arquivo único ou divididos por local (STORAGE_LAYOUT)"""
+    name = "github"
+    label = "GitHub"
+    
+    def __init__(self, repo, file_path, layout=STORAGE_LAYOUT):
+        self.repo = repo
+        self.file_path = file_path
+        self.layout = layout
+    
+    @property
+    def location(self):
+        """(repositório, arquivo principal)"""
+        return self.repo, SHARD_MANIFEST if self.layout == "sharded" else self.file_path
+    
+    def credentials(self, config):
+        return config.get('github_token', '')
+    
+    def load(self, credentials=None):
+        if self.layout == "sharded":
+            data = fetch_sharded_frame(self.repo, SHARD_MANIFEST, credentials)
+            if data is not None:
+                return data
+            # Repositório ainda no formato de arquivo único: a primeira gravação faz a conversão
+        return fetch_github_frame(self.repo, self.file_path, credentials)
+    
+    def save(self, data, credentials=None, base_id=None):
+        if self.layout == "sharded":
+            return push_sharded_to_github(self.repo, SHARD_MANIFEST, data, credentials)
+        return push_to_github(self.repo, self.file_path, data, credentials, sha=base_id)
+    
+    def identity(self):
+        """SHA do último conteúdo lido ou gravado do arquivo principal"""
+        meta = read_github_cache(*self.location)
+        if meta is None and self.layout == "sharded":
+            # Repositório ainda no formato de arquivo único (veja load)
+            meta = read_github_cache(self.repo, self.file_path)
+        return (meta or {}).get("sha")
+
+class SheetsConflict(Exception):
+    """As linhas da planilha continuaram mudando enquanto a gravação era mesclada"""
+
+def sheets_client(credentials):
+    """Cliente gspread autenticado com a conta de serviço (JSON ou caminho do arquivo)"""
+    # gspread e google-auth só são importados quando o Google Sheets é usado
+    import gspread
+    if isinstance(credentials, dict):
+        return gspread.service_account_from_dict(credentials)
+    if str(credentials).lstrip().startswith('{'):
+        return gspread.service_account_from_dict(json.loads(credentials))
+    return gspread.service_account(filename=credentials)
+
+def sheet_range(first_row, last_row=None):
+    """Intervalo A1 das colunas de aparelhos, ex.: (5, 5) -> 'A5:K5'; sem fim, vai até a última linha"""
+    last_column = chr(ord('A') + len(DEVICE_COLUMNS) - 1)
+    return f"A{first_row}:{last_column}{'' if last_row is None else last_row}"
+
+def sheet_rows(data):
+    """Linhas da planilha como tuplas de texto na ordem de DEVICE_COLUMNS (datas 'dd/mm/aaaa')"""
+    frame = to_csv_frame(data)
+    columns = [frame[column].astype(object).where(frame[column].notna(), '').astype(str).to_numpy()
+               for column in DEVICE_COLUMNS]
+    return list(zip(*columns))
+
+def sheet_frame(rows):
+    """Aparelhos tipados a partir das linhas da planilha"""
+    return to_typed(pd.DataFrame(list(rows), columns=DEVICE_COLUMNS))
+
+def pad_sheet_row(values):
+    """A API omite as células vazias do fim da linha; completa até o número de colunas"""
+    width = len(DEVICE_COLUMNS)
+    return tuple([str(value) for value in values[:width]] + [''] * (width - len(values)))
+
+class SheetsStorage:
+    """Aparelhos numa aba do Google Sheets: cabeçalho na linha 1 e um aparelho por linha.
+
+    A leitura é um único `batch_get` da aba. A gravação compara os dados com a
+    última versão lida ou gravada (mantida em memória) e envia só o que mudou:
+    linhas alteradas num `batch_update`, novas num `append_rows` e removidas num
+    único `batch_update` da planilha.
+
+    Como o Sheets não tem controle de versão por gravação, um `batch_get` confere
+    antes as linhas que serão alteradas ou removidas. Se outra gravação mexeu
+    nelas, a aba é relida e as edições são mescladas por TAG com
+    `merge_device_frames`, como no GitHub. `client` aceita um cliente compatível
+    com o gspread (ex.: `fake_sheets.FakeSheetsClient`).
+    """
+    name = "sheets"
+    label = "Google Sheets"
+    
+    def __init__(self, spreadsheet_key, worksheet=SHEETS_WORKSHEET, client=None):
+        self.spreadsheet_key = spreadsheet_key
+        self.worksheet_title = worksheet
+        self.client = client
+        self.lock = threading.Lock()
+        self._opened = None  # (credencial, planilha, aba)
+        self._tags = None  # TAG de cada linha a partir da 2ª ('' para linha vazia)
+        self._rows = {}  # TAG -> valores da linha como texto
+        self._has_header = False
+        self._identity = None
+    
+    @property
+    def location(self):
+        """(planilha, aba)"""
+        return self.spreadsheet_key, self.worksheet_title
+    
+    def credentials(self, config):
+        return config.get('sheets_credentials', '') if self.spreadsheet_key else ''
+    
+    def _open(self, credentials):
+        """Planilha e aba (criada se não existir), reaproveitadas enquanto a credencial for a mesma"""
+        if self._opened is None or self._opened[0] != credentials:
+            spreadsheet = (self.client or sheets_client(credentials)).open_by_key(self.spreadsheet_key)
+            worksheet = next((ws for ws in spreadsheet.worksheets() if ws.title == self.worksheet_title), None)
+            if worksheet is None:
+                worksheet = spreadsheet.add_worksheet(self.worksheet_title, rows=1000, cols=len(DEVICE_COLUMNS))
+            self._opened = (credentials, spreadsheet, worksheet)
+        return self._opened[1], self._opened[2]
+    
+    def _read(self, worksheet):
+        """Lê a aba inteira num único batch_get e a guarda como última versão conhecida"""
+        values = worksheet.batch_get([sheet_range(1)])[0]
+        if values and pad_sheet_row(values[0]) != tuple(DEVICE_COLUMNS):
+            raise ValueError(f"A aba '{self.worksheet_title}' não tem o cabeçalho esperado: "
+                             f"{', '.join(DEVICE_COLUMNS)}")
+        rows = [pad_sheet_row(row) for row in values[1:]]
+        self._has_header = bool(values)
+        self._tags = [row[0] for row in rows]
+        self._rows = {row[0]: row for row in rows if row[0]}
+        self._identity = self._digest()
+    
+    def _digest(self):
+        text = "\n".join("\x1f".join(self._rows.get(tag, ())) for tag in self._tags)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+    
+    def _positions(self):
+        """Linha da planilha de cada TAG"""
+        return {tag: index + 2 for index, tag in enumerate(self._tags)}
+    
+    def _unchanged_remote(self, worksheet, tags):
+        """Confere num único batch_get se as linhas de `tags` seguem como na última versão conhecida.
+
+        Uma linha inserida ou removida acima desloca as seguintes, e a conferência também falha.
+        """
+        if not tags:
+            return True
+        positions = self._positions()
+        found = worksheet.batch_get([sheet_range(positions[tag], positions[tag]) for tag in tags])
+        return all(pad_sheet_row(values[0] if values else []) == self._rows[tag]
+                   for tag, values in zip(tags, found))
+    
+    def _write(self, spreadsheet, worksheet, rows, changed, added, removed):
+        positions = self._positions()
+        if changed:
+            worksheet.batch_update([{"range": sheet_range(positions[tag], positions[tag]), "values": [list(rows[tag])]}
+                                    for tag in changed], value_input_option="RAW")
+        if added or not self._has_header:
+            values = [list(rows[tag]) for tag in added]
+            if not self._has_header:
+                values.insert(0, list(DEVICE_COLUMNS))
+            worksheet.append_rows(values, value_input_option="RAW")
+        if removed:
+            # De baixo para cima, para que cada remoção não desloque as seguintes
+            indexes = sorted((positions[tag] - 1 for tag in removed), reverse=True)
+            spreadsheet.batch_update({"requests": [
+                {"deleteDimension": {"range": {"sheetId": worksheet.id, "dimension": "ROWS",
+                                               "startIndex": index, "endIndex": index + 1}}}
+                for index in indexes
+            ]})
+        removed = set(removed)
+        self._tags = [tag for tag in self._tags if tag not in removed] + added
+        for tag in removed:
+            del self._rows[tag]
+        self._rows.update({tag: rows[tag] for tag in changed + added})
+        self._has_header = True
+        self._identity = self._digest()
+    
+    @traced("sheets_load")
+    def load(self, credentials=None):
+        with self.lock:
+            spreadsheet, worksheet = self._open(credentials)
+            self._read(worksheet)
+            return sheet_frame(self._rows.values()) if self._rows else None
+    
+    @traced("sheets_save")
+    def save(self, data, credentials=None, base_id=None):
+        """Grava só as linhas que mudaram em relação à versão `base_id` (por padrão, a última conhecida)"""
+        with self.lock:
+            spreadsheet, worksheet = self._open(credentials)
+            fresh = self._tags is None
+            if fresh:
+                self._read(worksheet)
+            # Sem a versão de base em memória, toda diferença vira conflito (aba vazia não tem o que perder).
+            # A base só vira DataFrame se for preciso mesclar
+            base = dict(self._rows) if base_id in (None, self._identity) or not self._rows else None
+            ours, conflicts, merged = data, [], False
+            for _ in range(GITHUB_MERGE_ATTEMPTS):
+                rows = {row[0]: row for row in sheet_rows(ours)}
+                changed = [tag for tag, row in rows.items() if tag in self._rows and self._rows[tag] != row]
+                added = [tag for tag in rows if tag not in self._rows]
+                removed = [tag for tag in self._rows if tag not in rows]
+                if base is not None and (fresh or self._unchanged_remote(worksheet, changed + removed)):
+                    self._write(spreadsheet, worksheet, rows, changed, added, removed)
+                    return (ours, conflicts) if merged else None
+                self._read(worksheet)
+                theirs = sheet_frame(self._rows.values())
+                base_frame = None if base is None else sheet_frame(base.values())
+                ours, found = merge_device_frames(base_frame, ours, theirs)
+                conflicts = [c for c in conflicts if c['TAG'] not in {f['TAG'] for f in found}] + found
+                base, merged, fresh = dict(self._rows), True, True
+            raise SheetsConflict(f"A aba '{self.worksheet_title}' continuou mudando após "
+                                 f"{GITHUB_MERGE_ATTEMPTS} tentativas de mesclagem")
+    
+    def identity(self):
+        """Resumo (SHA-1) do conteúdo da aba lido ou gravado por último"""
+        return self._identity
+
+def get_storage(config=None):
+    """Backend de armazenamento remoto configurado, compartilhado pelo processo"""
+    config = config or load_config()
+    if config['storage_backend'] == "sheets":
+        key = ("sheets", config['sheets_key'], config['sheets_worksheet'])
+    else:
+        key = ("github", config['repo'], config['file_path'], STORAGE_LAYOUT)
+    storages = get_shared_state("storages")
+    if key not in storages:
+        storages[key] = SheetsStorage(*key[1:]) if key[0] == "sheets" else GitHubStorage(*key[1:])
+    return storages[key]
 
-def save_to_github(repo, file_path, data, token=None):
+def load_devices(credentials=None, storage=None):
+    """Carrega os aparelhos do armazenamento remoto configurado; None em caso de falha"""
+    storage = storage or get_storage()
     try:
-        url = get_github_file_url(repo, file_path)
-        headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        } if token else {}
-        
-        # Verifica se o arquivo já existe para obter o SHA
-        response = requests.get(url, headers=headers)
-        sha = response.json().get("sha", "") if response.status_code == 200 else ""
-        
-        # Converte DataFrame para CSV
-        csv_data = data.to_csv(index=False)
-        encoded_content = base64.b64encode(csv_data.encode("utf-8")).decode("utf-8")
+        return storage.load(credentials)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados do {storage.label}: {str(e)}")
+        return None
+
+# Fila de gravação em segundo plano (write-behind)
+class SaveQueue:
+    """Agrupa as alterações feitas dentro de uma janela de tempo num único commit.
+
+    Cada gravação leva o estado completo dos dados (o backend decide o que enviar:
+    o arquivo inteiro no GitHub, só as linhas alteradas no Sheets), então só a versão
+    mais recente precisa ser enviada; as anteriores são descartadas e contadas como agrupadas.
+
+    Após uma falha, a nova tentativa automática espera o dobro da anterior (a partir
+    da janela, até `max_backoff`), para que um erro persistente como um token
+    inválido não seja repetido a cada janela. `flush()` chamado direto não espera.
+    """
+    
+    def __init__(self, repo, file_path, window=SAVE_WINDOW_SECONDS, writer=push_to_github, on_flushed=None,
+                 max_backoff=SAVE_MAX_BACKOFF_SECONDS):
+        self.repo = repo
+        self.file_path = file_path
+        self.window = window
+        self.max_backoff = max_backoff
+        self.writer = writer
+        self.on_flushed = on_flushed
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._pending_edits = 0
+        self._due_at = None
+        self.commits = 0
+        self.flushed_edits = 0
+        self.last_flush_at = None
+        self.last_error = None
+        self.failures = 0  # falhas seguidas desde o último envio bem-sucedido
+        self.next_retry_at = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def submit(self, data, token, version=None):
+        """Enfileira uma cópia dos dados; o envio ocorre ao fim da janela.
+
+        `version` identifica os dados enviados e é repassado a `on_flushed` após o envio,
+        junto com os dados e o retorno do `writer` (dados mesclados e conflitos, se houve).
+        """
+        with self._cond:
+            if self._pending is None:
+                self._due_at = time.monotonic() + self.window
+            self._pending = (data.copy(), token, version)
+            self._pending_edits += 1
+            self._cond.notify()
+        if self.window <= 0:
+            return self.flush()
+        return True
+    
+    def flush(self):
+        """Envia imediatamente as alterações pendentes. Retorna False se o envio falhar"""
+        with self._write_lock:
+            with self._cond:
+                job, edits = self._pending, self._pending_edits
+                self._pending, self._pending_edits, self._due_at = None, 0, None
+            if job is None:
+                return True
+            try:
+                result = self.writer(self.repo, self.file_path, job[0], job[1])
+            except Exception as e:
+                with self._cond:
+                    # Devolve à fila para nova tentativa, a menos que já exista versão mais nova;
+                    # em ambos os casos o próximo envio automático respeita a espera
+                    if self._pending is None:
+                        self._pending = job
+                    self.failures += 1
+                    delay = min(self.max_backoff, max(self.window, 1) * 2 ** (self.failures - 1))
+                    self._due_at = time.monotonic() + delay
+                    self.next_retry_at = datetime.now() + timedelta(seconds=delay)
+                    self._pending_edits += edits
+                    self.last_error = str(e)
+                    self._cond.notify()
+                return False
+            with self._cond:
+                self.commits += 1
+                self.flushed_edits += edits
+                self.last_flush_at = datetime.now()
+                self.last_error = None
+                self.failures = 0
+                self.next_retry_at = None
+            if self.on_flushed:
+                try:
+                    self.on_flushed(job[2], job[0], result)
+                except Exception as e:
+                    # Os dados já foram enviados; a base local segue pendente e o
+                    # sincronizador os reenvia. A thread de envio não pode parar aqui.
+                    with self._cond:
+                        self.last_error = f"dados enviados, mas a base local não foi atualizada ({e})"
+                    return False
+            return True
+    
+    def status(self):
+        with self._cond:
+            return {
+                "pending_edits": self._pending_edits,
+                "commits": self.commits,
+                "flushed_edits": self.flushed_edits,
+                "last_flush_at": self.last_flush_at,
+                "last_error": self.last_error,
+                "failures": self.failures,
+                "next_retry_at": self.next_retry_at
+            }
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None or time.monotonic() < self._due_at:
+                    timeout = None if self._pending is None else self._due_at - time.monotonic()
+                    self._cond.wait(timeout)
+            self.flush()
+
+def get_save_queue(storage=None):
+    """Retorna a fila de gravação do processo para o armazenamento remoto informado"""
+    storage = storage or get_storage()
+    queues = get_shared_state("save_queues")
+    key = (storage.name,) + storage.location
+    if key not in queues:
+        store = get_local_store()
         
-        payload = {
-            "message": f"Atualização PMOC - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-            "content": encoded_content,
-            "sha": sha if sha else None
-        }
+        # Grava sobre a versão remota com que a base local foi conciliada pela última vez
+        def writer(container, path, data, credentials):
+            return storage.save(data, credentials, base_id=store.get_meta('remote_sha'))
         
-        response = requests.put(url, json=payload, headers=headers)
-        response.raise_for_status()
+        def on_flushed(version, data, result):
+            store.mark_synced(version, storage.identity())
+            if result is not None:
+                store.merge_remote(data, *result)
         
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar dados no GitHub: {str(e)}")
-        return False
+        queues[key] = SaveQueue(*storage.location, writer=writer, on_flushed=on_flushed)
+        atexit.register(queues[key].flush)
+    return queues[key]
+
+def show_save_status():
+    """Mostra na barra lateral a situação da fila de gravação"""
+    label = get_storage().label
+    conflicts = get_local_store().count_conflicts()
+    if conflicts:
+        st.sidebar.warning(f"{conflicts} conflito(s) de edição com o {label} aguardando decisão "
+                           "(Configuração > Conflitos de Sincronização)")
+    status = get_save_queue().status()
+    if get_local_store().is_dirty() and not status["pending_edits"]:
+        st.sidebar.info(f"Alterações salvas localmente, ainda não enviadas ao {label}")
+    if status["last_error"]:
+        retry = (f" Nova tentativa às {status['next_retry_at'].strftime('%H:%M:%S')}"
+                 if status["pending_edits"] and status["next_retry_at"] else "")
+        attempts = f" ({status['failures']} tentativa(s) seguida(s))" if status["failures"] else ""
+        st.sidebar.error(f"Falha ao enviar ao {label}{attempts}: {status['last_error']}.{retry}")
+    if status["pending_edits"]:
+        st.sidebar.warning(f"{status['pending_edits']} alteração(ões) aguardando envio ao {label}")
+    elif status["last_flush_at"]:
+        st.sidebar.success(f"Sincronizado às {status['last_flush_at'].strftime('%H:%M:%S')}")
+
+# Cálculo vetorizado das manutenções
+def blank_mask(series):
+    """Marca valores vazios (NaN ou texto em branco) de uma coluna"""
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        return (series.isna() | (series.astype(str).str.strip() == '')).to_numpy()
+    return series.isna().to_numpy()
+
+def parse_br_dates(series):
+    """Converte uma coluna 'dd/mm/aaaa' em datetime64; inválidos viram NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    blank = blank_mask(series)
+    return pd.to_datetime(series.astype(str).where(~blank), format=DATE_FORMAT, errors='coerce')
+
+def format_br_dates(dates, fill=''):
+    """Formata datetime64 como 'dd/mm/aaaa', preenchendo NaT com `fill`"""
+    # Há poucas datas distintas numa frota; formata cada uma só uma vez
+    codes, uniques = pd.factorize(dates)
+    labels = np.append(pd.DatetimeIndex(uniques).strftime(DATE_FORMAT).to_numpy(dtype=object), fill)
+    return pd.Series(labels[codes], index=dates.index, dtype=object)
+
+def classify_due_dates(next_due, blank, now=None, due_soon_days=DUE_SOON_DAYS):
+    """Classifica as datas de vencimento e retorna (dias restantes, situação) como arrays NumPy"""
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    due = next_due.to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(due)
+    today = np.datetime64(now.normalize().to_datetime64(), 'ns')
+    days = np.full(len(due), np.nan)
+    days[valid] = (due[valid] - today) // np.timedelta64(1, 'D')
+    overdue = valid & (due < np.datetime64(now.to_datetime64(), 'ns'))
+    due_soon = valid & ~overdue & (days <= due_soon_days)
+    status = np.select(
+        [blank, ~valid, overdue, due_soon],
+        [STATUS_PENDING, STATUS_INVALID, STATUS_OVERDUE, STATUS_DUE_SOON],
+        default=STATUS_OK
+    )
+    return days, status
+
+@traced()
+def compute_maintenance_schedule(data, interval_days=MAINTENANCE_INTERVAL_DAYS, now=None,
+                                 due_soon_days=DUE_SOON_DAYS, source='Data Manutenção'):
+    """Calcula próxima manutenção, dias restantes e situação para todos os aparelhos.
+
+    Com `source='Data Manutenção'` a próxima data é a última manutenção + `interval_days`;
+    com `source='Próxima manutenção'` usa a data já gravada no arquivo.
+    """
+    column = data[source]
+    blank = blank_mask(column)
+    if RAW_COLUMNS[source] in data.columns:
+        # Datas com texto inválido preservado não estão vazias: são 'data inválida'
+        blank &= np.asarray(data[RAW_COLUMNS[source]], dtype=object) == ''
+    dates = parse_br_dates(column)
+    next_due = dates + pd.Timedelta(days=interval_days) if source == 'Data Manutenção' else dates
+    days, status = classify_due_dates(next_due, blank, now=now, due_soon_days=due_soon_days)
+    label = format_br_dates(next_due)
+    label = label.where(label != '', pd.Series(status, index=data.index))
+    return pd.DataFrame({
+        'Próxima manutenção (data)': next_due,
+        'Próxima manutenção (calculada)': label,
+        'Dias para manutenção': days,
+        'Situação': status
+    }, index=data.index)
+
+def maintenance_status_counts(schedule):
+    """Conta os aparelhos por situação de manutenção"""
+    counts = schedule['Situação'].value_counts()
+    return {
+        status: int(counts.get(status, 0))
+        for status in (STATUS_OVERDUE, STATUS_DUE_SOON, STATUS_OK, STATUS_PENDING, STATUS_INVALID)
+    }
+
+# Esquema da tabela de aparelhos
+DEVICE_COLUMNS = [
+    'TAG', 'Local', 'Setor', 'Marca', 'Modelo', 'BTU', 'Data Manutenção',
+    'Técnico Executante', 'Aprovação Supervisor', 'Próxima manutenção', 'Observações'
+]
+CATEGORY_COLUMNS = ['Local', 'Setor', 'Marca', 'Modelo', 'Técnico Executante', 'Aprovação Supervisor']
+DATE_COLUMNS = ['Data Manutenção', 'Próxima manutenção']
+TEXT_COLUMNS = ['Observações']
+# Texto original dos valores que não puderam ser interpretados (data ou BTU inválidos).
+# Fica ao lado da coluna tipada e volta ao arquivo na gravação, para nada se perder.
+RAW_COLUMNS = {
+    'BTU': 'BTU (original)',
+    'Data Manutenção': 'Data Manutenção (original)',
+    'Próxima manutenção': 'Próxima manutenção (original)',
+}
+BTU_THOUSANDS = re.compile(r'^\d{1,3}(\.\d{3})+$')
+
+def as_category(series):
+    """Converte para categórica, representando vazios como '' (como no CSV)"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.fillna('').astype(str).astype('category')
+    elif series.isna().any():
+        if '' not in series.cat.categories:
+            series = series.cat.add_categories([''])
+        series = series.fillna('')
+    return series
+
+def parse_btu(series):
+    """Converte BTU em inteiro aceitando o separador de milhar ('12.000'); inválidos viram <NA>"""
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.astype('float64')
+    else:
+        # Poucos valores distintos: interpreta cada um só uma vez
+        codes, uniques = pd.factorize(series)
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        text = text.where(~text.str.match(BTU_THOUSANDS), text.str.replace('.', '', regex=False))
+        parsed = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce').to_numpy()
+        values = pd.Series(np.append(parsed, np.nan)[codes], index=series.index)
+    # Valores fracionários não são BTU válidos
+    return values.where(values == values.round()).astype('Int64')
+
+def raw_text(values, index):
+    """Coluna categórica com o texto original ('' onde o valor era válido)"""
+    series = pd.Series(values, index=index)
+    series = as_category(series) if isinstance(series.dtype, pd.CategoricalDtype) else \
+        series.fillna('').astype(str).astype('category')
+    if '' not in series.cat.categories:
+        series = series.cat.add_categories([''])
+    return series
+
+def to_typed(data):
+    """Converte do formato do CSV para os tipos usados em memória.
+
+    Datas viram datetime64, BTU vira inteiro e as colunas repetitivas viram
+    categóricas. O texto de datas e BTU que não puderam ser interpretados fica
+    nas colunas de RAW_COLUMNS (vazias para os valores válidos).
+    """
+    data = data.copy(deep=False)
+    for column in DEVICE_COLUMNS:
+        if column not in data.columns:
+            data[column] = pd.NaT if column in DATE_COLUMNS else ''
+    tags = pd.to_numeric(data['TAG'], errors='coerce')
+    if not tags.isna().any():
+        data['TAG'] = tags.astype('int64')
+    for column, raw_column in RAW_COLUMNS.items():
+        series = data[column]
+        typed = series.dtype == 'Int64' if column == 'BTU' else pd.api.types.is_datetime64_any_dtype(series)
+        parsed = parse_btu(series) if column == 'BTU' else parse_br_dates(series)
+        if typed or pd.api.types.is_numeric_dtype(series):
+            raw = data[raw_column] if raw_column in data.columns else ''
+        else:
+            raw = np.full(len(series), '', dtype=object)
+            invalid = np.flatnonzero(parsed.isna().to_numpy())
+            if len(invalid):
+                subset = series.iloc[invalid]
+                kept = ~blank_mask(subset)
+                raw[invalid[kept]] = subset.astype(str).to_numpy(dtype=object)[kept]
+        data[column] = parsed
+        data[raw_column] = raw_text(raw, data.index)
+    for column in CATEGORY_COLUMNS:
+        data[column] = as_category(data[column])
+    for column in TEXT_COLUMNS:
+        data[column] = data[column].fillna('').astype(str)
+    extra = [column for column in data.columns if column not in DEVICE_COLUMNS]
+    return data[DEVICE_COLUMNS + extra]
+
+def with_raw_text(series, raw):
+    """Valores da coluna, usando o texto original onde ele foi preservado"""
+    keep = np.asarray(raw, dtype=object) == ''
+    if keep.all():
+        return series
+    return series.astype(object).where(keep, np.asarray(raw, dtype=object))
+
+def to_csv_frame(data):
+    """Converte de volta ao formato do CSV (datas 'dd/mm/aaaa', textos inválidos preservados)"""
+    data = data.copy(deep=False)
+    for column in DATE_COLUMNS:
+        if column in data.columns and pd.api.types.is_datetime64_any_dtype(data[column]):
+            data[column] = format_br_dates(data[column])
+    for column, raw_column in RAW_COLUMNS.items():
+        if raw_column in data.columns:
+            if column in data.columns:
+                data[column] = with_raw_text(data[column], data[raw_column])
+            data = data.drop(columns=raw_column)
+    return data
+
+def to_csv_text(data):
+    return to_csv_frame(data).to_csv(index=False)
+
+def read_devices_csv(source):
+    """Lê o CSV de aparelhos já nos tipos de memória"""
+    dtypes = {column: 'category' for column in CATEGORY_COLUMNS}
+    # BTU como texto: o read_csv leria '12.000' como 12.0
+    dtypes.update({column: str for column in DATE_COLUMNS + TEXT_COLUMNS + ['BTU']})
+    return to_typed(pd.read_csv(source, dtype=dtypes))
+
+def align_categories(frames):
+    """Unifica as categorias para que o concat preserve o tipo categórico"""
+    frames = [to_typed(frame) for frame in frames]
+    for column in CATEGORY_COLUMNS:
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[column].cat.categories)
+        for frame in frames:
+            frame[column] = frame[column].cat.set_categories(categories)
+    return frames
+
+def concat_devices(frames, ignore_index=False):
+    return pd.concat(align_categories(frames), ignore_index=ignore_index)
+
+def coerce_field(data, column, value):
+    """Prepara um valor para gravação numa coluna tipada, ampliando categorias se preciso"""
+    if column in DATE_COLUMNS:
+        return pd.NaT if value in ('', None) else pd.Timestamp(value)
+    if column in CATEGORY_COLUMNS and isinstance(data[column].dtype, pd.CategoricalDtype):
+        value = '' if value is None else str(value)
+        if value not in data[column].cat.categories:
+            data[column] = data[column].cat.add_categories([value])
+    return value
+
+# Repositório de aparelhos indexado pela TAG
+class DeviceRepository:
+    """Acesso aos aparelhos por TAG com busca, atualização e remoção sem varrer a tabela"""
+    
+    def __init__(self, data):
+        self.data = data
+        self._index = {self.key(tag): label for label, tag in zip(data.index, data['TAG'])}
+        self._changed = set()
+        self._deleted = set()
+    
+    @staticmethod
+    def key(tag):
+        """Normaliza a TAG (o CSV pode trazê-la como número ou texto)"""
+        try:
+            return int(tag)
+        except (TypeError, ValueError):
+            return str(tag).strip()
+    
+    def __contains__(self, tag):
+        return self.key(tag) in self._index
+    
+    def __len__(self):
+        return len(self._index)
+    
+    def tags(self):
+        return list(self._index)
+    
+    def locals(self):
+        """Locais em uso, sem vazios"""
+        return [local for local in self.data['Local'].unique().tolist() if local]
+    
+    def label(self, tag):
+        """Rótulo da linha no DataFrame para a TAG informada"""
+        return self._index[self.key(tag)]
+    
+    def get(self, tag):
+        return self.data.loc[self.label(tag)]
+    
+    def add(self, record):
+        key = self.key(record['TAG'])
+        if key in self._index:
+            raise ValueError("Já existe um aparelho com esta TAG!")
+        label = self.data.index.max() + 1 if len(self.data) else 0
+        self.data = concat_devices([self.data, pd.DataFrame([record], index=[label])])
+        self._index[key] = label
+        self._changed.add(label)
+    
+    def add_many(self, records):
+        """Inclui vários aparelhos num único concat (as TAGs já devem estar validadas)"""
+        if not len(records):
+            return 0
+        start = self.data.index.max() + 1 if len(self.data) else 0
+        labels = pd.RangeIndex(start, start + len(records))
+        records = records.set_axis(labels)
+        self.data = concat_devices([self.data, records])
+        self._index.update((self.key(tag), label) for tag, label in zip(records['TAG'], labels))
+        self._changed.update(labels)
+        return len(records)
+    
+    def _clear_raw(self, fields):
+        """Um valor novo de data ou BTU substitui o texto inválido preservado"""
+        return {**fields, **{RAW_COLUMNS[column]: '' for column in fields
+                             if column in RAW_COLUMNS and RAW_COLUMNS[column] in self.data.columns}}
+    
+    def update(self, tag, fields):
+        """Aplica todas as alterações de uma TAG numa única operação"""
+        fields = self._clear_raw(fields)
+        old_key = self.key(tag)
+        label = self._index[old_key]
+        new_key = self.key(fields.get('TAG', tag))
+        if new_key != old_key and new_key in self._index:
+            raise ValueError("Já existe um aparelho com esta TAG!")
+        columns = list(fields)
+        values = [coerce_field(self.data, column, fields[column]) for column in columns]
+        self.data.loc[label, columns] = values
+        self._changed.add(label)
+        if new_key != old_key:
+            del self._index[old_key]
+            self._index[new_key] = label
+            self._deleted.add(old_key)
+
+    def update_many(self, tags, fields):
+        """Aplica os mesmos valores a várias TAGs de uma vez (sem troca de TAG)"""
+        if 'TAG' in fields:
+            raise ValueError("A TAG não pode ser alterada em lote!")
+        missing = [tag for tag in tags if tag not in self]
+        if missing:
+            raise KeyError(f"TAGs não encontradas: {', '.join(map(str, missing))}")
+        labels = [self.label(tag) for tag in tags]
+        if not labels:
+            return 0
+        for column, value in self._clear_raw(fields).items():
+            self.data.loc[labels, column] = coerce_field(self.data, column, value)
+        self._changed.update(labels)
+        return len(labels)
+
+    def delete(self, tag):
+        key = self.key(tag)
+        label = self._index.pop(key)
+        self.data = self.data.drop(index=label)
+        self._changed.discard(label)
+        self._deleted.add(key)
+    
+    def pop_changes(self):
+        """Retorna e limpa (rótulos alterados, TAGs removidas) desde a última gravação"""
+        changes = (self._changed, self._deleted)
+        self._changed, self._deleted = set(), set()
+        return changes
+
+def get_devices():
+    """Retorna o repositório da sessão, reconstruindo o índice se os dados foram trocados"""
+    devices = st.session_state.get('devices')
+    if devices is None or devices.data is not st.session_state.data:
+        devices = DeviceRepository(st.session_state.data)
+        st.session_state.devices = devices
+    return devices
+
+def commit_devices(devices):
+    """Publica na sessão os dados alterados pelo repositório"""
+    st.session_state.data = devices.data
+    st.session_state.devices = devices
+    bump_data_version()
+
+def data_version():
+    """Identifica a versão atual dos dados da sessão (troca ou alteração da tabela)"""
+    return (id(st.session_state.data), st.session_state.get('data_version', 0))
+
+def bump_data_version():
+    st.session_state.data_version = st.session_state.get('data_version', 0) + 1
+
+def get_schedule():
+    """Situação de manutenção de todos os aparelhos, recalculada só quando os dados mudam"""
+    interval_days = load_config()['maintenance_interval_days']
+    key = (data_version(), datetime.now().date(), interval_days)
+    cached = st.session_state.get('schedule_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, snapshot_cache('schedule', key[1:], lambda: compute_maintenance_schedule(
+            st.session_state.data, interval_days)))
+        st.session_state.schedule_cache = cached
+    return cached[1]
+
+# Armazenamento local (SQLite) e sincronização com o GitHub
+STORE_COLUMNS = {
+    'TAG': 'tag', 'Local': 'local', 'Setor': 'setor', 'Marca': 'marca', 'Modelo': 'modelo',
+    'BTU': 'btu', 'Data Manutenção': 'data_manutencao', 'Técnico Executante': 'tecnico',
+    'Aprovação Supervisor': 'aprovacao', 'Próxima manutenção': 'proxima_manutencao',
+    'Observações': 'observacoes', 'BTU (original)': 'btu_original',
+    'Data Manutenção (original)': 'data_manutencao_original',
+    'Próxima manutenção (original)': 'proxima_manutencao_original'
+}
+# Colunas incluídas depois da criação da tabela (acrescentadas às bases existentes)
+STORE_ADDED_COLUMNS = {
+    'versao': "INTEGER NOT NULL DEFAULT 0",
+    'btu_original': "TEXT",
+    'data_manutencao_original': "TEXT",
+    'proxima_manutencao_original': "TEXT",
+}
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    tag TEXT PRIMARY KEY,
+    local TEXT, setor TEXT, marca TEXT, modelo TEXT, btu INTEGER,
+    data_manutencao TEXT, tecnico TEXT, aprovacao TEXT,
+    proxima_manutencao TEXT, observacoes TEXT,
+    versao INTEGER NOT NULL DEFAULT 0,  -- versão da base em que a linha foi gravada
+    -- texto original de BTU e datas que não puderam ser interpretados
+    btu_original TEXT, data_manutencao_original TEXT, proxima_manutencao_original TEXT
+);
+CREATE INDEX IF NOT EXISTS devices_local ON devices (local, setor);
+CREATE INDEX IF NOT EXISTS devices_setor ON devices (setor);
+CREATE INDEX IF NOT EXISTS devices_due ON devices (proxima_manutencao);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+-- Edições locais que conflitaram com edições feitas no GitHub, aguardando decisão
+CREATE TABLE IF NOT EXISTS sync_conflicts (
+    tag TEXT PRIMARY KEY, local TEXT, remoto TEXT, detectado_em TEXT NOT NULL
+);
+
+-- Histórico de manutenções: somente inclusão, separado da tabela de aparelhos
+CREATE TABLE IF NOT EXISTS maintenance_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag TEXT NOT NULL, data_manutencao TEXT NOT NULL, tecnico TEXT, aprovacao TEXT,
+    proxima_manutencao TEXT, observacoes TEXT,
+    origem TEXT NOT NULL, registrado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_tag ON maintenance_events (tag, data_manutencao);
+CREATE INDEX IF NOT EXISTS events_tecnico ON maintenance_events (tecnico, data_manutencao);
+CREATE INDEX IF NOT EXISTS events_data ON maintenance_events (data_manutencao);
+CREATE TRIGGER IF NOT EXISTS events_no_update BEFORE UPDATE ON maintenance_events
+BEGIN SELECT RAISE(ABORT, 'o histórico de manutenções não pode ser alterado'); END;
+CREATE TRIGGER IF NOT EXISTS events_no_delete BEFORE DELETE ON maintenance_events
+BEGIN SELECT RAISE(ABORT, 'o histórico de manutenções não pode ser alterado'); END;
+
+-- Última manutenção de cada TAG, mantida a cada inclusão no histórico
+CREATE TABLE IF NOT EXISTS maintenance_latest (
+    tag TEXT PRIMARY KEY, event_id INTEGER NOT NULL, data_manutencao TEXT NOT NULL,
+    tecnico TEXT, aprovacao TEXT, proxima_manutencao TEXT, observacoes TEXT
+);
+CREATE TRIGGER IF NOT EXISTS events_latest AFTER INSERT ON maintenance_events
+BEGIN
+    INSERT INTO maintenance_latest VALUES (NEW.tag, NEW.id, NEW.data_manutencao, NEW.tecnico,
+                                           NEW.aprovacao, NEW.proxima_manutencao, NEW.observacoes)
+    ON CONFLICT(tag) DO UPDATE SET
+        event_id = excluded.event_id, data_manutencao = excluded.data_manutencao,
+        tecnico = excluded.tecnico, aprovacao = excluded.aprovacao,
+        proxima_manutencao = excluded.proxima_manutencao, observacoes = excluded.observacoes
+    WHERE excluded.data_manutencao >= maintenance_latest.data_manutencao;
+END;
+
+-- Agregados da frota por dimensão e data da última manutenção ('' = nunca feita),
+-- atualizados pelos gatilhos de ROLLUP_TRIGGERS a cada inclusão, alteração ou remoção de aparelho
+CREATE TABLE IF NOT EXISTS fleet_rollups (
+    dimensao TEXT NOT NULL, valor TEXT NOT NULL, data_manutencao TEXT NOT NULL,
+    unidades INTEGER NOT NULL, btu INTEGER NOT NULL,
+    PRIMARY KEY (dimensao, valor, data_manutencao)
+) WITHOUT ROWID;
+
+-- Índice invertido da busca (sem acentos, por início de palavra), lido do conteúdo de devices
+-- e atualizado pelos gatilhos de SEARCH_TRIGGERS
+CREATE VIRTUAL TABLE IF NOT EXISTS devices_search USING fts5(
+    observacoes, setor, modelo, marca,
+    content='devices', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+# Gatilhos que mantêm fleet_rollups. Estes e os da busca (DERIVED_TRIGGERS) são
+# removidos e recriados na substituição completa da base
+ROLLUP_TRIGGERS = {
+    'rollups_insert': """
+CREATE TRIGGER IF NOT EXISTS rollups_insert AFTER INSERT ON devices
+BEGIN
+    INSERT INTO fleet_rollups
+    SELECT dimensao, COALESCE(valor, ''), COALESCE(NEW.data_manutencao, ''), 1, COALESCE(NEW.btu, 0)
+    FROM (SELECT 'Local' AS dimensao, NEW.local AS valor UNION ALL SELECT 'Setor', NEW.setor
+          UNION ALL SELECT 'Marca', NEW.marca UNION ALL SELECT 'Técnico Executante', NEW.tecnico) WHERE true
+    ON CONFLICT DO UPDATE SET unidades = unidades + excluded.unidades, btu = btu + excluded.btu;
+END""",
+    'rollups_delete': """
+CREATE TRIGGER IF NOT EXISTS rollups_delete AFTER DELETE ON devices
+BEGIN
+    INSERT INTO fleet_rollups
+    SELECT dimensao, COALESCE(valor, ''), COALESCE(OLD.data_manutencao, ''), -1, -COALESCE(OLD.btu, 0)
+    FROM (SELECT 'Local' AS dimensao, OLD.local AS valor UNION ALL SELECT 'Setor', OLD.setor
+          UNION ALL SELECT 'Marca', OLD.marca UNION ALL SELECT 'Técnico Executante', OLD.tecnico) WHERE true
+    ON CONFLICT DO UPDATE SET unidades = unidades + excluded.unidades, btu = btu + excluded.btu;
+END""",
+    'rollups_update': """
+CREATE TRIGGER IF NOT EXISTS rollups_update AFTER UPDATE ON devices
+WHEN OLD.local IS NOT NEW.local OR OLD.setor IS NOT NEW.setor OR OLD.marca IS NOT NEW.marca
+  OR OLD.tecnico IS NOT NEW.tecnico OR OLD.btu IS NOT NEW.btu OR OLD.data_manutencao IS NOT NEW.data_manutencao
+BEGIN
+    INSERT INTO fleet_rollups
+    SELECT dimensao, COALESCE(valor, ''), COALESCE(OLD.data_manutencao, ''), -1, -COALESCE(OLD.btu, 0)
+    FROM (SELECT 'Local' AS dimensao, OLD.local AS valor UNION ALL SELECT 'Setor', OLD.setor
+          UNION ALL SELECT 'Marca', OLD.marca UNION ALL SELECT 'Técnico Executante', OLD.tecnico) WHERE true
+    ON CONFLICT DO UPDATE SET unidades = unidades + excluded.unidades, btu = btu + excluded.btu;
+    INSERT INTO fleet_rollups
+    SELECT dimensao, COALESCE(valor, ''), COALESCE(NEW.data_manutencao, ''), 1, COALESCE(NEW.btu, 0)
+    FROM (SELECT 'Local' AS dimensao, NEW.local AS valor UNION ALL SELECT 'Setor', NEW.setor
+          UNION ALL SELECT 'Marca', NEW.marca UNION ALL SELECT 'Técnico Executante', NEW.tecnico) WHERE true
+    ON CONFLICT DO UPDATE SET unidades = unidades + excluded.unidades, btu = btu + excluded.btu;
+END""",
+}
+# Gatilhos que mantêm devices_search, linha a linha como os dos agregados
+SEARCH_TRIGGERS = {
+    'search_insert': """
+CREATE TRIGGER IF NOT EXISTS search_insert AFTER INSERT ON devices
+BEGIN
+    INSERT INTO devices_search (rowid, observacoes, setor, modelo, marca)
+    VALUES (NEW.rowid, NEW.observacoes, NEW.setor, NEW.modelo, NEW.marca);
+END""",
+    'search_delete': """
+CREATE TRIGGER IF NOT EXISTS search_delete AFTER DELETE ON devices
+BEGIN
+    INSERT INTO devices_search (devices_search, rowid, observacoes, setor, modelo, marca)
+    VALUES ('delete', OLD.rowid, OLD.observacoes, OLD.setor, OLD.modelo, OLD.marca);
+END""",
+    'search_update': """
+CREATE TRIGGER IF NOT EXISTS search_update AFTER UPDATE ON devices
+WHEN OLD.observacoes IS NOT NEW.observacoes OR OLD.setor IS NOT NEW.setor
+  OR OLD.modelo IS NOT NEW.modelo OR OLD.marca IS NOT NEW.marca
+BEGIN
+    INSERT INTO devices_search (devices_search, rowid, observacoes, setor, modelo, marca)
+    VALUES ('delete', OLD.rowid, OLD.observacoes, OLD.setor, OLD.modelo, OLD.marca);
+    INSERT INTO devices_search (rowid, observacoes, setor, modelo, marca)
+    VALUES (NEW.rowid, NEW.observacoes, NEW.setor, NEW.modelo, NEW.marca);
+END""",
+}
+DERIVED_TRIGGERS = {**ROLLUP_TRIGGERS, **SEARCH_TRIGGERS}
+SEARCH_TOKEN = re.compile(r'\w+')
+
+EVENT_COLUMNS = {
+    'TAG': 'tag', 'Data Manutenção': 'data_manutencao', 'Técnico Executante': 'tecnico',
+    'Aprovação Supervisor': 'aprovacao', 'Próxima manutenção': 'proxima_manutencao',
+    'Observações': 'observacoes'
+}
+EVENT_ORIGINS = {'registro': "Registro de manutenção", 'cadastro': "Cadastro existente",
+                 'sincronização': "Recebida na sincronização"}
+# Dimensões do painel da frota -> coluna da base local
+ROLLUP_DIMENSIONS = {'Local': 'local', 'Setor': 'setor', 'Marca': 'marca', 'Técnico Executante': 'tecnico'}
+ROLLUP_COLUMNS = ['Aparelhos', 'Atrasados', 'Vencem em breve', 'Nunca mantidos', 'BTU instalados']
+
+class EditConflict(Exception):
+    """Aparelhos alterados por outra sessão depois que esta carregou os dados"""
+    
+    def __init__(self, tags):
+        self.tags = tags
+        super().__init__(f"TAGs alteradas por outra pessoa: {', '.join(tags)}")
+
+def store_records(data, columns_map=STORE_COLUMNS):
+    """Converte linhas tipadas em tuplas para o SQLite (datas ISO, vazios como NULL)"""
+    columns = []
+    for column in columns_map:
+        series = data[column]
+        if column == 'TAG':
+            values = series.astype(str).to_numpy(dtype=object)
+        elif column in DATE_COLUMNS:
+            dates = parse_br_dates(series)
+            values = np.where(dates.isna(), None, dates.dt.strftime('%Y-%m-%d').to_numpy(dtype=object))
+        elif column in RAW_COLUMNS.values():
+            values = series.fillna('').astype(str).to_numpy(dtype=object)
+            values = np.where(values == '', None, values)
+        else:
+            values = series.astype(object).where(series.notna(), None).to_numpy(dtype=object)
+        columns.append(values)
+    return list(zip(*columns))
+
+class LocalStore:
+    """Base local em SQLite (modo WAL), fonte de verdade dos aparelhos.
+
+    Cada gravação incrementa `version`; `synced_version` guarda a última versão
+    enviada ao GitHub, de modo que `is_dirty()` indica alterações ainda não sincronizadas.
+    """
+    
+    def __init__(self, path=LOCAL_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(STORE_SCHEMA)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(devices)")}
+        for name, definition in STORE_ADDED_COLUMNS.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE devices ADD COLUMN {name} {definition}")
+        for trigger in DERIVED_TRIGGERS.values():
+            self.conn.execute(trigger)
+        self.version = int(self.get_meta('version', 0))
+        with self._lock, self.conn:
+            self._record_device_dates('cadastro')
+            if self.get_meta('rollups_built') is None:
+                self._rebuild_rollups()
+            if self.get_meta('search_built') is None:
+                self._rebuild_search()
+    
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, str(value)))
+    
+    def _bump(self, synced=False):
+        self.version += 1
+        self._set_meta('version', self.version)
+        if synced:
+            self._set_meta('synced_version', self.version)
+    
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+    
+    def is_dirty(self):
+        return int(self.get_meta('synced_version', 0)) < self.version
+    
+    def is_new(self):
+        """Se a base nunca recebeu dados. Uma base que ficou vazia por remoções não é nova"""
+        return self.version == 0
+    
+    def has_remote_base(self):
+        """Se a base já foi conciliada com alguma versão do armazenamento remoto"""
+        return self.get_meta('remote_sha') is not None
+    
+    def is_seed(self):
+        """Se a base partiu dos dados iniciais do app, e não de uma leitura do remoto"""
+        return self.get_meta('seed') == '1'
+    
+    def mark_synced(self, version, remote_id=None):
+        with self._lock, self.conn:
+            if version is not None and version > int(self.get_meta('synced_version', 0)):
+                self._set_meta('synced_version', version)
+            if remote_id:
+                self._set_meta('remote_sha', remote_id)
+    
+    def _upsert(self, records, versions=None):
+        """Inclui ou substitui linhas (tuplas de store_records), marcando-as com a próxima versão.
+
+        `versions` ({TAG: (linha, versão)}) mantém a versão das linhas que não mudaram.
+        """
+        names = ", ".join(STORE_COLUMNS.values())
+        updates = ", ".join(f"{name} = excluded.{name}" for name in list(STORE_COLUMNS.values())[1:])
+        versions = versions or {}
+        rows = []
+        for record in records:
+            previous = versions.get(record[0])
+            rows.append(record + (previous[1] if previous and previous[0] == record else self.version + 1,))
+        self.conn.executemany(
+            f"INSERT INTO devices ({names}, versao) VALUES ({', '.join('?' * (len(STORE_COLUMNS) + 1))}) "
+            f"ON CONFLICT(tag) DO UPDATE SET {updates}, versao = excluded.versao", rows)
+    
+    def _current_records(self, tags):
+        """Linhas atuais das TAGs informadas, como tuplas comparáveis às de store_records"""
+        names = ", ".join(STORE_COLUMNS.values())
+        tags, current = list(tags), {}
+        for start in range(0, len(tags), 500):
+            chunk = tags[start:start + 500]
+            current.update((row[0], tuple(row)) for row in self.conn.execute(
+                f"SELECT {names} FROM devices WHERE tag IN ({', '.join('?' * len(chunk))})", chunk))
+        return current
+    
+    def replace_all(self, data, synced=False, remote_id=None, seed=False):
+        """Substitui toda a base (carga inicial ou dados vindos do GitHub).
+
+        `seed` marca os dados iniciais do app, usados como base na primeira conciliação com o remoto.
+        """
+        with self._lock, self.conn:
+            # Refazer agregados e busca de uma vez sai bem mais barato que os gatilhos linha a linha.
+            # A primeira exclusão abre a transação; os gatilhos voltam antes do commit.
+            self.conn.execute("DELETE FROM fleet_rollups")
+            for name in DERIVED_TRIGGERS:
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            # Linhas iguais às atuais mantêm a versão, para não parecerem editadas pelas sessões abertas
+            names = ", ".join(STORE_COLUMNS.values())
+            versions = {row[0]: (tuple(row[:-1]), row[-1])
+                        for row in self.conn.execute(f"SELECT {names}, versao FROM devices")}
+            self.conn.execute("DELETE FROM devices")
+            self._upsert(store_records(data), versions)
+            for trigger in DERIVED_TRIGGERS.values():
+                self.conn.execute(trigger)
+            self._rebuild_rollups()
+            self._rebuild_search()
+            self._record_device_dates('sincronização' if remote_id else 'cadastro')
+            self._bump(synced)
+            self._set_meta('seed', int(seed))
+            if remote_id:
+                self._set_meta('remote_sha', remote_id)
+        return self.version
+    
+    def apply_changes(self, data, changed_labels, deleted_tags, events=None, base_version=None):
+        """Grava apenas as linhas alteradas e as TAGs removidas numa única transação.
+
+        `events` são linhas de aparelhos com manutenções realizadas, incluídas no
+        histórico na mesma transação. Com `base_version` (a versão em que a sessão
+        carregou os dados), levanta EditConflict sem gravar nada se alguma dessas
+        TAGs foi gravada depois dela por outra sessão.
+        """
+        rows = data.loc[data.index.intersection(list(changed_labels))]
+        records = store_records(rows)
+        with self._lock, self.conn:
+            if base_version is not None:
+                tags = [record[0] for record in records] + [str(tag) for tag in deleted_tags]
+                stale = []
+                for start in range(0, len(tags), 500):
+                    chunk = tags[start:start + 500]
+                    stale += [row[0] for row in self.conn.execute(
+                        f"SELECT tag FROM devices WHERE versao > ? AND tag IN ({', '.join('?' * len(chunk))})",
+                        [base_version] + chunk)]
+                if stale:
+                    raise EditConflict(sorted(stale, key=DeviceRepository.key))
+            self.conn.executemany("DELETE FROM devices WHERE tag = ?", [(str(tag),) for tag in deleted_tags])
+            self._upsert(records)
+            if events is not None and len(events):
+                self._insert_events(events, 'registro')
+            # Datas alteradas na edição e TAGs renomeadas entram no histórico da TAG atual
+            self._record_device_dates('cadastro', [record[0] for record in records])
+            self._bump()
+        return self.version
+    
+    def merge_remote(self, ours, merged, conflicts):
+        """Traz para a base local o resultado de uma gravação mesclada no GitHub.
+
+        `ours` são os dados que esta base enviou e `merged` o que ficou gravado. Só
+        as TAGs que diferem entre os dois são alteradas, e apenas se a linha local
+        ainda for a enviada (edições feitas durante o envio são preservadas). Os
+        conflitos ficam registrados até alguém decidir qual versão manter.
+        """
+        our_rows = {record[0]: record for record in store_records(ours)}
+        merged_rows = {record[0]: record for record in store_records(merged)}
+        differing = [tag for tag in our_rows.keys() | merged_rows.keys() if our_rows.get(tag) != merged_rows.get(tag)]
+        with self._lock, self.conn:
+            current = self._current_records(differing)
+            untouched = [tag for tag in differing if current.get(tag) == our_rows.get(tag)]
+            if not untouched and not conflicts:
+                return self.version
+            was_synced = int(self.get_meta('synced_version', 0)) == self.version
+            self.conn.executemany("DELETE FROM devices WHERE tag = ?",
+                                  [(tag,) for tag in untouched if tag not in merged_rows])
+            self._upsert([merged_rows[tag] for tag in untouched if tag in merged_rows])
+            detected_at = datetime.now().isoformat(timespec='seconds')
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sync_conflicts VALUES (?, ?, ?, ?)",
+                [(conflict['TAG'], json.dumps(conflict['local'], ensure_ascii=False, default=int),
+                  json.dumps(conflict['remoto'], ensure_ascii=False, default=int), detected_at)
+                 for conflict in conflicts]
+            )
+            self._record_device_dates('sincronização')
+            self._bump(synced=was_synced)
+        return self.version
+    
+    def list_conflicts(self):
+        """Conflitos de sincronização pendentes: [{'TAG', 'local', 'remoto', 'detectado_em'}]"""
+        with self._lock:
+            rows = self.conn.execute("SELECT tag, local, remoto, detectado_em FROM sync_conflicts").fetchall()
+        return sorted(
+            ({'TAG': tag, 'local': json.loads(local), 'remoto': json.loads(remote), 'detectado_em': detected_at}
+             for tag, local, remote, detected_at in rows),
+            key=lambda conflict: DeviceRepository.key(conflict['TAG'])
+        )
+    
+    def count_conflicts(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sync_conflicts").fetchone()[0]
+    
+    def discard_conflict(self, tag):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM sync_conflicts WHERE tag = ?", (str(tag),))
+    
+    def _insert_events(self, rows, origin):
+        recorded_at = datetime.now().isoformat(timespec='seconds')
+        records = [record + (origin, recorded_at) for record in store_records(rows, EVENT_COLUMNS)
+                   if record[1] is not None]
+        names = ", ".join(EVENT_COLUMNS.values())
+        self.conn.executemany(
+            f"INSERT INTO maintenance_events ({names}, origem, registrado_em) VALUES "
+            f"({', '.join('?' * (len(EVENT_COLUMNS) + 2))})", records)
+    
+    def _record_device_dates(self, origin, tags=None):
+        """Inclui no histórico as datas de manutenção dos aparelhos mais novas que a última registrada.
+
+        Com `tags`, confere só esses aparelhos.
+        """
+        names = ", ".join(EVENT_COLUMNS.values())
+        selected = ", ".join(f"d.{name}" for name in EVENT_COLUMNS.values())
+        sql = (f"INSERT INTO maintenance_events ({names}, origem, registrado_em) "
+               f"SELECT {selected}, ?, ? FROM devices d LEFT JOIN maintenance_latest l ON l.tag = d.tag "
+               f"WHERE d.data_manutencao IS NOT NULL "
+               f"AND (l.tag IS NULL OR d.data_manutencao > l.data_manutencao)")
+        params = [origin, datetime.now().isoformat(timespec='seconds')]
+        if tags is None:
+            self.conn.execute(f"{sql} ORDER BY d.rowid", params)
+            return
+        tags = list(tags)
+        for start in range(0, len(tags), 500):
+            chunk = tags[start:start + 500]
+            self.conn.execute(f"{sql} AND d.tag IN ({', '.join('?' * len(chunk))}) ORDER BY d.rowid",
+                              params + chunk)
+    
+    def _rebuild_rollups(self):
+        """Recalcula todos os agregados da frota a partir da tabela de aparelhos"""
+        self.conn.execute("DELETE FROM fleet_rollups")
+        for dimension, name in ROLLUP_DIMENSIONS.items():
+            self.conn.execute(
+                f"INSERT INTO fleet_rollups SELECT ?, COALESCE({name}, ''), COALESCE(data_manutencao, ''), "
+                f"COUNT(*), COALESCE(SUM(btu), 0) FROM devices GROUP BY 2, 3", (dimension,))
+        self._set_meta('rollups_built', 1)
+    
+    def _rebuild_search(self):
+        self.conn.execute("INSERT INTO devices_search (devices_search) VALUES ('rebuild')")
+        self._set_meta('search_built', 1)
+    
+    def search(self, text):
+        """TAGs cujas Observações, Setor, Modelo ou Marca contêm palavras começando por cada termo.
+
+        Acentos e maiúsculas são ignorados ("reuniao" encontra "Sala Reunião") e um
+        código parcial encontra o modelo ("GWC24" encontra "GWC24QE-D3NNB4D/I").
+        Retorna None se o texto não tiver termos.
+        """
+        terms = SEARCH_TOKEN.findall(text)
+        if not terms:
+            return None
+        query = " ".join(f'"{term}"*' for term in terms)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT d.tag FROM devices_search s JOIN devices d ON d.rowid = s.rowid "
+                "WHERE devices_search MATCH ?", (query,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def rollups(self, dimension, today=None, interval_days=MAINTENANCE_INTERVAL_DAYS,
+                due_soon_days=DUE_SOON_DAYS):
+        """Contagens da frota por valor de uma dimensão, lidas dos agregados.
+
+        Os agregados guardam a data da última manutenção, então as situações do dia
+        saem por comparação: atrasada se a última manutenção + `interval_days` já
+        chegou, vencendo em breve se chega nos próximos `due_soon_days` dias.
+        """
+        today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today).normalize()
+        overdue_until = (today - pd.Timedelta(days=interval_days)).strftime('%Y-%m-%d')
+        soon_until = (today - pd.Timedelta(days=interval_days - due_soon_days)).strftime('%Y-%m-%d')
+        sql = (
+            "SELECT valor, SUM(unidades), "
+            "SUM(CASE WHEN data_manutencao != '' AND data_manutencao <= :overdue THEN unidades ELSE 0 END), "
+            "SUM(CASE WHEN data_manutencao > :overdue AND data_manutencao <= :soon THEN unidades ELSE 0 END), "
+            "SUM(CASE WHEN data_manutencao = '' THEN unidades ELSE 0 END), SUM(btu) "
+            "FROM fleet_rollups WHERE dimensao = :dimension AND unidades != 0 GROUP BY valor ORDER BY valor"
+        )
+        params = {'dimension': dimension, 'overdue': overdue_until, 'soon': soon_until}
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        frame = pd.DataFrame(rows, columns=[dimension] + ROLLUP_COLUMNS)
+        return frame.set_index(dimension).astype('int64')
+    
+    def _events_frame(self, sql, params=()):
+        with self._lock:
+            frame = pd.read_sql_query(sql, self.conn, params=params)
+        frame = frame.rename(columns={name: column for column, name in EVENT_COLUMNS.items()})
+        for column in DATE_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column], format='%Y-%m-%d', errors='coerce')
+        tags = pd.to_numeric(frame['TAG'], errors='coerce')
+        if not tags.isna().any():
+            frame['TAG'] = tags.astype('int64')
+        return frame
+    
+    def query_events(self, tag=None, technician=None, date_from=None, date_until=None, limit=None,
+                     tag_ranges=None):
+        """Histórico de manutenções, do mais recente ao mais antigo.
+
+        Os filtros usam os índices por (TAG, data), (técnico, data) e data.
+        `tag_ranges` ([(início, fim)], como em parse_tag_ranges) limita às TAGs das faixas.
+        """
+        clauses, params = [], []
+        if tag is not None:
+            clauses.append("tag = ?")
+            params.append(str(tag))
+        if tag_ranges:
+            # TAG única vai pelo índice; as faixas comparam o número da TAG
+            options = []
+            for start, end in tag_ranges:
+                if start == end:
+                    options.append("tag = ?")
+                    params.append(str(start))
+                else:
+                    options.append("(tag != '' AND tag NOT GLOB '*[^0-9]*' AND CAST(tag AS INTEGER) BETWEEN ? AND ?)")
+                    params += [start, end]
+            clauses.append(f"({' OR '.join(options)})")
+        if technician is not None:
+            clauses.append("tecnico = ?")
+            params.append(str(technician))
+        if date_from is not None:
+            clauses.append("data_manutencao >= ?")
+            params.append(pd.Timestamp(date_from).strftime('%Y-%m-%d'))
+        if date_until is not None:
+            clauses.append("data_manutencao <= ?")
+            params.append(pd.Timestamp(date_until).strftime('%Y-%m-%d'))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        names = ", ".join(EVENT_COLUMNS.values())
+        sql = (f"SELECT id, {names}, origem, registrado_em FROM maintenance_events {where} "
+               f"ORDER BY data_manutencao DESC, id DESC")
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._events_frame(sql, params)
+    
+    def count_events(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM maintenance_events").fetchone()[0]
+    
+    def latest_events(self):
+        """Última manutenção registrada de cada aparelho cadastrado (TAGs removidas ou renomeadas ficam só no histórico)"""
+        names = ", ".join(EVENT_COLUMNS.values())
+        return self._events_frame(f"SELECT event_id AS id, {names} FROM maintenance_latest "
+                                  f"WHERE tag IN (SELECT tag FROM devices) ORDER BY data_manutencao DESC")
+    
+    def query(self, tag=None, local=None, setor=None, due_from=None, due_until=None):
+        """Consulta indexada por TAG, Local, Setor e intervalo de próxima manutenção"""
+        clauses, params = [], []
+        for name, value in (('tag', tag), ('local', local), ('setor', setor)):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(str(value))
+        if due_from is not None:
+            clauses.append("proxima_manutencao >= ?")
+            params.append(pd.Timestamp(due_from).strftime('%Y-%m-%d'))
+        if due_until is not None:
+            clauses.append("proxima_manutencao <= ?")
+            params.append(pd.Timestamp(due_until).strftime('%Y-%m-%d'))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        names = ", ".join(STORE_COLUMNS.values())
+        with self._lock:
+            frame = pd.read_sql_query(f"SELECT {names} FROM devices {where} ORDER BY rowid", self.conn, params=params)
+        frame = frame.rename(columns={name: column for column, name in STORE_COLUMNS.items()})
+        for column in DATE_COLUMNS:
+            frame[column] = pd.to_datetime(frame[column], format='%Y-%m-%d', errors='coerce')
+        frame['BTU'] = pd.to_numeric(frame['BTU']).astype('Int64')
+        return to_typed(frame)
+    
+    def load_frame(self):
+        return self.query()
+
+def get_local_store():
+    """Base local compartilhada pelo processo"""
+    state = get_shared_state("local_store")
+    if "store" not in state:
+        state["store"] = LocalStore()
+    return state["store"]
+
+class StoreSyncer:
+    """Reconcilia periodicamente a base local com o armazenamento remoto quando ele está acessível.
+
+    Com alterações locais pendentes, envia a base pela fila de gravação; sem
+    pendências, baixa os dados remotos (no GitHub, requisição condicional) e, se
+    mudaram, substitui a base local.
+    """
+    
+    def __init__(self, store, interval=SYNC_INTERVAL_SECONDS):
+        self.store = store
+        self.interval = interval
+        self.last_check_at = None
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def sync_once(self):
+        storage = get_storage()
+        credentials = storage.credentials(load_config())
+        if not credentials:
+            return
+        try:
+            if not self.store.has_remote_base():
+                adopt_remote(self.store, storage, credentials)
+            elif self.store.is_dirty():
+                queue = get_save_queue(storage)
+                if not queue.status()["pending_edits"]:
+                    queue.submit(self.store.load_frame(), credentials, version=self.store.version)
+            else:
+                data = storage.load(credentials)
+                remote = storage.identity()
+                if data is not None and remote != self.store.get_meta('remote_sha') and not self.store.is_dirty():
+                    self.store.replace_all(data, synced=True, remote_id=remote)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        self.last_check_at = datetime.now()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sync_once()
+
+def adopt_remote(store, storage, credentials):
+    """Primeira conciliação de uma base que nunca leu o remoto (dados iniciais ou criada sem acesso).
+
+    Até ela ocorrer nada é enviado: sem versão de base, cada TAG diferente viraria
+    conflito no GitHub e seria sobrescrita no Sheets. Sem edições locais, a base
+    passa a ser a remota. Com edições, elas são mescladas sobre os dados remotos,
+    tendo os dados iniciais como base (ou nenhuma, se a base não partiu deles), e
+    o resultado é enfileirado para envio. Com o remoto vazio, a base local é enviada
+    como primeira versão.
+    """
+    data = storage.load(credentials)
+    if data is not None:
+        if not store.is_dirty():
+            store.replace_all(data, synced=True, remote_id=storage.identity())
+            return
+        ours = store.load_frame()
+        merged, conflicts = merge_device_frames(initial_devices() if store.is_seed() else None, ours, data)
+        store.merge_remote(ours, merged, conflicts)
+        store.mark_synced(None, storage.identity())
+    if store.is_dirty():
+        get_save_queue(storage).submit(store.load_frame(), credentials, version=store.version)
+
+def get_store_syncer():
+    state = get_shared_state("store_syncer")
+    if "syncer" not in state:
+        state["syncer"] = StoreSyncer(get_local_store())
+    return state["syncer"]
+
+def get_store_snapshot(store):
+    """Quadro da base local lido uma vez por versão e compartilhado entre as sessões"""
+    state = get_shared_state("store_snapshot")
+    with state.setdefault("lock", threading.Lock()):
+        version = store.version
+        if state.get("version") != version:
+            state["frame"] = store.load_frame()
+            state["version"] = version
+        return state["version"], state["frame"]
+
+def load_session_from_store():
+    """Recarrega os dados da sessão a partir da base local"""
+    version, frame = get_store_snapshot(get_local_store())
+    # Cada sessão altera a sua cópia; o quadro compartilhado fica intacto
+    st.session_state.data = frame.copy()
+    st.session_state.store_version = version
+    st.session_state.snapshot_key = (data_version(), version)
+
+def snapshot_cache(name, key, build):
+    """Cálculo feito uma vez por processo enquanto a sessão tiver os dados intactos da base.
+
+    Uma nova sessão reaproveita agenda e facetas já calculadas por outra; depois de
+    uma alteração local, a sessão volta a calcular por conta própria.
+    """
+    snapshot = st.session_state.get('snapshot_key')
+    if snapshot is None or snapshot[0] != data_version():
+        return build()
+    state = get_shared_state("snapshot_cache")
+    full_key = (name, snapshot[1]) + tuple(key)
+    if full_key not in state:
+        for old_key in [k for k in state if k[1] != snapshot[1]]:
+            state.pop(old_key, None)
+        state[full_key] = build()
+    return state[full_key]
 
 # Inicialização dos dados
+@traced()
 def init_data():
+    store = get_local_store()
+    get_store_syncer()
+    # Versão que o usuário via ao interagir; as edições desta execução partem dela
+    st.session_state.seen_version = st.session_state.get('store_version')
+    
     if 'data' not in st.session_state:
-        # Carrega configurações
-        config = load_config()
-        token = config.get('github_token', '')
-        
-        # Tenta carregar do GitHub se houver token
-        if token:
-            saved_data = load_from_github(REPO, FILE_PATH, token)
-            if saved_data is not None:
-                if 'Observações' not in saved_data.columns:
-                    saved_data['Observações'] = ''
-                st.session_state.data = saved_data
-                return
-        
-        # Se não conseguir carregar do GitHub, usa dados iniciais
-        initial_data = {
-            'TAG': list(range(1, 42)),
-            'Local': ['Matriz']*20 + ['Filial']*13 + ['Matriz']*8,
-            'Setor': ['Recepção', 'CPD', 'CPD', 'RH', 'Marketing', 'Marketing', 'Inteligência de mercado',
-                     'Antigo Show Room', 'Diretoria - Rafael', 'Controladoria', 'Diretoria - Jair',
-                     'Sala reunião térreo', 'Financeiro', 'Diretoria', 'Sala reunião principal',
-                     'Sala reunião principal', 'Expedição - Recepção', 'Expedição - Sala Welder',
-                     'Corte - Risco', 'Estoque - Sala Umberto', 'Laboratório - Sala ADM',
-                     'Laboratório - Sala ADM', 'Gerência', 'Modelagem', 'Inteligência do Produto',
-                     'Estilo', 'Show Room', 'T.I.', 'PCP', 'PCP', 'Compras', 'Refeitório', 'Refeitório',
-                     'Refeitório', 'Sala de Reunião', 'Estúdio', 'Estúdio', 'Refeitório', 'Refeitório',
-                     'Sala Expedição Kids', 'Ecommerce'],
-            'Marca': ['Springer', 'Philco', 'Elgin', 'Springer', 'TCL', 'TCL', 'TCL', 'Springer',
-                     'Springer', 'Springer', 'COMFEE', 'COMFEE', 'Springer', 'Springer', 'Springer',
-                     'Springer', 'Philco', 'Agratto', 'COMFEE', 'GREE', 'GREE', 'GREE', 'GREE', 'GREE',
-                     'GREE', 'GREE', 'GREE', 'Consul', 'Electrolux', 'GREE', 'Philco', 'GREE', 'GREE',
-                     'GREE', 'GREE', 'Philco', 'Springer', 'Agratto', 'Agratto', '', ''],
-            'Modelo': ['42MACA12S5', 'Eco Inverter', 'HWFL18B2IA', '42MACB18S5', 'TAC18CSA1', 'TAC18CSA1',
-                      'TAC18CSA1', '42MACB18S5', '42AFFCL12', '42MACB18S5', '42AFCE12X5', '42AFCD18F5',
-                      '42MACB18S5', '42TFCA', '42MACB18S5', '42MACB18S5', 'Eco Inverter', 'ACST12FR4-02',
-                      '42AFCD12F5', 'GWC12QC-D3NNB4D/I', 'GWC18AAD-D3NNA1D/I', 'GWC18AAD-D3NNA1D/I',
-                      'GWC12AAC-D3NNB4D/I', 'GWC12AAC-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I',
-                      'GWC24QE-D3NNB4D/I', '', 'VI18F', 'GWC12QC-D3NNB4D/I', 'Eco Inverter',
-                      'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I',
-                      '', '', 'LCS24F-02', 'LCS24F-02', '', ''],
-            'BTU': [12000, 12000, 18000, 18000, 18000, 18000, 18000, 18000, 12000, 18000, 12000, 18000,
-                   18000, 12000, 18000, 18000, 18000, 12000, 12000, 12000, 18000, 18000, 12000, 12000,
-                   24000, 24000, 24000, 12000, 18000, 12000, 12000, 24000, 24000, 24000, 24000, 24000,
-                   24000, 24000, 24000, 0, 12000],
-            'Data Manutenção': ['']*41,
-            'Técnico Executante': ['']*41,
-            'Aprovação Supervisor': ['']*41,
-            'Próxima manutenção': ['']*41,
-            'Observações': ['']*41
-        }
-        st.session_state.data = pd.DataFrame(initial_data)
-        st.session_state.data['BTU'] = st.session_state.data['BTU'].astype(str)
+        # A base local é a fonte de verdade; o remoto só é consultado na primeira execução
+        if store.is_new():
+            storage = get_storage()
+            credentials = storage.credentials(load_config())
+            saved_data = load_devices(credentials, storage) if credentials else None
+            if saved_data is not None:
+                store.replace_all(saved_data, synced=True, remote_id=storage.identity())
+            else:
+                # Sem armazenamento remoto, usa os dados iniciais. Nada é enviado até a
+                # sincronização ler os dados remotos (veja adopt_remote)
+                store.replace_all(initial_devices(), synced=True, seed=True)
+        load_session_from_store()
+    elif st.session_state.get('store_version') != store.version:
+        # Outra sessão ou a sincronização alterou a base local
+        load_session_from_store()
+
+def initial_devices():
+    """Aparelhos cadastrados inicialmente (usados quando não há base local nem GitHub)"""
+    initial_data = {
+        'TAG': list(range(1, 42)),
+        'Local': ['Matriz']*20 + ['Filial']*13 + ['Matriz']*8,
+        'Setor': ['Recepção', 'CPD', 'CPD', 'RH', 'Marketing', 'Marketing', 'Inteligência de mercado',
+                 'Antigo Show Room', 'Diretoria - Rafael', 'Controladoria', 'Diretoria - Jair',
+                 'Sala reunião térreo', 'Financeiro', 'Diretoria', 'Sala reunião principal',
+                 'Sala reunião principal', 'Expedição - Recepção', 'Expedição - Sala Welder',
+                 'Corte - Risco', 'Estoque - Sala Umberto', 'Laboratório - Sala ADM',
+                 'Laboratório - Sala ADM', 'Gerência', 'Modelagem', 'Inteligência do Produto',
+                 'Estilo', 'Show Room', 'T.I.', 'PCP', 'PCP', 'Compras', 'Refeitório', 'Refeitório',
+                 'Refeitório', 'Sala de Reunião', 'Estúdio', 'Estúdio', 'Refeitório', 'Refeitório',
+                 'Sala Expedição Kids', 'Ecommerce'],
+        'Marca': ['Springer', 'Philco', 'Elgin', 'Springer', 'TCL', 'TCL', 'TCL', 'Springer',
+                 'Springer', 'Springer', 'COMFEE', 'COMFEE', 'Springer', 'Springer', 'Springer',
+                 'Springer', 'Philco', 'Agratto', 'COMFEE', 'GREE', 'GREE', 'GREE', 'GREE', 'GREE',
+                 'GREE', 'GREE', 'GREE', 'Consul', 'Electrolux', 'GREE', 'Philco', 'GREE', 'GREE',
+                 'GREE', 'GREE', 'Philco', 'Springer', 'Agratto', 'Agratto', '', ''],
+        'Modelo': ['42MACA12S5', 'Eco Inverter', 'HWFL18B2IA', '42MACB18S5', 'TAC18CSA1', 'TAC18CSA1',
+                  'TAC18CSA1', '42MACB18S5', '42AFFCL12', '42MACB18S5', '42AFCE12X5', '42AFCD18F5',
+                  '42MACB18S5', '42TFCA', '42MACB18S5', '42MACB18S5', 'Eco Inverter', 'ACST12FR4-02',
+                  '42AFCD12F5', 'GWC12QC-D3NNB4D/I', 'GWC18AAD-D3NNA1D/I', 'GWC18AAD-D3NNA1D/I',
+                  'GWC12AAC-D3NNB4D/I', 'GWC12AAC-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I',
+                  'GWC24QE-D3NNB4D/I', '', 'VI18F', 'GWC12QC-D3NNB4D/I', 'Eco Inverter',
+                  'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I', 'GWC24QE-D3NNB4D/I',
+                  '', '', 'LCS24F-02', 'LCS24F-02', '', ''],
+        'BTU': [12000, 12000, 18000, 18000, 18000, 18000, 18000, 18000, 12000, 18000, 12000, 18000,
+               18000, 12000, 18000, 18000, 18000, 12000, 12000, 12000, 18000, 18000, 12000, 12000,
+               24000, 24000, 24000, 12000, 18000, 12000, 12000, 24000, 24000, 24000, 24000, 24000,
+               24000, 24000, 24000, 0, 12000],
+        'Data Manutenção': ['']*41,
+        'Técnico Executante': ['']*41,
+        'Aprovação Supervisor': ['']*41,
+        'Próxima manutenção': ['']*41,
+        'Observações': ['']*41
+    }
+    return to_typed(pd.DataFrame(initial_data))
 
 # Função para salvar dados
-def save_data():
+def save_data(events=None):
     try:
+        # Grava primeiro na base local, só as linhas alteradas (e o histórico, se houver)
+        devices = get_devices()
+        store = get_local_store()
+        changed, deleted = devices.pop_changes()
+        loaded_version = st.session_state.get('store_version')
+        base_version = st.session_state.get('seen_version') or loaded_version
+        try:
+            version = store.apply_changes(devices.data, changed, deleted, events, base_version=base_version)
+        except EditConflict as e:
+            load_session_from_store()
+            st.error(f"Não foi possível salvar: a(s) TAG(s) {', '.join(e.tags)} foi(ram) alterada(s) por "
+                     "outra pessoa enquanto você editava. Os dados foram recarregados; confira e refaça a alteração.")
+            return False
+        if version == loaded_version + 1:
+            st.session_state.store_version = version
+        else:
+            # Outra sessão gravou durante esta execução; a sessão passa a ver as duas alterações
+            load_session_from_store()
+        
         # Carrega configurações
-        config = load_config()
-        token = config.get('github_token', '')
+        storage = get_storage()
+        credentials = storage.credentials(load_config())
         
-        if not token:
-            st.error("Token de acesso ao GitHub não configurado. Configure na página de Configuração.")
-            return False
+        if not credentials:
+            st.warning(f"Dados salvos localmente. Configure o acesso ao {storage.label} na página de "
+                       "Configuração para sincronizar.")
+            return True
+        if not store.has_remote_base():
+            st.info(f"Dados salvos localmente; serão enviados ao {storage.label} depois que a "
+                    "sincronização ler os dados de lá.")
+            return True
         
-        # Salva no GitHub
-        if save_to_github(REPO, FILE_PATH, st.session_state.data, token):
-            st.success("Dados salvos no GitHub com sucesso!")
+        # Enfileira a sincronização; alterações próximas viram uma única gravação
+        queue = get_save_queue(storage)
+        if not queue.submit(st.session_state.data, credentials, version=version):
+            st.warning(f"Dados salvos localmente; o envio ao {storage.label} será repetido automaticamente.")
             return True
+        if queue.window > 0:
+            st.success(f"Dados salvos; serão enviados ao {storage.label} em até {queue.window:g} s.")
         else:
-            st.error("Falha ao salvar dados no GitHub.")
-            return False
+            st.success(f"Dados salvos no {storage.label} com sucesso!")
+        return True
     except Exception as e:
         st.error(f"Erro ao salvar dados: {str(e)}")
         return False
 
+def replace_session_data(data, storage=None):
+    """Substitui a base local e a sessão pelos dados carregados do armazenamento remoto"""
+    store = get_local_store()
+    store.replace_all(data, synced=True, remote_id=(storage or get_storage()).identity())
+    load_session_from_store()
+
+# Facetas dos filtros da consulta
+FACET_COLUMNS = ['Local', 'Setor', 'Marca']
+
+def build_facet_index(data, schedule):
+    """Contagem de aparelhos e atrasos por combinação Local/Setor/Marca.
+
+    A tabela resultante tem uma linha por combinação existente, então as opções
+    dependentes e as contagens saem dela sem percorrer a frota de novo.
+    """
+    overdue = pd.Series((schedule['Situação'] == STATUS_OVERDUE).to_numpy(), index=data.index)
+    facets = overdue.groupby([data[column] for column in FACET_COLUMNS], observed=True, sort=False, dropna=False).agg(
+        ['size', 'sum']
+    ).reset_index()
+    facets.columns = FACET_COLUMNS + ['units', 'overdue']
+    for column in FACET_COLUMNS:
+        facets[column] = facets[column].astype(object).fillna('').astype(str)
+    return facets
+
+def facet_options(facets, column, selections):
+    """Opções de um filtro, restritas pelas seleções dos demais, com contagens"""
+    mask = np.ones(len(facets), dtype=bool)
+    for other, value in selections.items():
+        if other != column and value != "Todos":
+            mask &= (facets[other] == value).to_numpy()
+    options = facets[mask].groupby(column, sort=True)[['units', 'overdue']].sum()
+    return options
+
+def get_facets():
+    """Índice de facetas da sessão, reconstruído só quando os dados mudam"""
+    key = (data_version(), datetime.now().date())
+    cached = st.session_state.get('facet_cache')
+    if cached is None or cached[0] != key:
+        schedule = get_schedule()
+        cached = (key, snapshot_cache('facets', key[1:] + (load_config()['maintenance_interval_days'],),
+                                      lambda: build_facet_index(st.session_state.data, schedule)))
+        st.session_state.facet_cache = cached
+    return cached[1]
+
+def facet_selectbox(label, facets, selections):
+    """Selectbox de um filtro com opções dependentes e contagem de aparelhos/atrasos"""
+    options = facet_options(facets, label, selections)
+    values = ["Todos"] + options.index.tolist()
+    current = selections[label] if selections[label] in values else "Todos"
+    
+    def format_option(value):
+        if value == "Todos":
+            return "Todos"
+        units, overdue = options.loc[value, 'units'], options.loc[value, 'overdue']
+        return f"{value or '(vazio)'} ({units} · {overdue} atrasados)"
+    
+    # A chave guarda a seleção; o índice a preserva quando as contagens mudam o rótulo
+    return st.selectbox(label, values, index=values.index(current), format_func=format_option,
+                        key=f"filtro_{label}")
+
+# Exportação da consulta (gerada só quando pedida, em blocos)
+# rótulo -> (extensão, tipo MIME)
+EXPORT_FORMATS = {
+    "CSV (.csv)": ("csv", "text/csv"),
+    "CSV compactado (.csv.gz)": ("csv.gz", "application/gzip"),
+    "Parquet (.parquet)": ("parquet", "application/vnd.apache.parquet"),
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def export_chunks(data, positions, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Percorre as linhas selecionadas em blocos, sem copiar a tabela inteira"""
+    # O texto original de valores inválidos acompanha o bloco (to_csv_frame o devolve à coluna)
+    raw_columns = [column for column in RAW_COLUMNS.values() if column in data.columns]
+    for start in range(0, len(positions), chunk_rows):
+        yield data.iloc[positions[start:start + chunk_rows]][DEVICE_COLUMNS + raw_columns]
+
+def write_csv_export(chunks, target, compress=False):
+    opener = gzip.open if compress else open
+    with opener(target, 'wt', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            to_csv_frame(chunk).to_csv(f, header=(i == 0), index=False)
+
+def write_parquet_export(chunks, target):
+    """Parquet mantém os tipos (datas, categorias); cada bloco vira um row group"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(target, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_xlsx_export(chunks, target):
+    """Planilha em modo de escrita contínua do openpyxl (linha a linha)"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Aparelhos")
+    sheet.append(DEVICE_COLUMNS)
+    for chunk in chunks:
+        chunk = to_csv_frame(chunk).astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(target)
+
+def write_export(data, positions, extension, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Grava as linhas selecionadas no formato pedido, bloco a bloco"""
+    chunks = export_chunks(data, positions, chunk_rows)
+    if extension == 'parquet':
+        write_parquet_export(chunks, target)
+    elif extension == 'xlsx':
+        write_xlsx_export(chunks, target)
+    else:
+        write_csv_export(chunks, target, compress=extension == 'csv.gz')
+
+def prepare_export(data, positions, extension):
+    """Gera o arquivo de exportação em disco e retorna seu caminho"""
+    directory = os.path.join(CACHE_DIR, "exportacoes")
+    os.makedirs(directory, exist_ok=True)
+    # Remove exportações esquecidas por sessões que já terminaram
+    for old in Path(directory).iterdir():
+        if old.stat().st_mtime < time.time() - 3600:
+            old.unlink(missing_ok=True)
+    handle, target = tempfile.mkstemp(suffix=f".{extension}", dir=directory)
+    os.close(handle)
+    try:
+        write_export(data, positions, extension, target)
+    except Exception:
+        os.remove(target)
+        raise
+    return target
+
+def show_export_section(data, positions):
+    """Exporta a visão filtrada e ordenada; nada é serializado até o pedido"""
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        label = st.selectbox("Formato de exportação", list(EXPORT_FORMATS))
+    extension, mime = EXPORT_FORMATS[label]
+    request = (data_version(), hashlib.sha1(np.asarray(positions).tobytes()).hexdigest(), extension)
+    
+    prepared = st.session_state.get('export_file')
+    if prepared and prepared[0] != request:
+        # O filtro, a ordem ou os dados mudaram: descarta o arquivo anterior
+        if os.path.exists(prepared[1]):
+            os.remove(prepared[1])
+        prepared = st.session_state.export_file = None
+    
+    with col2:
+        if prepared is None:
+            if st.button(f"Preparar exportação ({len(positions)} aparelhos)"):
+                try:
+                    with st.spinner("Gerando arquivo..."):
+                        path = prepare_export(data, positions, extension)
+                    prepared = st.session_state.export_file = (request, path)
+                except ImportError:
+                    st.error("Formato indisponível: instale o pacote pyarrow (Parquet) ou openpyxl (Excel).")
+                except Exception as e:
+                    st.error(f"Erro ao exportar: {str(e)}")
+        if prepared is not None:
+            with open(prepared[1], 'rb') as f:
+                st.download_button(
+                    label="Baixar exportação",
+                    data=f,
+                    file_name=f"pmoc_export.{extension}",
+                    mime=mime
+                )
+
 # Página de Consulta
+PAGE_SIZES = [25, 50, 100, 200, 500]
+SORT_COLUMNS = ["TAG", "Local", "Setor", "Marca", "Modelo", "BTU", "Data Manutenção", "Próxima manutenção (calculada)"]
+
+def filter_mask(data, local="Todos", setor="Todos", marca="Todos"):
+    """Máscara booleana dos filtros da consulta ("Todos" não filtra)"""
+    mask = np.ones(len(data), dtype=bool)
+    for column, value in (('Local', local), ('Setor', setor), ('Marca', marca)):
+        if value != "Todos":
+            mask &= (data[column] == value).to_numpy()
+    return mask
+
+def search_mask(text):
+    """Marca os aparelhos da sessão encontrados pela busca; None se não há busca.
+
+    A consulta vai ao índice da base local e é guardada por texto e versão da
+    base, então mudar filtros ou página não refaz a busca.
+    """
+    store = get_local_store()
+    key = (text.strip(), store.version, data_version())
+    cached = st.session_state.get('search_cache')
+    if cached is None or cached[0] != key:
+        with span("search", terms=len(SEARCH_TOKEN.findall(text))):
+            tags = store.search(text)
+            mask = None
+            if tags is not None:
+                devices = get_devices()
+                labels = [devices.label(tag) for tag in tags if tag in devices]
+                mask = np.zeros(len(devices.data), dtype=bool)
+                positions = devices.data.index.get_indexer(labels)
+                mask[positions[positions >= 0]] = True
+        cached = (key, mask)
+        st.session_state.search_cache = cached
+    return cached[1]
+
+def filter_devices(data, local="Todos", setor="Todos", marca="Todos"):
+    """Aplica os filtros da consulta ("Todos" não filtra)"""
+    return data[filter_mask(data, local, setor, marca)]
+
+def sort_keys(series):
+    """Chaves de ordenação; categóricas seguem a ordem alfabética, não a de inclusão"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str)
+        rank = np.empty(len(categories), dtype=np.int64)
+        rank[np.argsort(categories.to_numpy(), kind='stable')] = np.arange(len(categories))
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, rank[codes], -1)
+    return series.to_numpy()
+
+def sorted_positions(data, schedule, positions, sort_column, ascending=True):
+    """Ordena (no servidor) as posições filtradas pela coluna escolhida"""
+    if sort_column == "Próxima manutenção (calculada)":
+        column = schedule['Próxima manutenção (data)']
+    else:
+        column = data[sort_column]
+    keys = pd.Series(sort_keys(column.iloc[positions]))
+    order = keys.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return positions[order]
+
+TAG_RANGE = re.compile(r'^(\d+)(?:\s*-\s*(\d+))?$')
+
+def parse_tag_ranges(text):
+    """'101, 105-120' -> [(101, 101), (105, 120)]; levanta ValueError para trechos que não são TAG nem faixa"""
+    ranges = []
+    for part in re.split(r'[,;]', text):
+        part = part.strip()
+        if not part:
+            continue
+        match = TAG_RANGE.match(part)
+        if not match:
+            raise ValueError(f"'{part}' não é uma TAG nem uma faixa (ex.: 105-120)")
+        start, end = int(match.group(1)), int(match.group(2) or match.group(1))
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+def tag_ranges_mask(tags, ranges):
+    """Máscara dos aparelhos cuja TAG está em alguma das faixas"""
+    values = pd.to_numeric(tags, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    mask = np.zeros(len(values), dtype=bool)
+    for start, end in ranges:
+        mask |= (values >= start) & (values <= end)
+    return mask
+
+def discard_pdf_job():
+    """Esquece o relatório já baixado, para que as próximas reexecuções não o reenviem"""
+    st.session_state.pdf_job = None
+
+@traced()
 def show_consultation_page():
     st.header("Consulta de Aparelhos")
+    data = st.session_state.data
     
-    # Filtros
+    busca = st.text_input("Buscar", placeholder="Ex.: vazamento, GWC24, reunião",
+                          help="Procura em Observações, Setor, Modelo e Marca, sem diferenciar acentos, "
+                               "pelo início das palavras")
+    
+    # Filtros: cada lista mostra só opções compatíveis com os demais filtros
+    facets = get_facets()
+    selections = {column: st.session_state.get(f"filtro_{column}", "Todos") for column in FACET_COLUMNS}
     col1, col2, col3 = st.columns(3)
     with col1:
-        local_filter = st.selectbox("Local", ["Todos"] + list(st.session_state.data['Local'].unique()))
+        local_filter = facet_selectbox("Local", facets, selections)
     with col2:
-        setor_filter = st.selectbox("Setor", ["Todos"] + list(st.session_state.data['Setor'].unique()))
+        setor_filter = facet_selectbox("Setor", facets, selections)
     with col3:
-        marca_filter = st.selectbox("Marca", ["Todos"] + list(st.session_state.data['Marca'].unique()))
-    
-    # Aplicar filtros
-    filtered_data = st.session_state.data.copy()
-    if local_filter != "Todos":
-        filtered_data = filtered_data[filtered_data['Local'] == local_filter]
-    if setor_filter != "Todos":
-        filtered_data = filtered_data[filtered_data['Setor'] == setor_filter]
-    if marca_filter != "Todos":
-        filtered_data = filtered_data[filtered_data['Marca'] == marca_filter]
-    
-    # Calcular próxima manutenção para exibição
-    display_data = filtered_data.copy()
-    
-    def calculate_next_maintenance(row):
-        if row['Data Manutenção'] and str(row['Data Manutenção']) != '':
-            try:
-                maintenance_date = datetime.strptime(str(row['Data Manutenção']), '%d/%m/%Y')
-                next_maintenance = maintenance_date + timedelta(days=180)
-                return next_maintenance.strftime('%d/%m/%Y')
-            except:
-                return 'data inválida'
-        return 'aguardando programação'
+        marca_filter = facet_selectbox("Marca", facets, selections)
     
-    display_data['Próxima manutenção (calculada)'] = display_data.apply(calculate_next_maintenance, axis=1)
+    # Aplicar filtros e busca: trabalha com posições, sem copiar a tabela
+    mask = filter_mask(data, local_filter, setor_filter, marca_filter)
+    encontrados = search_mask(busca)
+    if encontrados is not None:
+        mask = mask & encontrados
+        st.caption(f"{int(encontrados.sum())} aparelhos encontrados para \"{busca.strip()}\"")
+    positions = np.flatnonzero(mask)
+    
+    # Próxima manutenção calculada uma vez por versão dos dados
+    schedule = get_schedule()
     
     # Seção de Relatório PDF
     st.subheader("Gerar Relatório em PDF")
-    selected_tags = st.multiselect(
-        "Selecione os aparelhos para incluir no relatório (deixe vazio para todos)",
-        options=filtered_data['TAG'].unique()
+    # TAGs e faixas digitadas: o navegador não recebe a lista de TAGs da frota
+    selected_text = st.text_input(
+        "TAGs para incluir no relatório (deixe vazio para todos os aparelhos da consulta)",
+        placeholder="Ex.: 101, 105-120"
     )
+    try:
+        tag_ranges = parse_tag_ranges(selected_text)
+    except ValueError as e:
+        st.error(f"Seleção de TAGs inválida: {e}")
+        tag_ranges = None
     
-    if st.button("Gerar Relatório PDF"):
-        if selected_tags:
-            report_data = filtered_data[filtered_data['TAG'].isin(selected_tags)]
+    # O PDF pronto só é reenviado enquanto a seleção for a mesma do pedido e não tiver sido baixado
+    pdf_selection = (local_filter, setor_filter, marca_filter, busca.strip(), tuple(tag_ranges or ()))
+    if st.session_state.get('pdf_job_selection') != pdf_selection:
+        st.session_state.pdf_job = None
+    
+    if st.button("Gerar Relatório PDF", disabled=tag_ranges is None):
+        filtered_data = data.iloc[positions]
+        if tag_ranges:
+            report_data = filtered_data[tag_ranges_mask(filtered_data['TAG'], tag_ranges)]
             title = f"Relatório de Aparelhos Selecionados ({len(report_data)} itens)"
         else:
             report_data = filtered_data
             title = f"Relatório Completo de Aparelhos ({len(report_data)} itens)"
         
-        pdf_file = generate_pdf_report(report_data, title)
-        
-        if pdf_file:
-            with open(pdf_file, "rb") as f:
-                pdf_bytes = f.read()
-            
+        if report_data.empty:
+            st.error("Nenhum aparelho da consulta tem as TAGs informadas!")
+        else:
+            # A geração roda em outro processo; a página não fica travada
+            try:
+                st.session_state.pdf_job = get_report_jobs().submit(report_data, title)
+                st.session_state.pdf_job_selection = pdf_selection
+            except Exception as e:
+                st.error(f"Erro ao gerar PDF: {str(e)}")
+    
+    if st.session_state.get('pdf_job'):
+        situacao, resultado = get_report_jobs().status(st.session_state.pdf_job, wait=1.0)
+        if situacao == 'gerando':
+            st.info("Gerando o relatório em segundo plano...")
+            st.button("Atualizar andamento do relatório")
+        elif situacao == 'erro':
+            st.error(f"Erro ao gerar PDF: {resultado}")
+            st.session_state.pdf_job = None
+        else:
             st.download_button(
                 label="Baixar Relatório PDF",
-                data=pdf_bytes,
+                data=resultado,
                 file_name=f"relatorio_pmoc_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-                mime="application/pdf"
+                mime="application/pdf",
+                on_click=discard_pdf_job
             )
-            
-            # Limpeza
-            os.unlink(pdf_file)
+    
+    # Ordenação e paginação no servidor: só a página visível vai para o navegador
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_column = st.selectbox("Ordenar por", SORT_COLUMNS)
+    with col2:
+        ascending = st.selectbox("Ordem", ["Crescente", "Decrescente"]) == "Crescente"
+    with col3:
+        page_size = st.selectbox("Itens por página", PAGE_SIZES, index=1)
+    page_count = max(1, -(-len(positions) // page_size))
+    with col4:
+        page = st.number_input("Página", min_value=1, max_value=page_count, value=1, step=1)
+    
+    ordered = sorted_positions(data, schedule, positions, sort_column, ascending)
+    start = (page - 1) * page_size
+    page_positions = ordered[start:start + page_size]
     
     # Mostrar dados com a coluna calculada
     columns_to_show = [
@@ -262,6 +2659,10 @@ def show_consultation_page():
         "Técnico Executante", "Aprovação Supervisor", "Observações"
     ]
     
+    display_data = data.iloc[page_positions].assign(**{
+        'Próxima manutenção (calculada)': schedule['Próxima manutenção (calculada)'].to_numpy()[page_positions]
+    })
+    
     st.dataframe(
         display_data[columns_to_show],
         use_container_width=True,
@@ -273,47 +2674,37 @@ def show_consultation_page():
             "Marca": "Marca",
             "Modelo": "Modelo",
             "BTU": "BTU",
-            "Data Manutenção": st.column_config.TextColumn(
+            "Data Manutenção": st.column_config.DateColumn(
                 "Data Manutenção",
+                format="DD/MM/YYYY",
                 help="Data da última manutenção"
             ),
             "Próxima manutenção (calculada)": st.column_config.Column(
                 "Próxima Manutenção",
-                help="Calculada automaticamente como Data Manutenção + 180 dias"
+                help=f"Calculada automaticamente como Data Manutenção + {load_config()['maintenance_interval_days']} dias"
             ),
             "Técnico Executante": "Técnico",
             "Aprovação Supervisor": "Aprovação",
             "Observações": "Observações"
         }
     )
+    if len(positions):
+        st.caption(f"Mostrando {start + 1}–{start + len(page_positions)} de {len(positions)} aparelhos")
     
-    # Botão de exportação
-    st.download_button(
-        label="Exportar para CSV",
-        data=st.session_state.data.to_csv(index=False).encode('utf-8'),
-        file_name='pmoc_export.csv',
-        mime='text/csv'
-    )
+    # Exportação da visão filtrada, na ordem exibida
+    show_export_section(data, ordered)
     
     # Estatísticas
     st.subheader("Estatísticas")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total de Aparelhos", len(filtered_data))
+        st.metric("Total de Aparelhos", len(positions))
     with col2:
-        with_maintenance = len(filtered_data[filtered_data['Data Manutenção'] != ''])
+        with_maintenance = int((~blank_mask(data['Data Manutenção'])[positions]).sum())
         st.metric("Com manutenção registrada", with_maintenance)
     with col3:
         try:
-            overdue_count = 0
-            for _, row in display_data.iterrows():
-                if row['Próxima manutenção (calculada)'] not in ['aguardando programação', 'data inválida']:
-                    try:
-                        next_date = datetime.strptime(row['Próxima manutenção (calculada)'], '%d/%m/%Y')
-                        if next_date < datetime.now():
-                            overdue_count += 1
-                    except:
-                        pass
+            overdue_count = int((schedule['Situação'].to_numpy()[positions] == STATUS_OVERDUE).sum())
             st.metric("Manutenções Atrasadas", overdue_count, delta=f"-{overdue_count}" if overdue_count > 0 else None)
         except Exception as e:
             st.error(f"Erro ao calcular atrasos: {str(e)}")
@@ -326,112 +2717,630 @@ def show_consultation_page():
     st.sidebar.text("2025")
 
 # Gerar relatório PDF
-def generate_pdf_report(data, title="Relatório de Aparelhos"):
-    try:
-        pdf = FPDF(orientation='L')
-        pdf.add_page()
-        
-        # Configuração de fonte e cores
-        pdf.set_font("Arial", size=9)
-        pdf.set_text_color(0, 0, 0)
-        
-        # Ajuste do fuso horário
-        tz = pytz.timezone('America/Sao_Paulo')
-        now = datetime.now(tz)
-        
-        # Cabeçalho
-        pdf.set_font("Arial", 'B', 16)
-        pdf.cell(0, 10, "PMOC - Plano de Manutenção, Operação e Controle - AKR Brands", 0, 1, 'C')
-        pdf.ln(5)
-        
-        # Título do relatório
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, title, 0, 1, 'C')
-        pdf.ln(5)
-        
-        # Data e hora
-        pdf.set_font("Arial", 'I', 9)
-        pdf.cell(0, 10, f"Gerado em: {now.strftime('%d/%m/%Y %H:%M')}", 0, 1, 'R')
-        pdf.ln(8)
-        
-        # Configuração das colunas
-        col_widths = [12, 20, 30, 20, 25, 12, 25, 25, 25, 25, 40]
-        headers = [
-            "TAG", "Local", "Setor", "Marca", "Modelo", 
-            "BTU", "Última Manut.", "Próx. Manut.", 
-            "Técnico", "Aprovação", "Observações"
-        ]
-        
-        # Cabeçalho da tabela
-        pdf.set_font("Arial", 'B', 8)
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 8, header, 1, 0, 'C')
+PDF_ROW_HEIGHT = 6
+PDF_HEADER_HEIGHT = 8
+
+# (coluna, cabeçalho, largura, máx. de caracteres, alinhamento, texto se vazio)
+PDF_COLUMNS = [
+    ('TAG', "TAG", 12, 10, 'C', ''),
+    ('Local', "Local", 20, 18, 'L', ''),
+    ('Setor', "Setor", 30, 25, 'L', ''),
+    ('Marca', "Marca", 20, 18, 'L', ''),
+    ('Modelo', "Modelo", 25, 22, 'L', ''),
+    ('BTU', "BTU", 12, 10, 'C', ''),
+    ('Data Manutenção', "Última Manut.", 25, 10, 'C', 'N/A'),
+    ('Próxima manutenção', "Próx. Manut.", 25, 10, 'C', 'N/A'),
+    ('Técnico Executante', "Técnico", 25, 22, 'L', ''),
+    ('Aprovação Supervisor', "Aprovação", 25, 22, 'L', ''),
+    ('Observações', "Observações", 40, 60, 'L', 'Nenhuma'),
+]
+
+def build_report_cells(data):
+    """Pré-calcula, coluna a coluna, o texto de cada célula da tabela do relatório"""
+    columns = []
+    for column, _, _, max_chars, _, empty in PDF_COLUMNS:
+        series = data[column] if column in data.columns else pd.Series('', index=data.index)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            text = format_br_dates(series)
+        else:
+            text = series.astype(str).str[:max_chars]
+        blank = blank_mask(series) if empty else series.isna().to_numpy()
+        if RAW_COLUMNS.get(column) in data.columns:
+            raw = data[RAW_COLUMNS[column]]
+            text = with_raw_text(text, raw)
+            blank = blank & (np.asarray(raw, dtype=object) == '')
+        columns.append(np.where(blank, empty, text.to_numpy(dtype=object)))
+    return columns
+
+def draw_table_header(pdf):
+    pdf.set_font("Helvetica", 'B', 8)
+    for _, header, width, _, _, _ in PDF_COLUMNS:
+        pdf.cell(width, PDF_HEADER_HEIGHT, header, border=1, align='C')
+    pdf.ln()
+    pdf.set_font("Helvetica", size=7)
+
+def build_pdf_report(data, title="Relatório de Aparelhos"):
+    """Monta o relatório PDF em memória, repetindo o cabeçalho da tabela em cada página"""
+    # fpdf2 e pytz só são importados quando um relatório é gerado (a importação do
+    # fpdf2 sozinha custa ~0,25 s na partida do app)
+    from fpdf import FPDF
+    import pytz
+    
+    pdf = FPDF(orientation='L')
+    pdf.add_page()
+    
+    # Configuração de fonte e cores
+    pdf.set_font("Helvetica", size=9)
+    pdf.set_text_color(0, 0, 0)
+    
+    # Ajuste do fuso horário
+    tz = pytz.timezone('America/Sao_Paulo')
+    now = datetime.now(tz)
+    
+    # Cabeçalho
+    pdf.set_font("Helvetica", 'B', 16)
+    pdf.cell(0, 10, "PMOC - Plano de Manutenção, Operação e Controle - AKR Brands", 0, 1, 'C')
+    pdf.ln(5)
+    
+    # Título do relatório
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.cell(0, 10, title, 0, 1, 'C')
+    pdf.ln(5)
+    
+    # Data e hora
+    pdf.set_font("Helvetica", 'I', 9)
+    pdf.cell(0, 10, f"Gerado em: {now.strftime('%d/%m/%Y %H:%M')}", 0, 1, 'R')
+    pdf.ln(8)
+    
+    # Tabela: o texto das células é calculado uma vez, fora do laço de desenho.
+    # As células usam argumentos nomeados; o parâmetro posicional `ln` do fpdf2
+    # está obsoleto e inspeciona a pilha a cada chamada.
+    cells = build_report_cells(data)
+    layout = [(width, align) for _, _, width, _, align, _ in PDF_COLUMNS]
+    draw_table_header(pdf)
+    for row in zip(*cells):
+        if pdf.get_y() + PDF_ROW_HEIGHT > pdf.page_break_trigger:
+            pdf.add_page()
+            draw_table_header(pdf)
+        for (width, align), cell in zip(layout, row):
+            pdf.cell(width, PDF_ROW_HEIGHT, cell, border=1, align=align)
         pdf.ln()
-        
-        # Conteúdo da tabela
-        pdf.set_font("Arial", size=7)
-        for _, row in data.iterrows():
-            cells = [
-                str(row['TAG'])[:10] if pd.notna(row['TAG']) else '',
-                str(row['Local'])[:18] if pd.notna(row['Local']) else '',
-                str(row['Setor'])[:25] if pd.notna(row['Setor']) else '',
-                str(row['Marca'])[:18] if pd.notna(row['Marca']) else '',
-                str(row['Modelo'])[:22] if pd.notna(row['Modelo']) else '',
-                str(row['BTU'])[:10] if pd.notna(row['BTU']) else '',
-                str(row['Data Manutenção'])[:10] if pd.notna(row['Data Manutenção']) and str(row['Data Manutenção']) != '' else 'N/A',
-                str(row['Próxima manutenção'])[:10] if pd.notna(row['Próxima manutenção']) and str(row['Próxima manutenção']) != '' else 'N/A',
-                str(row['Técnico Executante'])[:22] if pd.notna(row['Técnico Executante']) else '',
-                str(row['Aprovação Supervisor'])[:22] if pd.notna(row['Aprovação Supervisor']) else '',
-                str(row['Observações'])[:60] if pd.notna(row['Observações']) and str(row['Observações']) != '' else 'Nenhuma'
-            ]
-            
-            for i, cell in enumerate(cells):
-                pdf.cell(col_widths[i], 6, cell, 1, 0, 'C' if i in [0, 5, 6, 7] else 'L')
-            pdf.ln()
-        
-        # Estatísticas
-        pdf.ln(10)
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 10, "Estatísticas:", 0, 1)
-        pdf.set_font("Arial", size=10)
-        
-        total = len(data)
-        pdf.cell(0, 10, f"Total de Aparelhos: {total}", 0, 1)
-        
+    
+    # Estatísticas
+    pdf.ln(10)
+    pdf.set_font("Helvetica", 'B', 12)
+    pdf.cell(0, 10, "Estatísticas:", 0, 1)
+    pdf.set_font("Helvetica", size=10)
+    
+    total = len(data)
+    pdf.cell(0, 10, f"Total de Aparelhos: {total}", 0, 1)
+    
+    try:
+        schedule = compute_maintenance_schedule(data, source='Próxima manutenção')
+        counts = maintenance_status_counts(schedule)
+        next_maintenance = total - counts[STATUS_PENDING]
+        pdf.cell(0, 10, f"Com próxima manutenção agendada: {next_maintenance}", 0, 1)
+        pdf.cell(0, 10, f"Manutenções atrasadas: {counts[STATUS_OVERDUE]}", 0, 1)
+    except Exception as e:
+        pdf.cell(0, 10, f"Erro ao calcular estatísticas: {str(e)[:50]}", 0, 1)
+    
+    # Rodapé
+    pdf.ln(15)
+    pdf.set_font("Helvetica", 'I', 8)
+    pdf.cell(0, 10, "Sistema PMOC - AKR Brands", 0, 0, 'C')
+    
+    return pdf
+
+@traced()
+def render_pdf_bytes(data, title="Relatório de Aparelhos"):
+    return bytes(build_pdf_report(data, title).output())
+
+# Fila de relatórios PDF em segundo plano e cache por conteúdo
+def report_cache_key(data, title, today=None):
+    """Endereço do relatório: linhas, título, versão do modelo e dia.
+
+    O dia entra na chave porque as estatísticas de atraso dependem da data atual.
+    """
+    columns = [column for column, *_ in PDF_COLUMNS if column in data.columns]
+    digest = hashlib.sha256()
+    digest.update("|".join(columns).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data[columns], index=False).to_numpy().tobytes())
+    digest.update(f"|{title}|{PDF_TEMPLATE_VERSION}|{today or datetime.now().date()}".encode("utf-8"))
+    return digest.hexdigest()
+
+class ReportCache:
+    """Relatórios prontos em disco, com remoção do menos usado ao passar do limite"""
+    
+    def __init__(self, directory, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        # Reconstrói a ordem de uso pela data de modificação dos arquivos
+        files = sorted(Path(directory).glob("*.pdf"), key=lambda path: path.stat().st_mtime)
+        self.entries = OrderedDict((path.stem, path.stat().st_size) for path in files)
+        self._evict()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+    
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+    
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    content = f.read()
+            except OSError:
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            os.utime(self._path(key))
+            self.hits += 1
+            return content
+    
+    def put(self, key, content):
+        with self.lock:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(key))
+            self.entries[key] = len(content)
+            self.entries.move_to_end(key)
+            self._evict()
+    
+    def size(self):
+        return sum(self.entries.values())
+    
+    def _evict(self):
+        # Mantém sempre o mais recente, mesmo que sozinho passe do limite
+        while len(self.entries) > 1 and self.size() > self.max_bytes:
+            key, _ = self.entries.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+def pdf_worker():
+    """Função executada nos processos filhos.
+
+    No `streamlit run` este script é o módulo __main__, que os processos filhos
+    não conseguem importar; por isso a função é buscada no módulo `pmoc`.
+    """
+    if __name__ != "__main__":
+        return render_pdf_bytes
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    return importlib.import_module(Path(__file__).stem).render_pdf_bytes
+
+class ReportJobs:
+    """Gera relatórios num pool de processos; pedidos iguais reaproveitam o cache"""
+    
+    def __init__(self, cache, workers=PDF_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = None
+    
+    def _new_executor(self):
+        # "spawn": com fork, o filho herdaria as threads do servidor do Streamlit
+        # (e locks que estivessem presos no momento da cópia)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    def submit(self, data, title):
+        """Enfileira o relatório e retorna sua chave (imediato se já estiver no cache)"""
+        key = report_cache_key(data, title)
+        with self.lock:
+            if key in self.cache:
+                return key
+            job = self.jobs.get(key)
+            if job is not None and not (job.done() and job.exception()):
+                return key
+            if self.executor is None:
+                self.executor = self._new_executor()
+            try:
+                job = self.executor.submit(pdf_worker(), data, title)
+            except BrokenProcessPool:
+                self.executor = self._new_executor()
+                job = self.executor.submit(pdf_worker(), data, title)
+            # O render roda em outro processo; o tempo do job é medido aqui
+            recorder, started = get_span_recorder(), time.perf_counter()
+            job.add_done_callback(lambda done: self._finished(key, done, recorder, started))
+            self.jobs[key] = job
+        return key
+    
+    def _finished(self, key, job, recorder, started):
+        failed = job.cancelled() or job.exception() is not None
+        entry = {'span': 'pdf_job', 'parent': None, 'report': key[:12],
+                 'ms': round((time.perf_counter() - started) * 1000, 3),
+                 'at': datetime.now().isoformat(timespec='milliseconds')}
+        if failed:
+            entry['error'] = type(job.exception()).__name__ if not job.cancelled() else 'Cancelled'
+        else:
+            entry['bytes'] = len(job.result())
+        recorder.record(entry)
+        if failed:
+            return
+        self.cache.put(key, job.result())
+        with self.lock:
+            self.jobs.pop(key, None)
+    
+    def status(self, key, wait=0):
+        """Retorna (situação, conteúdo ou mensagem): 'pronto', 'gerando' ou 'erro'"""
+        with self.lock:
+            job = self.jobs.get(key)
+        if job is not None and wait:
+            try:
+                job.result(timeout=wait)
+            except Exception:
+                pass
+        content = self.cache.get(key)
+        if content is not None:
+            return 'pronto', content
+        if job is None:
+            return 'erro', "Relatório não encontrado; gere novamente."
+        if job.done():
+            if job.exception() is not None:
+                return 'erro', str(job.exception())
+            # Resultado pronto, mas o callback ainda não gravou no cache
+            return 'pronto', job.result()
+        return 'gerando', None
+
+def get_report_jobs():
+    """Fila de relatórios compartilhada pelo processo"""
+    state = get_shared_state("report_jobs")
+    if "jobs" not in state:
+        state["jobs"] = ReportJobs(ReportCache(os.path.join(CACHE_DIR, "relatorios")))
+        atexit.register(lambda: state["jobs"].executor and state["jobs"].executor.shutdown(cancel_futures=True))
+    return state["jobs"]
+
+# Importação em lote de aparelhos (CSV/Excel)
+IMPORT_REQUIRED = ['TAG', 'Local', 'Setor', 'Marca', 'BTU']
+BTU_MIN, BTU_MAX = 0, 120000  # mesma faixa na importação e nos formulários; 0 = capacidade não informada
+BTU_RANGE_ERROR = f"BTU fora da faixa {BTU_MIN}–{BTU_MAX}"
+
+def btu_out_of_range(btu):
+    """Aceita um número ou uma série (a importação valida a coluna inteira)"""
+    return (btu < BTU_MIN) | (btu > BTU_MAX)
+
+def read_import_file(uploaded):
+    """Lê a planilha enviada como texto puro (a validação converte os tipos)"""
+    content = uploaded.getvalue()
+    if uploaded.name.lower().endswith(('.xlsx', '.xls')):
+        raw = pd.read_excel(io.BytesIO(content), dtype=str, keep_default_na=False)
+    else:
         try:
-            next_maintenance = len(data[(data['Próxima manutenção'].notna()) & (data['Próxima manutenção'] != '')])
-            pdf.cell(0, 10, f"Com próxima manutenção agendada: {next_maintenance}", 0, 1)
-            
-            overdue_count = 0
-            for _, row in data.iterrows():
-                if pd.notna(row['Próxima manutenção']) and str(row['Próxima manutenção']) != '':
-                    try:
-                        next_date = datetime.strptime(str(row['Próxima manutenção']), '%d/%m/%Y')
-                        if next_date < datetime.now():
-                            overdue_count += 1
-                    except:
-                        pass
-            
-            pdf.cell(0, 10, f"Manutenções atrasadas: {overdue_count}", 0, 1)
-        except Exception as e:
-            pdf.cell(0, 10, f"Erro ao calcular estatísticas: {str(e)[:50]}", 0, 1)
-        
-        # Rodapé
-        pdf.ln(15)
-        pdf.set_font("Arial", 'I', 8)
-        pdf.cell(0, 10, "Sistema PMOC - AKR Brands", 0, 0, 'C')
-        
-        # Gera o arquivo PDF
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        pdf.output(temp_file.name)
+            text = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = content.decode('latin-1')
+        # Aceita vírgula ou ponto e vírgula (padrão do Excel em português)
+        header = text.split('\n', 1)[0]
+        sep = ';' if header.count(';') > header.count(',') else ','
+        raw = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False, sep=sep)
+    raw.columns = [str(column).strip() for column in raw.columns]
+    return raw
+
+def parse_import_dates(series, blank):
+    """Aceita 'dd/mm/aaaa' e também datas do Excel ('aaaa-mm-dd ...')"""
+    dates = pd.to_datetime(series.where(~blank), format=DATE_FORMAT, errors='coerce')
+    retry = dates.isna() & ~blank
+    if retry.any():
+        dates[retry] = pd.to_datetime(series[retry], format='ISO8601', errors='coerce')
+    return dates
+
+def validate_import(raw, existing_tags, interval_days=MAINTENANCE_INTERVAL_DAYS):
+    """Valida a planilha inteira de uma vez.
+
+    Retorna (aparelhos aceitos já tipados, erros por linha). A coluna 'Linha'
+    dos erros segue a numeração da planilha (o cabeçalho é a linha 1).
+    """
+    missing = [column for column in IMPORT_REQUIRED if column not in raw.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(missing)}")
+    raw = raw.reset_index(drop=True)
+    for column in DEVICE_COLUMNS:
+        if column not in raw.columns:
+            raw[column] = ''
+    raw = raw[DEVICE_COLUMNS].fillna('').astype(str)
+    # Poucos valores distintos por coluna: limpa cada um só uma vez
+    for column in DEVICE_COLUMNS:
+        codes, uniques = pd.factorize(raw[column])
+        raw[column] = uniques.str.strip().to_numpy(dtype=object)[codes]
+    blank = {column: (raw[column] == '').to_numpy() for column in DEVICE_COLUMNS}
+    
+    tags = pd.to_numeric(raw['TAG'], errors='coerce')
+    btu = parse_btu(raw['BTU'])
+    dates = {column: parse_import_dates(raw[column], blank[column]) for column in DATE_COLUMNS}
+    tag_ok = tags.notna() & (tags > 0) & (tags % 1 == 0)
+    
+    checks = [(blank[column], f"{column} não informado") for column in IMPORT_REQUIRED]
+    checks += [
+        ((~tag_ok & ~blank['TAG']).to_numpy(), "TAG deve ser um número inteiro positivo"),
+        ((tag_ok & tags.duplicated(keep=False)).to_numpy(), "TAG repetida na planilha"),
+        ((tag_ok & tags.isin(list(existing_tags))).to_numpy(), "TAG já cadastrada"),
+        ((btu.isna() & ~blank['BTU']).to_numpy(), "BTU deve ser numérico"),
+        (btu_out_of_range(btu).fillna(False).to_numpy(dtype=bool), BTU_RANGE_ERROR),
+    ]
+    checks += [((dates[column].isna() & ~blank[column]).to_numpy(), f"{column}: data inválida")
+               for column in DATE_COLUMNS]
+    
+    rejected = np.zeros(len(raw), dtype=bool)
+    errors = []
+    for mask, message in checks:
+        if mask.any():
+            rejected |= mask
+            rows = np.flatnonzero(mask)
+            errors.append(pd.DataFrame({'Linha': rows + 2, 'TAG': raw['TAG'].to_numpy()[rows], 'Erro': message}))
+    errors = (pd.concat(errors).sort_values('Linha', kind='stable').reset_index(drop=True) if errors
+              else pd.DataFrame(columns=['Linha', 'TAG', 'Erro']))
+    
+    accepted = raw[~rejected].copy()
+    accepted['TAG'] = tags[~rejected].astype('int64')
+    for column in DATE_COLUMNS:
+        accepted[column] = dates[column][~rejected]
+    # Sem próxima manutenção informada, agenda a partir da data da última
+    agendar = accepted['Próxima manutenção'].isna()
+    accepted.loc[agendar, 'Próxima manutenção'] = (
+        accepted.loc[agendar, 'Data Manutenção'] + pd.Timedelta(days=interval_days))
+    return to_typed(accepted), errors
+
+# Planejamento: calendário de manutenções e carga dos técnicos
+PLAN_HORIZONS = {"3 meses": 91, "6 meses": 182, "1 ano": 365, "2 anos": 730}
+
+def unit_intervals(data, default_days, model_intervals=None, btu_intervals=None):
+    """Intervalo de cada aparelho em dias: por modelo, senão por BTU, senão o padrão"""
+    intervals = np.full(len(data), int(default_days), dtype='int64')
+    if btu_intervals:
+        by_btu = data['BTU'].astype('float64').map({float(btu): days for btu, days in btu_intervals.items()})
+        intervals = np.where(by_btu.notna(), by_btu.fillna(0).to_numpy(dtype='int64'), intervals)
+    if model_intervals:
+        by_model = data['Modelo'].astype(object).map(model_intervals)
+        intervals = np.where(by_model.notna(), by_model.fillna(0).to_numpy(dtype='int64'), intervals)
+    return intervals
+
+def project_occurrences(data, intervals, start, horizon_days):
+    """Todas as manutenções previstas no horizonte, sem laço por aparelho.
+
+    A primeira ocorrência é a última manutenção + intervalo; aparelhos atrasados ou
+    nunca mantidos entram no primeiro dia do horizonte. Retorna (posição do aparelho,
+    data de vencimento) como arrays NumPy, ordenados por vencimento.
+    """
+    start = np.datetime64(pd.Timestamp(start).normalize().to_datetime64(), 'D')
+    end = start + np.timedelta64(int(horizon_days), 'D')
+    last = data['Data Manutenção'].to_numpy(dtype='datetime64[D]')
+    step = np.maximum(intervals, 1).astype('timedelta64[D]')
+    first = np.where(np.isnat(last), start, last + step)
+    first = np.maximum(first, start)
+    counts = np.where(first <= end, (end - first) // step + 1, 0).astype('int64')
+    units = np.repeat(np.arange(len(data)), counts)
+    # Índice da ocorrência dentro de cada aparelho: 0, 1, 2, ...
+    offsets = np.arange(len(units)) - np.repeat(np.cumsum(counts) - counts, counts)
+    due = first[units] + offsets * step[units]
+    order = np.argsort(due, kind='stable')
+    return units[order], due[order]
+
+def assign_technicians(due, technicians, daily_capacity, start):
+    """Distribui as ocorrências pelos dias úteis respeitando a capacidade diária.
+
+    Cada ocorrência vai para o primeiro dia útil, a partir do vencimento, com vaga.
+    Com as vagas numeradas em sequência (capacidade total C por dia), a vaga da
+    i-ésima ocorrência é i + máx(venc_j * C - j) para j <= i, um máximo acumulado.
+    """
+    start = np.datetime64(pd.Timestamp(start).normalize().to_datetime64(), 'D')
+    per_day = len(technicians) * int(daily_capacity)
+    due_day = np.busday_count(start, np.busday_offset(due, 0, roll='forward'))
+    position = np.arange(len(due))
+    slots = position + np.maximum.accumulate(due_day * per_day - position) if len(due) else position
+    planned = np.busday_offset(start, slots // per_day, roll='forward')
+    technician = np.asarray(technicians, dtype=object)[slots % per_day % len(technicians)]
+    return planned, technician
+
+def build_maintenance_plan(data, start, horizon_days, technicians, daily_capacity,
+                           default_days=MAINTENANCE_INTERVAL_DAYS, model_intervals=None, btu_intervals=None):
+    """Calendário de manutenções planejadas, uma linha por ocorrência"""
+    intervals = unit_intervals(data, default_days, model_intervals, btu_intervals)
+    units, due = project_occurrences(data, intervals, start, horizon_days)
+    planned, technician = assign_technicians(due, technicians, daily_capacity, start)
+    plan = data.iloc[units][['TAG', 'Local', 'Setor', 'Marca', 'Modelo', 'BTU']].reset_index(drop=True)
+    plan['Vencimento'] = due.astype('datetime64[ns]')
+    plan['Data planejada'] = planned.astype('datetime64[ns]')
+    plan['Técnico'] = pd.Categorical(technician, categories=technicians)
+    plan['Atraso (dias)'] = (planned - due).astype('int64')
+    return plan
+
+def weekly_workload(plan):
+    """Manutenções planejadas por semana (segunda-feira) e técnico"""
+    week = plan['Data planejada'] - pd.to_timedelta(plan['Data planejada'].dt.weekday, unit='D')
+    load = plan.groupby([week.rename('Semana'), 'Técnico'], observed=False).size()
+    return load.unstack('Técnico', fill_value=0)
+
+def get_maintenance_plan(horizon_days, daily_capacity):
+    """Plano da sessão, recalculado só quando dados, configuração ou parâmetros mudam"""
+    config = load_config()
+    today = datetime.now().date()
+    key = (data_version(), today, horizon_days, daily_capacity, tuple(config['technicians']),
+           config['maintenance_interval_days'], json.dumps(config['model_intervals'], sort_keys=True),
+           json.dumps(config['btu_intervals'], sort_keys=True))
+    cached = st.session_state.get('plan_cache')
+    if cached is None or cached[0] != key:
+        plan = build_maintenance_plan(
+            st.session_state.data, today, horizon_days, config['technicians'], daily_capacity,
+            config['maintenance_interval_days'], config['model_intervals'], config['btu_intervals'])
+        cached = (key, plan)
+        st.session_state.plan_cache = cached
+    return cached[1]
+
+# Página de Histórico de Manutenções
+HISTORY_PAGE_LIMIT = 1000
+
+@traced()
+def show_history_page():
+    st.header("Histórico de Manutenções")
+    store = get_local_store()
+    config = load_config()
+    
+    aba_historico, aba_ultima = st.tabs(["Manutenções realizadas", "Última manutenção por aparelho"])
+    with aba_historico:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # TAGs e faixas digitadas: o navegador não recebe a lista de TAGs da frota
+            selected_text = st.text_input("TAGs", placeholder="Ex.: 101, 105-120 (vazio para todas)",
+                                          key="historico_tags")
+        with col2:
+            tecnico = st.selectbox("Técnico", ["Todos"] + list(config['technicians']), key="historico_tecnico")
+        with col3:
+            periodo = st.date_input("Período", value=(), format="DD/MM/YYYY")
+        inicio = periodo[0] if len(periodo) > 0 else None
+        fim = periodo[1] if len(periodo) > 1 else inicio
         
-        return temp_file.name
+        try:
+            tag_ranges = parse_tag_ranges(selected_text)
+        except ValueError as e:
+            st.error(f"Seleção de TAGs inválida: {e}")
+            tag_ranges = []
         
-    except Exception as e:
-        st.error(f"Erro ao gerar PDF: {str(e)}")
-        return None
+        eventos = store.query_events(
+            technician=None if tecnico == "Todos" else tecnico,
+            date_from=inicio, date_until=fim, tag_ranges=tag_ranges
+        )
+        eventos['origem'] = eventos['origem'].map(EVENT_ORIGINS).fillna(eventos['origem'])
+        st.caption(f"{len(eventos)} manutenções encontradas (de {store.count_events()} registradas)")
+        st.dataframe(
+            eventos.head(HISTORY_PAGE_LIMIT).drop(columns=['id']),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Data Manutenção": st.column_config.DateColumn("Data Manutenção", format="DD/MM/YYYY"),
+                "Próxima manutenção": st.column_config.DateColumn("Próxima manutenção", format="DD/MM/YYYY"),
+                "origem": "Origem",
+                "registrado_em": "Registrado em",
+            }
+        )
+        if len(eventos):
+            st.download_button(
+                label="Exportar histórico filtrado (CSV)",
+                data=to_csv_frame(eventos).to_csv(index=False).encode('utf-8'),
+                file_name="pmoc_historico.csv",
+                mime="text/csv"
+            )
+    
+    with aba_ultima:
+        ultimas = store.latest_events()
+        st.dataframe(
+            ultimas.drop(columns=['id']),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Data Manutenção": st.column_config.DateColumn("Data Manutenção", format="DD/MM/YYYY"),
+                "Próxima manutenção": st.column_config.DateColumn("Próxima manutenção", format="DD/MM/YYYY"),
+            }
+        )
+
+# Página do Painel da Frota (lido dos agregados da base local)
+DASHBOARD_CHART_ROWS = 30
+
+@traced()
+def show_dashboard_page():
+    st.header("Painel da Frota")
+    store = get_local_store()
+    interval_days = load_config()['maintenance_interval_days']
+    
+    detalhe = st.selectbox("Detalhar por", ["Local", "Setor", "Marca", "Técnico"])
+    dimensao = 'Técnico Executante' if detalhe == "Técnico" else detalhe
+    with span("dashboard_rollups", dimension=dimensao):
+        painel = store.rollups(dimensao, interval_days=interval_days)
+    painel.index = [valor or "(vazio)" for valor in painel.index]
+    
+    # Cada aparelho aparece uma vez em cada dimensão, então a soma dá o total da frota
+    totais = painel.sum()
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Aparelhos", int(totais['Aparelhos']))
+    col2.metric("Atrasados", int(totais['Atrasados']))
+    col3.metric(f"Vencem em {DUE_SOON_DAYS} dias", int(totais['Vencem em breve']))
+    col4.metric("Nunca mantidos", int(totais['Nunca mantidos']))
+    col5.metric("BTU instalados", f"{int(totais['BTU instalados']):,}".replace(",", "."))
+    
+    if painel.empty:
+        st.info("Nenhum aparelho cadastrado.")
+        return
+    
+    st.subheader(f"Situação por {detalhe.lower()}")
+    grafico = painel.sort_values(['Atrasados', 'Vencem em breve'], ascending=False).head(DASHBOARD_CHART_ROWS)
+    st.bar_chart(grafico[['Atrasados', 'Vencem em breve', 'Nunca mantidos']])
+    if len(painel) > DASHBOARD_CHART_ROWS:
+        st.caption(f"Gráfico com os {DASHBOARD_CHART_ROWS} grupos com mais atrasos de {len(painel)}")
+    st.dataframe(
+        painel,
+        use_container_width=True,
+        column_config={
+            "Vencem em breve": st.column_config.NumberColumn(f"Vencem em {DUE_SOON_DAYS} dias"),
+            "BTU instalados": st.column_config.NumberColumn("BTU instalados", format="%d"),
+        }
+    )
+    st.caption(f"Atraso calculado como última manutenção + {interval_days} dias")
+
+# Página de Planejamento
+@traced()
+def show_planning_page():
+    st.header("Planejamento de Manutenções")
+    config = load_config()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        horizonte = st.selectbox("Horizonte", list(PLAN_HORIZONS), index=2)
+    with col2:
+        capacidade = st.number_input("Manutenções por técnico por dia útil", min_value=1, max_value=50,
+                                     value=config['daily_capacity'], step=1)
+    
+    plan = get_maintenance_plan(PLAN_HORIZONS[horizonte], int(capacidade))
+    if plan.empty:
+        st.info("Nenhuma manutenção prevista no horizonte escolhido.")
+        return
+    
+    load = weekly_workload(plan)
+    semanal = int(capacidade) * 5
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Manutenções previstas", len(plan))
+    col2.metric("Maior adiamento por falta de capacidade", f"{plan['Atraso (dias)'].max()} dias")
+    col3.metric("Semanas acima da capacidade", int((load > semanal).any(axis=1).sum()))
+    
+    st.subheader("Carga semanal por técnico")
+    st.caption(f"Capacidade: {semanal} manutenções por técnico por semana")
+    st.bar_chart(load)
+    
+    st.subheader("Calendário")
+    tecnico = st.selectbox("Técnico", ["Todos"] + list(config['technicians']))
+    visao = plan if tecnico == "Todos" else plan[plan['Técnico'] == tecnico]
+    st.dataframe(
+        visao.head(1000),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Vencimento": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+            "Data planejada": st.column_config.DateColumn("Data planejada", format="DD/MM/YYYY"),
+        }
+    )
+    if len(visao) > 1000:
+        st.caption(f"Mostrando as 1000 primeiras de {len(visao)} manutenções")
 
 # Página de Adicionar Aparelho
+DEFAULT_LOCALS = ["Matriz", "Filial"]
+
+def local_options(devices):
+    """Locais dos formulários: os padrões e, em ordem alfabética, os demais já cadastrados"""
+    others = set(devices.locals()) - set(DEFAULT_LOCALS)
+    return DEFAULT_LOCALS + sorted(others, key=str.casefold)
+
+@traced()
 def show_add_device_page():
     st.header("Adicionar Novo Aparelho")
     
@@ -439,21 +3348,24 @@ def show_add_device_page():
         col1, col2 = st.columns(2)
         with col1:
             tag = st.number_input("TAG*", min_value=1, step=1)
-            local = st.selectbox("Local*", ["Matriz", "Filial"])
+            local = st.selectbox("Local*", local_options(get_devices()))
             setor = st.text_input("Setor*")
             marca = st.text_input("Marca*")
         with col2:
             modelo = st.text_input("Modelo")
-            btu = st.number_input("BTU*", min_value=0, step=1000)
+            btu = st.number_input("BTU*", min_value=BTU_MIN, max_value=BTU_MAX, step=1000)
         
         st.markdown("(*) Campos obrigatórios")
         submit_button = st.form_submit_button("Adicionar Aparelho")
         
         if submit_button:
-            if tag in st.session_state.data['TAG'].values:
+            devices = get_devices()
+            if tag in devices:
                 st.error("Já existe um aparelho com esta TAG!")
-            elif not tag or not local or not setor or not marca or not btu:
+            elif not tag or not local or not setor or not marca:
                 st.error("Preencha todos os campos obrigatórios!")
+            elif btu_out_of_range(btu):
+                st.error(BTU_RANGE_ERROR)
             else:
                 new_row = {
                     'TAG': tag,
@@ -468,67 +3380,130 @@ def show_add_device_page():
                     'Próxima manutenção': '',
                     'Observações': ''
                 }
-                st.session_state.data = pd.concat([st.session_state.data, pd.DataFrame([new_row])], ignore_index=True)
+                devices.add(new_row)
+                commit_devices(devices)
                 if save_data():
                     st.success("Aparelho adicionado com sucesso!")
                 st.rerun()
+    
+    show_import_devices()
+
+def show_import_devices():
+    """Importa uma planilha inteira, validando todas as linhas antes de gravar"""
+    st.divider()
+    st.subheader("Importar Aparelhos em Lote")
+    st.caption(f"Planilha CSV ou Excel com as colunas do cadastro. Obrigatórias: {', '.join(IMPORT_REQUIRED)}.")
+    uploaded = st.file_uploader("Arquivo de aparelhos", type=['csv', 'xlsx'])
+    if uploaded is None:
+        return
+    
+    devices = get_devices()
+    # A validação só é refeita quando o arquivo ou os dados mudam
+    cache_key = (uploaded.file_id, data_version())
+    cached = st.session_state.get('import_validation')
+    if cached is None or cached[0] != cache_key:
+        try:
+            result = validate_import(read_import_file(uploaded), devices.tags(),
+                                     load_config()['maintenance_interval_days'])
+        except ImportError:
+            st.error("Leitura de Excel indisponível: instale o pacote openpyxl ou envie um CSV.")
+            return
+        except Exception as e:
+            st.error(f"Erro ao ler a planilha: {str(e)}")
+            return
+        cached = (cache_key, result)
+        st.session_state.import_validation = cached
+    accepted, errors = cached[1]
+    
+    col1, col2 = st.columns(2)
+    col1.metric("Linhas válidas", len(accepted))
+    col2.metric("Linhas com erro", errors['Linha'].nunique())
+    if len(errors):
+        st.dataframe(errors, hide_index=True, use_container_width=True, height=250)
+        st.download_button("Baixar relatório de erros", errors.to_csv(index=False).encode('utf-8'),
+                           file_name="erros_importacao.csv", mime="text/csv")
+    
+    if len(accepted) and st.button(f"Importar {len(accepted)} aparelhos"):
+        # Um único concat e uma única gravação para todas as linhas aceitas
+        total = devices.add_many(accepted)
+        commit_devices(devices)
+        st.session_state.pop('import_validation', None)
+        if save_data():
+            st.toast(f"{total} aparelhos importados com sucesso!", icon="✅")
+        st.rerun()
 
 # Página de Editar Aparelho
+@traced()
 def show_edit_device_page():
     st.header("Editar Aparelho Existente")
     
+    devices = get_devices()
     tag_to_edit = st.selectbox(
         "Selecione a TAG do aparelho a editar",
-        st.session_state.data['TAG'].unique()
+        devices.tags()
     )
     
     if tag_to_edit:
-        aparelho_data = st.session_state.data[st.session_state.data['TAG'] == tag_to_edit].iloc[0]
+        aparelho_data = devices.get(tag_to_edit)
         
         with st.form("edit_form"):
             col1, col2 = st.columns(2)
             with col1:
                 tag = st.number_input("TAG*", value=int(aparelho_data['TAG']), min_value=1, step=1)
+                # Inclui os locais importados, para que a edição não troque o local do aparelho
+                locais = local_options(devices)
                 local = st.selectbox(
                     "Local*", 
-                    ["Matriz", "Filial"], 
-                    index=0 if aparelho_data['Local'] == "Matriz" else 1
+                    locais, 
+                    index=locais.index(aparelho_data['Local']) if aparelho_data['Local'] in locais else 0
                 )
                 setor = st.text_input("Setor*", value=aparelho_data['Setor'])
                 marca = st.text_input("Marca*", value=aparelho_data['Marca'])
             with col2:
                 modelo = st.text_input("Modelo", value=aparelho_data['Modelo'])
-                btu = st.number_input("BTU*", value=int(aparelho_data['BTU']), min_value=0, step=1000)
+                # Sem max_value: um valor antigo fora da faixa aparece e é recusado ao salvar
+                btu = st.number_input("BTU*", value=int(aparelho_data['BTU']) if pd.notna(aparelho_data['BTU']) else 0, min_value=BTU_MIN, step=1000)
             
             st.markdown("(*) Campos obrigatórios")
             submit_button = st.form_submit_button("Atualizar Aparelho")
             
             if submit_button:
-                if not tag or not local or not setor or not marca or not btu:
+                if not tag or not local or not setor or not marca:
                     st.error("Preencha todos os campos obrigatórios!")
+                elif btu_out_of_range(btu):
+                    st.error(BTU_RANGE_ERROR)
                 else:
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'TAG'] = tag
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'Local'] = local
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'Setor'] = setor
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'Marca'] = marca
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'Modelo'] = modelo
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_edit, 'BTU'] = btu
+                    try:
+                        devices.update(tag_to_edit, {
+                            'TAG': tag,
+                            'Local': local,
+                            'Setor': setor,
+                            'Marca': marca,
+                            'Modelo': modelo,
+                            'BTU': btu
+                        })
+                    except ValueError as e:
+                        st.error(str(e))
+                        return
+                    commit_devices(devices)
                     
                     if save_data():
                         st.success("Aparelho atualizado com sucesso!")
                     st.rerun()
 
 # Página de Remover Aparelho
+@traced()
 def show_remove_device_page():
     st.header("Remover Aparelho")
     
+    devices = get_devices()
     tag_to_remove = st.selectbox(
         "Selecione a TAG do aparelho a remover",
-        st.session_state.data['TAG'].unique()
+        devices.tags()
     )
     
     if tag_to_remove:
-        aparelho_data = st.session_state.data[st.session_state.data['TAG'] == tag_to_remove].iloc[0]
+        aparelho_data = devices.get(tag_to_remove)
         
         st.warning(f"Você está prestes a remover o aparelho com TAG {tag_to_remove}:")
         st.write(f"Local: {aparelho_data['Local']}")
@@ -537,22 +3512,33 @@ def show_remove_device_page():
         st.write(f"Observações: {aparelho_data['Observações']}")
         
         if st.button("Confirmar Remoção"):
-            st.session_state.data = st.session_state.data[st.session_state.data['TAG'] != tag_to_remove]
+            devices.delete(tag_to_remove)
+            commit_devices(devices)
             if save_data():
                 st.success("Aparelho removido com sucesso!")
             st.rerun()
 
 # Página de Realizar Manutenção
+@traced()
 def show_maintenance_page():
     st.header("Registrar Manutenção")
     
+    devices = get_devices()
+    modo = st.radio("Modo de registro", ["Um aparelho", "Vários aparelhos"], horizontal=True)
+    if modo == "Vários aparelhos":
+        show_bulk_maintenance_form(devices)
+        return
+    
     tag_to_maintain = st.selectbox(
         "Selecione a TAG do aparelho para registrar manutenção",
-        st.session_state.data['TAG'].unique()
+        devices.tags()
     )
     
     if tag_to_maintain:
-        aparelho_data = st.session_state.data[st.session_state.data['TAG'] == tag_to_maintain].iloc[0]
+        aparelho_data = devices.get(tag_to_maintain)
+        config = load_config()
+        tecnicos = config['technicians']
+        intervalo = timedelta(days=config['maintenance_interval_days'])
         
         with st.form("maintenance_form"):
             st.write(f"**Aparelho selecionado:** TAG {tag_to_maintain} - {aparelho_data['Marca']} {aparelho_data['Modelo']}")
@@ -563,19 +3549,18 @@ def show_maintenance_page():
                 format="DD/MM/YYYY"
             )
             
-            # Alteração 1: Adicionar opção de escolher entre Guilherme ou Ismael
+            # Técnicos e supervisor padrão vêm da configuração
             tecnico = st.selectbox(
                 "Técnico Executante*",
-                ["Guilherme", "Ismael"],
-                index=0 if aparelho_data['Técnico Executante'] == "Guilherme" else 1 if aparelho_data['Técnico Executante'] == "Ismael" else 0
+                tecnicos,
+                index=tecnicos.index(aparelho_data['Técnico Executante']) if aparelho_data['Técnico Executante'] in tecnicos else 0
             )
             
-            # Alteração 2: Alterar a aprovação para Ismael como valor padrão
-            aprovacao = st.text_input("Aprovação Supervisor", value="Ismael")
+            aprovacao = st.text_input("Aprovação Supervisor", value=config['supervisor'])
             observacoes = st.text_area("Observações", value=aparelho_data['Observações'])
             
             if data_manutencao:
-                proxima_manutencao = data_manutencao + timedelta(days=180)
+                proxima_manutencao = data_manutencao + intervalo
                 st.write(f"**Próxima manutenção será automaticamente agendada para:** {proxima_manutencao.strftime('%d/%m/%Y')}")
             else:
                 st.write("**Próxima manutenção:** Não definida (insira uma data de manutenção)")
@@ -587,18 +3572,148 @@ def show_maintenance_page():
                 if not data_manutencao or not tecnico:
                     st.error("Preencha todos os campos obrigatórios!")
                 else:
-                    proxima_manutencao = data_manutencao + timedelta(days=180)
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_maintain, 'Data Manutenção'] = data_manutencao.strftime('%d/%m/%Y')
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_maintain, 'Técnico Executante'] = tecnico
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_maintain, 'Aprovação Supervisor'] = aprovacao
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_maintain, 'Próxima manutenção'] = proxima_manutencao.strftime('%d/%m/%Y')
-                    st.session_state.data.loc[st.session_state.data['TAG'] == tag_to_maintain, 'Observações'] = observacoes
+                    proxima_manutencao = data_manutencao + intervalo
+                    devices.update(tag_to_maintain, {
+                        'Data Manutenção': data_manutencao,
+                        'Técnico Executante': tecnico,
+                        'Aprovação Supervisor': aprovacao,
+                        'Próxima manutenção': proxima_manutencao,
+                        'Observações': observacoes
+                    })
+                    commit_devices(devices)
                     
-                    if save_data():
+                    # A manutenção também entra no histórico, na mesma transação
+                    evento = devices.data.loc[[devices.label(tag_to_maintain)]]
+                    if save_data(events=evento):
                         st.toast(f"Manutenção para TAG {tag_to_maintain} registrada com sucesso!", icon="✅")
                         st.success(f"Próxima manutenção agendada para: {proxima_manutencao.strftime('%d/%m/%Y')}")
                     st.rerun()
 
+def show_bulk_maintenance_form(devices):
+    """Registra a mesma manutenção para várias TAGs ou para todo um Local/Setor"""
+    data = devices.data
+    selecionar_por = st.radio("Selecionar aparelhos por", ["TAGs", "Local/Setor"], horizontal=True)
+    if selecionar_por == "TAGs":
+        # TAGs e faixas digitadas: o navegador não recebe a lista de TAGs da frota
+        selected_text = st.text_input("TAGs dos aparelhos", placeholder="Ex.: 101, 105-120", key="lote_tags")
+        try:
+            tags = data.loc[tag_ranges_mask(data['TAG'], parse_tag_ranges(selected_text)), 'TAG'].tolist()
+        except ValueError as e:
+            st.error(f"Seleção de TAGs inválida: {e}")
+            tags = []
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            local = st.selectbox("Local", ["Todos"] + sorted(data['Local'].dropna().unique().tolist()),
+                                 key="lote_local")
+        with col2:
+            setores = data.loc[filter_mask(data, local), 'Setor'].dropna().unique().tolist()
+            setor = st.selectbox("Setor", ["Todos"] + sorted(setores), key="lote_setor")
+        tags = data.loc[filter_mask(data, local, setor), 'TAG'].tolist()
+    
+    st.write(f"**Aparelhos selecionados:** {len(tags)}")
+    if tags:
+        selecionados = data.loc[[devices.label(tag) for tag in tags]]
+        st.dataframe(selecionados[['TAG', 'Local', 'Setor', 'Marca', 'Modelo']],
+                     hide_index=True, use_container_width=True, height=200)
+    
+    config = load_config()
+    with st.form("bulk_maintenance_form"):
+        data_manutencao = st.date_input("Data da Manutenção*", format="DD/MM/YYYY")
+        tecnico = st.selectbox("Técnico Executante*", config['technicians'])
+        aprovacao = st.text_input("Aprovação Supervisor", value=config['supervisor'])
+        observacoes = st.text_area("Observações", help="Em branco, mantém as observações atuais de cada aparelho")
+        
+        st.markdown("(*) Campos obrigatórios")
+        submit_button = st.form_submit_button("Registrar Manutenção em Lote")
+        
+        if submit_button:
+            if not tags:
+                st.error("Selecione ao menos um aparelho!")
+            elif not data_manutencao or not tecnico:
+                st.error("Preencha todos os campos obrigatórios!")
+            else:
+                proxima_manutencao = data_manutencao + timedelta(days=config['maintenance_interval_days'])
+                campos = {
+                    'Data Manutenção': data_manutencao,
+                    'Técnico Executante': tecnico,
+                    'Aprovação Supervisor': aprovacao,
+                    'Próxima manutenção': proxima_manutencao,
+                }
+                if observacoes.strip():
+                    campos['Observações'] = observacoes
+                # Uma única atualização vetorizada e uma única gravação para todo o lote
+                total = devices.update_many(tags, campos)
+                commit_devices(devices)
+                
+                eventos = devices.data.loc[[devices.label(tag) for tag in tags]]
+                if save_data(events=eventos):
+                    st.toast(f"Manutenção registrada para {total} aparelhos!", icon="✅")
+                    st.success(f"Próxima manutenção agendada para: {proxima_manutencao.strftime('%d/%m/%Y')}")
+                st.rerun()
+
+# Página de Conflitos de Sincronização
+CONFLICT_PAGE_LIMIT = 50
+
+def conflict_fields(row):
+    """Converte uma linha registrada no conflito para os campos do repositório de aparelhos"""
+    fields = {column: row.get(column) for column in DEVICE_COLUMNS}
+    fields['TAG'] = DeviceRepository.key(fields['TAG'])
+    for column in CATEGORY_COLUMNS + TEXT_COLUMNS:
+        fields[column] = fields[column] or ''
+    return fields
+
+def show_sync_conflicts_page():
+    st.subheader("Conflitos de Sincronização")
+    store = get_local_store()
+    conflicts = store.list_conflicts()
+    if not conflicts:
+        st.info("Nenhum conflito pendente.")
+        return
+    label = get_storage().label
+    st.caption(f"Estes aparelhos foram alterados aqui e no {label} ao mesmo tempo. Por ora vale a versão "
+               f"do {label}; escolha qual manter.")
+    
+    for conflict in conflicts[:CONFLICT_PAGE_LIMIT]:
+        tag, local, remote = conflict['TAG'], conflict['local'], conflict['remoto']
+        with st.expander(f"TAG {tag} · detectado em {conflict['detectado_em'].replace('T', ' ')}"):
+            if local is None or remote is None:
+                st.write(f"Removido aqui, alterado no {label}." if local is None else f"Alterado aqui, removido no {label}.")
+            columns = [column for column in DEVICE_COLUMNS
+                       if (local or {}).get(column) != (remote or {}).get(column)]
+            def shown(row, column):
+                value = (row or {}).get(column)
+                return "" if value is None else str(value)
+            
+            st.dataframe(pd.DataFrame({
+                "Sua versão": [shown(local, column) for column in columns],
+                f"Versão no {label}": [shown(remote, column) for column in columns],
+            }, index=columns), use_container_width=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Manter minha versão", key=f"conflito_local_{tag}"):
+                    devices = get_devices()
+                    if local is None:
+                        if tag in devices:
+                            devices.delete(tag)
+                    elif tag in devices:
+                        fields = conflict_fields(local)
+                        del fields['TAG']
+                        devices.update(tag, fields)
+                    else:
+                        devices.add(conflict_fields(local))
+                    commit_devices(devices)
+                    if save_data():
+                        store.discard_conflict(tag)
+                        st.rerun()
+            with col2:
+                if st.button(f"Manter versão do {label}", key=f"conflito_remoto_{tag}"):
+                    store.discard_conflict(tag)
+                    st.rerun()
+    if len(conflicts) > CONFLICT_PAGE_LIMIT:
+        st.caption(f"Mostrando {CONFLICT_PAGE_LIMIT} de {len(conflicts)} conflitos")
+
 # Configuração de acesso
 def check_password():
     if 'password_correct' not in st.session_state:
@@ -614,67 +3729,163 @@ def check_password():
         return False
     return True
 
+# Painel de desempenho (somente administradores, dentro da Configuração)
+def show_performance_panel():
+    st.header("Desempenho")
+    recorder = get_span_recorder()
+    summary = recorder.summary()
+    if summary.empty:
+        st.info("Nenhuma medição registrada ainda neste processo.")
+    else:
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+    
+    client = get_github_client()
+    reports = get_report_jobs().cache
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Requisições ao GitHub", client.stats["requests"])
+    col2.metric("Novas tentativas HTTP", client.stats["retries"])
+    col3.metric("Relatórios em cache", f"{len(reports.entries)} ({reports.size() / 2**20:.1f} MB)")
+    st.caption(f"Log detalhado (uma linha JSON por execução): {recorder.log_path or 'desativado (PMOC_SPAN_LOG)'}")
+    
+    if st.button("Limpar medições"):
+        recorder.clear()
+        st.rerun()
+
 # Página de Configuração
+def secret_input(label, key, config, sources, help=None):
+    """Campo de senha para uma credencial da configuração.
+
+    Credenciais vindas de secrets ou do ambiente não são enviadas ao navegador:
+    o campo fica vazio e, se nada for digitado, vale o valor em vigor.
+    """
+    if sources[key] in ("secrets", "ambiente"):
+        typed = st.text_input(label, type="password", value="", help=help,
+                              placeholder=f"definido via {sources[key]}")
+        return typed or config[key]
+    return st.text_input(label, type="password", value=config[key], help=help)
+
+@traced()
 def show_configuration_page():
     st.header("Configuração")
     
     if not check_password():
         st.stop()
     
-    # Carrega configurações existentes
+    # Carrega configurações existentes (cacheadas; o arquivo só é relido se mudar)
     config = load_config()
+    sources = get_config_provider().sources()
     
-    # Configuração do Token do GitHub
-    st.subheader("Configuração do GitHub")
+    # Armazenamento remoto: GitHub (CSV) ou Google Sheets
+    st.subheader("Armazenamento Remoto")
+    backends = {"GitHub": "github", "Google Sheets": "sheets"}
+    backend = backends[st.radio("Sincronizar com", list(backends), horizontal=True,
+                                index=int(config['storage_backend'] == "sheets"))]
+    form = {'storage_backend': backend}
     
-    github_token = st.text_input(
-        "Token de Acesso ao GitHub (obrigatório para sincronização)",
-        type="password",
-        value=config.get('github_token', ''),
-        help="Obtenha em: GitHub > Settings > Developer Settings > Personal Access Tokens"
-    )
+    if backend == "github":
+        form['github_token'] = secret_input(
+            "Token de Acesso ao GitHub (obrigatório para sincronização)", 'github_token', config, sources,
+            help="Obtenha em: GitHub > Settings > Developer Settings > Personal Access Tokens"
+        )
+        st.caption(f"Repositório: {config['repo']} · Arquivo: {config['file_path']}")
+        secret_key = 'github_token'
+    else:
+        col1, col2 = st.columns(2)
+        form['sheets_key'] = col1.text_input("ID da planilha", value=config['sheets_key'],
+                                             help="Trecho da URL da planilha entre /d/ e /edit").strip()
+        form['sheets_worksheet'] = col2.text_input("Aba", value=config['sheets_worksheet']).strip()
+        form['sheets_credentials'] = secret_input(
+            "Credenciais da conta de serviço (JSON ou caminho do arquivo)", 'sheets_credentials', config, sources,
+            help="Compartilhe a planilha com o e-mail da conta de serviço, com permissão de edição"
+        )
+        secret_key = 'sheets_credentials'
+    if sources[secret_key] in ("secrets", "ambiente"):
+        st.caption(f"A credencial em uso vem de {sources[secret_key]} e prevalece sobre o valor salvo aqui.")
+    storage = get_storage({**config, **form})
+    credentials = storage.credentials({**config, **form})
+    
+    # Parâmetros de manutenção
+    st.subheader("Parâmetros de Manutenção")
+    col1, col2 = st.columns(2)
+    with col1:
+        intervalo = st.number_input("Intervalo entre manutenções (dias)", min_value=1, max_value=730,
+                                    value=config['maintenance_interval_days'], step=1)
+        supervisor = st.text_input("Supervisor padrão", value=config['supervisor'])
+    with col2:
+        tecnicos = st.text_area("Técnicos (um por linha)", value="\n".join(config['technicians']))
+        capacidade = st.number_input("Manutenções por técnico por dia útil", min_value=1, max_value=50,
+                                     value=config['daily_capacity'], step=1)
     
     if st.button("Salvar Configurações"):
-        config['github_token'] = github_token
-        if save_config(config):
+        changes = {
+            'maintenance_interval_days': int(intervalo),
+            'technicians': parse_config_value('technicians', tecnicos.replace("\n", ",")),
+            'supervisor': supervisor.strip(),
+            'daily_capacity': int(capacidade),
+        }
+        # Não copia para o arquivo valores vindos de secrets ou do ambiente
+        changes.update({key: value for key, value in form.items() if value != config[key]})
+        if not changes['technicians']:
+            st.error("Informe ao menos um técnico!")
+        elif save_config(changes):
             st.success("Configurações salvas com sucesso!")
-            # Tenta carregar os dados do GitHub após salvar o token
-            if github_token:
-                saved_data = load_from_github(REPO, FILE_PATH, github_token)
+            # Tenta carregar os dados remotos após salvar o acesso
+            if credentials:
+                saved_data = load_devices(credentials, storage)
                 if saved_data is not None:
-                    if 'Observações' not in saved_data.columns:
-                        saved_data['Observações'] = ''
-                    st.session_state.data = saved_data
-                    st.success("Dados carregados do GitHub com sucesso!")
+                    replace_session_data(saved_data, storage)
+                    st.success(f"Dados carregados do {storage.label} com sucesso!")
     
     # Sincronização manual
     st.subheader("Sincronização Manual")
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.button("Carregar Dados do GitHub"):
-            if github_token:
-                saved_data = load_from_github(REPO, FILE_PATH, github_token)
+        if st.button(f"Carregar Dados do {storage.label}"):
+            if credentials:
+                saved_data = load_devices(credentials, storage)
                 if saved_data is not None:
-                    if 'Observações' not in saved_data.columns:
-                        saved_data['Observações'] = ''
-                    st.session_state.data = saved_data
-                    st.success("Dados carregados do GitHub com sucesso!")
+                    replace_session_data(saved_data, storage)
+                    st.success(f"Dados carregados do {storage.label} com sucesso!")
             else:
-                st.error("Token de acesso não configurado!")
+                st.error("Acesso ao armazenamento remoto não configurado!")
     
     with col2:
-        if st.button("Salvar Dados no GitHub"):
-            if github_token:
+        if st.button(f"Salvar Dados no {storage.label}"):
+            if credentials:
                 if save_data():
-                    st.success("Dados salvos no GitHub com sucesso!")
+                    store = get_local_store()
+                    try:
+                        if not store.has_remote_base():
+                            # Primeiro envio: concilia antes com o que já existe no remoto
+                            adopt_remote(store, storage, credentials)
+                        # Envio imediato, sem esperar a janela de agrupamento
+                        sent = get_save_queue(storage).flush()
+                    except Exception as e:
+                        st.error(f"Falha ao salvar dados no {storage.label}: {str(e)}")
+                    else:
+                        if sent:
+                            st.success(f"Dados salvos no {storage.label} com sucesso!")
+                        else:
+                            st.error(f"Falha ao salvar dados no {storage.label}: "
+                                     f"{get_save_queue(storage).status()['last_error']}")
             else:
-                st.error("Token de acesso não configurado!")
+                st.error("Acesso ao armazenamento remoto não configurado!")
+    
+    status = get_save_queue().status()
+    st.caption(
+        f"Alterações pendentes: {status['pending_edits']} · "
+        f"Gravações enviadas: {status['commits']} ({status['flushed_edits']} alterações agrupadas)"
+    )
+    if status['failures']:
+        st.error(f"O envio automático falhou {status['failures']} vez(es) seguida(s): {status['last_error']}. "
+                 f"Corrija o acesso acima e use \"Salvar Dados no {storage.label}\" para tentar de novo agora.")
     
     # Menu de configuração
     config_option = st.sidebar.radio(
         "Opções de Configuração",
-        ["Adicionar Aparelho", "Editar Aparelho", "Remover Aparelho", "Realizar Manutenção"]
+        ["Adicionar Aparelho", "Editar Aparelho", "Remover Aparelho", "Realizar Manutenção",
+         "Conflitos de Sincronização", "Desempenho"]
     )
     
     if config_option == "Adicionar Aparelho":
@@ -685,6 +3896,10 @@ def show_configuration_page():
         show_remove_device_page()
     elif config_option == "Realizar Manutenção":
         show_maintenance_page()
+    elif config_option == "Conflitos de Sincronização":
+        show_sync_conflicts_page()
+    elif config_option == "Desempenho":
+        show_performance_panel()
     
     # Rodapé
     st.sidebar.markdown("---")
@@ -704,11 +3919,18 @@ def main():
         # Menu principal
         menu = st.sidebar.radio(
             "Menu Principal",
-            ["Consulta", "Configuração"]
+            ["Consulta", "Painel", "Planejamento", "Histórico", "Configuração"]
         )
+        show_save_status()
         
         if menu == "Consulta":
             show_consultation_page()
+        elif menu == "Painel":
+            show_dashboard_page()
+        elif menu == "Planejamento":
+            show_planning_page()
+        elif menu == "Histórico":
+            show_history_page()
         elif menu == "Configuração":
             show_configuration_page()
             
@@ -0,0 +1,41 @@
+"""Configuração comum dos testes.
+
+A base local, o cache e o log de spans vão para um diretório temporário antes de
+importar pmoc, que lê esses caminhos das variáveis de ambiente na importação.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="pmoc-testes-")
+os.environ["PMOC_DB"] = os.path.join(_TMP, "pmoc.db")
+os.environ["PMOC_CACHE_DIR"] = os.path.join(_TMP, "cache")
+os.environ["PMOC_SPAN_LOG"] = ""
+os.environ.pop("PMOC_GITHUB_TOKEN", None)
+
+import pmoc  # noqa: E402
+from fake_github import FakeGitHubServer  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = pmoc.LocalStore(str(tmp_path / "pmoc.db"))
+    yield store
+    store.conn.close()
+
+
+@pytest.fixture
+def github(tmp_path, monkeypatch):
+    """API do GitHub simulada, com cache em disco e em memória limpos a cada teste"""
+    server = FakeGitHubServer().start()
+    monkeypatch.setattr(pmoc, "GITHUB_API_URL", server.url)
+    monkeypatch.setattr(pmoc, "CACHE_DIR", str(tmp_path / "cache"))
+    pmoc.get_shared_state("github_frames").clear()
+    yield server
+    server.stop()
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from fake_github import FakeGitHubServer
+
+SCRIPT = str(Path(__file__).resolve().parent.parent / "pmoc.py")
+SECRET = "ghp_segredo_do_ambiente"
+
+
+@pytest.fixture
+def page(tmp_path, monkeypatch):
+    """Página de Configuração já autenticada, com arquivos em tmp_path e o GitHub simulado"""
+    server = FakeGitHubServer().start()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PMOC_GITHUB_API_URL", server.url)
+    monkeypatch.setenv("PMOC_DB", str(tmp_path / "pmoc.db"))
+    monkeypatch.setenv("PMOC_CACHE_DIR", str(tmp_path / "cache"))
+
+    def open_page():
+        at = AppTest.from_file(SCRIPT, default_timeout=60)
+        at.session_state.password_correct = True
+        at.run()
+        at.sidebar.radio[0].set_value("Configuração").run()
+        assert not at.exception
+        return at
+
+    yield open_page
+    server.stop()
+
+
+def token_input(at):
+    return next(t for t in at.text_input if t.label.startswith("Token de Acesso ao GitHub"))
+
+
+def test_token_do_ambiente_nao_vai_para_o_navegador(page, monkeypatch):
+    monkeypatch.setenv("PMOC_GITHUB_TOKEN", SECRET)
+    at = page()
+    field = token_input(at)
+    assert field.value == ""
+    assert field.proto.placeholder == "definido via ambiente"
+    assert SECRET not in str([element.proto for element in at.main])
+
+
+def test_salvar_sem_digitar_nao_copia_o_token_para_o_arquivo(page, monkeypatch, tmp_path):
+    monkeypatch.setenv("PMOC_GITHUB_TOKEN", SECRET)
+    at = page()
+    next(b for b in at.button if b.label == "Salvar Configurações").click().run()
+    saved = json.loads((tmp_path / "pmoc_config.json").read_text())
+    assert "github_token" not in saved
+
+
+def test_token_digitado_substitui_o_salvo(page, tmp_path):
+    (tmp_path / "pmoc_config.json").write_text(json.dumps({"github_token": "antigo"}))
+    at = page()
+    assert token_input(at).value == "antigo"
+    token_input(at).set_value("novo").run()
+    next(b for b in at.button if b.label == "Salvar Configurações").click().run()
+    assert json.loads((tmp_path / "pmoc_config.json").read_text())["github_token"] == "novo"
+
+
+def test_credencial_do_sheets_do_ambiente_nao_vai_para_o_navegador(page, monkeypatch):
+    credentials = json.dumps({"type": "service_account", "private_key": "chave-secreta"})
+    monkeypatch.setenv("PMOC_STORAGE_BACKEND", "sheets")
+    monkeypatch.setenv("PMOC_SHEETS_CREDENTIALS", credentials)
+    at = page()
+    field = next(t for t in at.text_input if t.label.startswith("Credenciais da conta de serviço"))
+    assert field.value == ""
+    assert field.proto.placeholder == "definido via ambiente"
+    assert "chave-secreta" not in str([element.proto for element in at.main])
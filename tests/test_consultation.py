@@ -0,0 +1,90 @@
+import pytest
+
+import pmoc
+
+
+def test_tags_e_faixas_digitadas():
+    assert pmoc.parse_tag_ranges("101, 120 - 105; 7,") == [(101, 101), (105, 120), (7, 7)]
+    assert pmoc.parse_tag_ranges("  ") == []
+
+
+def test_trecho_invalido_e_recusado():
+    with pytest.raises(ValueError, match="abc"):
+        pmoc.parse_tag_ranges("101, abc")
+
+
+def test_mascara_das_faixas():
+    tags = pmoc.pd.Series([7, 101, 110, 121])
+    assert pmoc.tag_ranges_mask(tags, [(101, 101), (105, 120)]).tolist() == [False, True, True, False]
+
+
+NOW = pmoc.pd.Timestamp(2025, 9, 1)
+
+
+def fleet():
+    rows = [
+        # Local, Setor, Marca, última manutenção
+        ('Matriz', 'CPD', 'GREE', '01/01/2025'),
+        ('Matriz', 'CPD', 'LG', '01/08/2025'),
+        ('Matriz', 'RH', 'GREE', '01/02/2024'),
+        ('Matriz', '', 'Midea', ''),
+        ('Filial', 'CPD', 'GREE', '15/08/2025'),
+        ('Filial', 'Recepção', 'LG', '01/01/2024'),
+        ('Filial', 'Recepção', 'LG', '01/07/2025'),
+        ('Depósito', 'Estoque', 'Midea', '01/03/2025'),
+    ]
+    return pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': range(1, len(rows) + 1),
+        'Local': [row[0] for row in rows],
+        'Setor': [row[1] for row in rows],
+        'Marca': [row[2] for row in rows],
+        'Modelo': 'Split',
+        'BTU': 12000,
+        'Data Manutenção': [row[3] for row in rows],
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '',
+        'Observações': '',
+    }))
+
+
+@pytest.fixture
+def facets():
+    data = fleet()
+    schedule = pmoc.compute_maintenance_schedule(data, 180, now=NOW)
+    return data, schedule, pmoc.build_facet_index(data, schedule)
+
+
+def options(facets, column, **selections):
+    selections = {other: selections.get(other, "Todos") for other in pmoc.FACET_COLUMNS}
+    found = pmoc.facet_options(facets, column, selections)
+    return {value: (int(row['units']), int(row['overdue'])) for value, row in found.iterrows()}
+
+
+def test_opcoes_seguem_os_outros_filtros(facets):
+    _, _, index = facets
+    assert options(index, 'Setor') == {
+        '': (1, 0), 'CPD': (3, 1), 'Estoque': (1, 1), 'RH': (1, 1), 'Recepção': (2, 1)}
+    assert options(index, 'Setor', Local='Filial') == {'CPD': (1, 0), 'Recepção': (2, 1)}
+    assert options(index, 'Marca', Local='Filial', Setor='Recepção') == {'LG': (2, 1)}
+    # O próprio filtro não restringe as suas opções
+    assert options(index, 'Local', Local='Filial', Marca='GREE') == {'Filial': (1, 0), 'Matriz': (2, 2)}
+    assert options(index, 'Local', Setor='Estoque', Marca='GREE') == {}
+
+
+def test_contagens_iguais_as_da_frota_filtrada(facets):
+    data, schedule, index = facets
+    overdue = (schedule['Situação'] == pmoc.STATUS_OVERDUE).to_numpy()
+    choices = {column: ["Todos"] + sorted(set(data[column].astype(str))) for column in pmoc.FACET_COLUMNS}
+    for local in choices['Local']:
+        for setor in choices['Setor']:
+            for marca in choices['Marca']:
+                selections = {'Local': local, 'Setor': setor, 'Marca': marca}
+                for column in pmoc.FACET_COLUMNS:
+                    others = {key.lower(): value for key, value in selections.items() if key != column}
+                    mask = pmoc.filter_mask(data, **others)
+                    expected = {}
+                    for value, late in zip(data[column].astype(str)[mask], overdue[mask]):
+                        units, count = expected.get(value, (0, 0))
+                        expected[value] = (units + 1, count + int(late))
+                    assert options(index, column, **selections) == expected, (column, selections)
@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+import pmoc
+
+
+def devices(locais, datas=None):
+    return pmoc.DeviceRepository(pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': range(1, len(locais) + 1),
+        'Local': locais,
+        'Setor': 'CPD',
+        'Marca': 'GREE',
+        'Modelo': '',
+        'BTU': 12000,
+        'Data Manutenção': datas or '',
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '',
+        'Observações': '',
+    })))
+
+
+def test_locais_importados_entram_nas_opcoes():
+    options = pmoc.local_options(devices(['Filial', 'loja Centro', 'Depósito', '', 'Filial']))
+    assert options == ['Matriz', 'Filial', 'Depósito', 'loja Centro']
+
+
+def test_locais_removidos_saem_das_opcoes():
+    repository = devices(['Matriz', 'Galpão'])
+    repository.delete(2)
+    # A categoria 'Galpão' continua no dtype, mas nenhum aparelho a usa
+    assert 'Galpão' in repository.data['Local'].cat.categories
+    assert pmoc.local_options(repository) == ['Matriz', 'Filial']
+
+
+def fleet():
+    # A TAG 2 tem uma data inválida, preservada como texto
+    return devices(['Matriz'] * 5, ['01/03/2025', '31/02/2025', '', '', ''])
+
+
+def test_atualizacao_em_lote_aplica_os_campos_e_registra_as_linhas():
+    repository = fleet()
+    campos = {'Data Manutenção': date(2025, 6, 10), 'Técnico Executante': 'Ana', 'Observações': 'lote'}
+    assert repository.update_many([2, '4', 5], campos) == 3
+    changed, deleted = repository.pop_changes()
+    assert changed == {repository.label(tag) for tag in (2, 4, 5)}
+    assert deleted == set()
+    for tag in (2, 4, 5):
+        row = repository.get(tag)
+        assert row['Data Manutenção'] == pmoc.pd.Timestamp(2025, 6, 10)
+        assert (row['Técnico Executante'], row['Observações']) == ('Ana', 'lote')
+    assert repository.get(3)['Técnico Executante'] == ''
+
+
+def test_atualizacao_em_lote_limpa_o_texto_invalido_preservado():
+    repository = fleet()
+    assert repository.get(2)['Data Manutenção (original)'] == '31/02/2025'
+    repository.update_many([2], {'Data Manutenção': date(2025, 6, 10)})
+    assert repository.get(2)['Data Manutenção (original)'] == ''
+    csv = pmoc.to_csv_frame(repository.data)
+    assert csv.loc[repository.label(2), 'Data Manutenção'] == '10/06/2025'
+
+
+def test_atualizacao_em_lote_nao_troca_a_tag():
+    repository = fleet()
+    with pytest.raises(ValueError):
+        repository.update_many([1, 2], {'TAG': 9})
+    assert repository.pop_changes() == (set(), set())
+    assert 9 not in repository
+
+
+def test_atualizacao_em_lote_com_tag_inexistente_nao_altera_nada():
+    repository = fleet()
+    with pytest.raises(KeyError, match="99"):
+        repository.update_many([1, 99], {'Técnico Executante': 'Ana'})
+    assert repository.get(1)['Técnico Executante'] == ''
+    assert repository.pop_changes() == (set(), set())
@@ -0,0 +1,61 @@
+import pytest
+
+import pmoc
+
+ROWS = 230
+CHUNK_ROWS = 50
+
+
+@pytest.fixture
+def data():
+    frame = pmoc.pd.DataFrame({
+        'TAG': range(1, ROWS + 1),
+        'Local': [f'Filial {i % 7}' for i in range(ROWS)],
+        'Setor': [f'Setor {i % 5}' for i in range(ROWS)],
+        'Marca': ['GREE', 'LG', 'Midea'] * (ROWS // 3) + ['GREE'] * (ROWS % 3),
+        'Modelo': 'Split',
+        'BTU': [str(9000 + 3000 * (i % 4)) for i in range(ROWS)],
+        'Data Manutenção': [f'{1 + i % 28:02d}/03/2025' for i in range(ROWS)],
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '01/09/2025',
+        'Observações': [f'obs {i}' if i % 3 else '' for i in range(ROWS)],
+    })
+    # Valores inválidos precisam sair como foram digitados
+    frame.loc[10, 'BTU'] = 'n/d'
+    frame.loc[20, 'Data Manutenção'] = '31/02/2025'
+    return pmoc.to_typed(frame)
+
+
+def as_text(frame):
+    return frame.astype(object).fillna('').astype(str).reset_index(drop=True)
+
+
+def expected(data, positions):
+    return as_text(pmoc.to_csv_frame(data.iloc[positions])[pmoc.DEVICE_COLUMNS])
+
+
+def read_back(extension, path):
+    if extension in ('csv', 'csv.gz'):
+        return pmoc.to_csv_frame(pmoc.read_devices_csv(path))
+    if extension == 'parquet':
+        return pmoc.to_csv_frame(pmoc.pd.read_parquet(path))
+    return pmoc.pd.read_excel(path, sheet_name="Aparelhos", dtype=str)
+
+
+@pytest.mark.parametrize("extension", [extension for extension, _ in pmoc.EXPORT_FORMATS.values()])
+def test_exportacao_em_blocos_preserva_as_linhas(data, tmp_path, extension):
+    # Ordem e seleção da consulta: as linhas saem na ordem das posições
+    positions = pmoc.np.arange(ROWS)[::-1][1::2]
+    target = tmp_path / f"export.{extension}"
+    pmoc.write_export(data, positions, extension, str(target), chunk_rows=CHUNK_ROWS)
+    back = read_back(extension, str(target))[pmoc.DEVICE_COLUMNS]
+    pmoc.pd.testing.assert_frame_equal(as_text(back), expected(data, positions))
+    assert {'n/d', '31/02/2025'} <= set(as_text(back).values.ravel())
+
+
+def test_parquet_grava_um_row_group_por_bloco(data, tmp_path):
+    import pyarrow.parquet as pq
+    target = tmp_path / "export.parquet"
+    pmoc.write_export(data, pmoc.np.arange(ROWS), 'parquet', str(target), chunk_rows=CHUNK_ROWS)
+    assert pq.ParquetFile(str(target)).num_row_groups == -(-ROWS // CHUNK_ROWS)
@@ -0,0 +1,133 @@
+import pytest
+
+import pmoc
+from fake_sheets import FakeSheetsClient
+
+
+@pytest.fixture
+def remote():
+    """Planilha simulada e um segundo usuário que grava nela"""
+    client = FakeSheetsClient()
+    return client, pmoc.SheetsStorage("planilha", client=client)
+
+
+@pytest.fixture
+def seeded(store, monkeypatch):
+    """Base local com os dados iniciais, como init_data faz sem acesso ao remoto"""
+    monkeypatch.setattr(pmoc, "get_local_store", lambda: store)
+    pmoc.get_shared_state("save_queues").clear()
+    store.replace_all(pmoc.initial_devices(), synced=True, seed=True)
+    yield store
+    pmoc.get_shared_state("save_queues").clear()
+
+
+def edit(store, tag, text):
+    data = store.load_frame()
+    label = data.index[data['TAG'] == tag][0]
+    data.loc[label, 'Observações'] = text
+    store.apply_changes(data, [label], [])
+
+
+def observations(data):
+    return dict(zip(data['TAG'].astype(int), data['Observações']))
+
+
+def publish(storage, changes, drop=()):
+    data = pmoc.initial_devices()
+    for tag, text in changes.items():
+        data.loc[data['TAG'] == tag, 'Observações'] = text
+    data = data[~data['TAG'].isin(list(drop))]
+    assert storage.save(data, "credencial") is None
+    return data
+
+
+def test_base_semeada_nao_fica_com_versao_remota(seeded):
+    assert seeded.is_seed()
+    assert not seeded.has_remote_base()
+    assert not seeded.is_dirty()
+
+
+def test_sem_edicoes_a_base_passa_a_ser_a_remota(seeded, remote):
+    client, other = remote
+    published = publish(other, {1: 'remoto'}, drop=[41])
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    pmoc.adopt_remote(seeded, storage, "credencial")
+    assert observations(seeded.load_frame()) == observations(published)
+    assert seeded.has_remote_base() and not seeded.is_seed() and not seeded.is_dirty()
+
+
+def test_edicao_sobre_os_dados_iniciais_nao_gera_conflitos_espurios(seeded, remote):
+    client, other = remote
+    publish(other, {tag: 'remoto' for tag in range(1, 11)}, drop=[41])
+    edit(seeded, 20, 'local')
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    pmoc.adopt_remote(seeded, storage, "credencial")
+    assert seeded.list_conflicts() == []
+    assert pmoc.get_save_queue(storage).flush()
+    final = observations(other.load("credencial"))
+    assert final[20] == 'local'
+    assert all(final[tag] == 'remoto' for tag in range(1, 11))
+    assert 41 not in final
+    assert not seeded.is_dirty()
+
+
+def test_mesma_tag_alterada_nos_dois_lados_e_conflito(seeded, remote):
+    client, other = remote
+    publish(other, {5: 'remoto', 6: 'remoto'})
+    edit(seeded, 5, 'local')
+    pmoc.adopt_remote(seeded, pmoc.SheetsStorage("planilha", client=client), "credencial")
+    assert [conflict['TAG'] for conflict in seeded.list_conflicts()] == ['5']
+    local = observations(seeded.load_frame())
+    assert local[5] == 'remoto' and local[6] == 'remoto'
+
+
+def test_remoto_vazio_recebe_a_base_local(seeded, remote):
+    client, other = remote
+    edit(seeded, 3, 'local')
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    pmoc.adopt_remote(seeded, storage, "credencial")
+    assert pmoc.get_save_queue(storage).flush()
+    assert observations(other.load("credencial"))[3] == 'local'
+    assert seeded.has_remote_base() and not seeded.is_dirty()
+
+
+class Session(dict):
+    """st.session_state de uma sessão nova (fora do Streamlit as gravações não persistem)"""
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture
+def fresh_session(store, monkeypatch, tmp_path):
+    """init_data numa sessão nova, com a base do teste e sem sincronizador"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pmoc, "get_local_store", lambda: store)
+    monkeypatch.setattr(pmoc, "get_store_syncer", lambda: None)
+    loads = []
+    monkeypatch.setattr(pmoc, "load_devices", lambda *args, **kwargs: loads.append(args))
+    pmoc.get_shared_state("store_snapshot").clear()
+
+    def run():
+        monkeypatch.setattr(pmoc.st, "session_state", Session())
+        pmoc.init_data()
+        return loads
+
+    yield run
+    pmoc.get_shared_state("store_snapshot").clear()
+
+
+def test_base_nova_recebe_os_dados_iniciais(store, fresh_session):
+    assert store.is_new()
+    fresh_session()
+    assert store.count() == 41 and store.is_seed() and not store.is_new()
+
+
+def test_base_esvaziada_por_remocoes_nao_e_semeada_de_novo(store, fresh_session, monkeypatch):
+    monkeypatch.setenv("PMOC_GITHUB_TOKEN", "token")
+    store.replace_all(pmoc.initial_devices(), synced=True, remote_id="sha-remoto")
+    store.apply_changes(store.load_frame(), [], [str(tag) for tag in range(1, 42)])
+    loads = fresh_session()
+    assert store.count() == 0
+    assert len(pmoc.st.session_state.data) == 0
+    assert loads == []
+    assert store.is_dirty() and store.get_meta('remote_sha') == "sha-remoto"
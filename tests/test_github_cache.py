@@ -0,0 +1,67 @@
+import pytest
+
+import pmoc
+from fake_github import blob_sha
+
+REPO = "empresa/pmoc"
+FILE = "pmoc.csv"
+
+CSV = """TAG,Local,Setor,Marca,Modelo,BTU,Data Manutenção,Técnico Executante,Aprovação Supervisor,Próxima manutenção,Observações
+1,Matriz,CPD,GREE,Split,12000,01/03/2025,,,01/09/2025,
+2,Filial,RH,LG,Split,9000,,,,,
+"""
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Conta as leituras de CSV feitas por pmoc"""
+    calls = []
+    read = pmoc.read_devices_csv
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return read(*args, **kwargs)
+
+    monkeypatch.setattr(pmoc, "read_devices_csv", counting)
+    return calls
+
+
+def test_304_reaproveita_o_dataframe_sem_ler_o_csv(github, parses):
+    github.put_file(REPO, FILE, CSV)
+    first = pmoc.fetch_github_frame(REPO, FILE)
+    assert len(parses) == 1
+    for _ in range(3):
+        again = pmoc.fetch_github_frame(REPO, FILE)
+        pmoc.pd.testing.assert_frame_equal(again, first)
+    assert github.count("GET", 304) == 3
+    assert len(parses) == 1
+
+
+def test_copia_devolvida_nao_altera_o_cache(github):
+    github.put_file(REPO, FILE, CSV)
+    first = pmoc.fetch_github_frame(REPO, FILE)
+    first.loc[0, 'Observações'] = 'alterado'
+    assert pmoc.fetch_github_frame(REPO, FILE).loc[0, 'Observações'] == ''
+
+
+def test_etag_diferente_baixa_de_novo(github, parses):
+    github.put_file(REPO, FILE, CSV)
+    pmoc.fetch_github_frame(REPO, FILE)
+    github.put_file(REPO, FILE, CSV.replace("9000", "18000"))
+    frame = pmoc.fetch_github_frame(REPO, FILE)
+    assert frame['BTU'].tolist() == [12000, 18000]
+    assert github.count("GET", 200) == 2
+    assert github.count("GET", 304) == 0
+    assert len(parses) == 2
+    assert pmoc.read_github_cache(REPO, FILE)["sha"] == blob_sha(CSV.replace("9000", "18000").encode("utf-8"))
+
+
+def test_cache_em_disco_vale_para_outro_processo(github, parses):
+    github.put_file(REPO, FILE, CSV)
+    pmoc.fetch_github_frame(REPO, FILE)
+    # Um novo processo só tem o cache em disco: o 304 lê o CSV salvo uma única vez
+    pmoc.get_shared_state("github_frames").clear()
+    assert pmoc.fetch_github_frame(REPO, FILE)['TAG'].tolist() == [1, 2]
+    assert pmoc.fetch_github_frame(REPO, FILE)['TAG'].tolist() == [1, 2]
+    assert github.count("GET", 304) == 2
+    assert len(parses) == 2
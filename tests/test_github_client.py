@@ -0,0 +1,104 @@
+import time
+
+import pytest
+import requests
+
+import pmoc
+from fake_github import blob_sha
+
+REPO = "empresa/pmoc"
+FILE = "pmoc.csv"
+
+
+def make_client(monkeypatch, **kwargs):
+    """Cliente compartilhado do processo com esperas registradas em vez de dormidas"""
+    sleeps = []
+    client = pmoc.GitHubClient(sleep=sleeps.append, **{"max_retries": 3, "backoff": 1, "max_backoff": 8, **kwargs})
+    monkeypatch.setitem(pmoc.get_shared_state("github_client"), "client", client)
+    return client, sleeps
+
+
+@pytest.fixture
+def client(github, monkeypatch):
+    github.put_file(REPO, FILE, "conteúdo")
+    return make_client(monkeypatch)
+
+
+def test_erros_5xx_sao_repetidos(github, client):
+    http, sleeps = client
+    github.fail_next = [(502, {}), (503, {})]
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
+    assert github.count("GET") == 3
+    assert len(sleeps) == 2
+    assert http.stats == {"requests": 3, "retries": 2}
+
+
+def test_gravacao_tambem_e_repetida(github, client):
+    github.fail_next = [(500, {})]
+    sha = pmoc.put_github_text(REPO, FILE, "novo", sha=blob_sha("conteúdo".encode("utf-8")))
+    assert github.count("PUT") == 2
+    assert github.get_file(REPO, FILE) == "novo"
+    assert sha == blob_sha("novo".encode("utf-8"))
+
+
+@pytest.mark.parametrize("status", [429, 403])
+def test_retry_after_define_a_espera(github, client, status):
+    _, sleeps = client
+    github.fail_next = [(status, {"Retry-After": "5"})]
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
+    assert sleeps == [5]
+    assert github.count("GET") == 2
+
+
+def test_retry_after_respeita_o_teto(github, client):
+    _, sleeps = client
+    github.fail_next = [(429, {"Retry-After": "120"})]
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
+    assert sleeps == [8]
+
+
+def test_cota_esgotada_espera_ate_o_reset(github, client):
+    _, sleeps = client
+    reset = str(int(time.time()) + 6)
+    github.fail_next = [(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})]
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
+    assert len(sleeps) == 1 and 4 <= sleeps[0] <= 6
+
+
+def test_403_sem_limite_nao_e_repetido(github, client):
+    _, sleeps = client
+    github.fail_next = [(403, {})]
+    with pytest.raises(requests.HTTPError) as error:
+        pmoc.fetch_github_text(REPO, FILE)
+    assert error.value.response.status_code == 403
+    assert github.count("GET") == 1
+    assert sleeps == []
+
+
+def test_jitter_limitado_pelo_teto_exponencial(github, monkeypatch):
+    github.put_file(REPO, FILE, "conteúdo")
+    _, sleeps = make_client(monkeypatch, max_retries=6)
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return high
+
+    monkeypatch.setattr(pmoc.random, "uniform", uniform)
+    github.fail_next = [(500, {})] * 6
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
+    assert bounds == [(0, 1), (0, 2), (0, 4), (0, 8), (0, 8), (0, 8)]
+    assert sleeps == [1, 2, 4, 8, 8, 8]
+
+
+def test_tentativas_esgotadas_devolvem_o_erro(github, client):
+    http, sleeps = client
+    github.fail_next = [(503, {})] * 5
+    with pytest.raises(requests.HTTPError) as error:
+        pmoc.fetch_github_text(REPO, FILE)
+    assert error.value.response.status_code == 503
+    assert github.count("GET") == 4
+    assert len(sleeps) == 3
+    assert http.stats == {"requests": 4, "retries": 3}
+    # A falha que sobrou é consumida pela próxima leitura, que então se recupera
+    assert pmoc.fetch_github_text(REPO, FILE) == "conteúdo"
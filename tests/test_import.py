@@ -0,0 +1,28 @@
+import io
+
+import pmoc
+
+CSV = """TAG,Local,Setor,Marca,BTU
+1,Loja 3,CPD,GREE,0
+2,Matriz,CPD,GREE,12.000
+3,Matriz,CPD,GREE,130000
+4,Matriz,CPD,GREE,-1
+"""
+
+
+def validate():
+    raw = pmoc.pd.read_csv(io.StringIO(CSV), dtype=str, keep_default_na=False)
+    return pmoc.validate_import(raw, existing_tags=set())
+
+
+def test_faixa_de_btu_igual_a_dos_formularios():
+    accepted, errors = validate()
+    assert accepted['TAG'].tolist() == [1, 2]
+    assert accepted['BTU'].tolist() == [0, 12000]
+    assert errors[['Linha', 'Erro']].values.tolist() == [[4, pmoc.BTU_RANGE_ERROR], [5, pmoc.BTU_RANGE_ERROR]]
+
+
+def test_regra_de_btu_vale_para_um_numero():
+    assert not pmoc.btu_out_of_range(pmoc.BTU_MIN)
+    assert not pmoc.btu_out_of_range(pmoc.BTU_MAX)
+    assert pmoc.btu_out_of_range(pmoc.BTU_MAX + 1)
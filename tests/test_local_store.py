@@ -0,0 +1,195 @@
+import random
+import sqlite3
+from datetime import date
+
+import pytest
+
+import pmoc
+
+
+def device_row(tag, rng):
+    return {
+        'TAG': tag,
+        'Local': rng.choice(['Matriz', 'Filial', 'Depósito']),
+        'Setor': rng.choice(['CPD', 'RH', 'Recepção', '']),
+        'Marca': rng.choice(['GREE', 'LG', 'Midea']),
+        'Modelo': 'Split',
+        'BTU': rng.choice([9000, 12000, 18000, None]),
+        'Data Manutenção': rng.choice([date(2025, 1, 10), date(2025, 3, 5), None]),
+        'Técnico Executante': rng.choice(['Ana', 'Bruno', '']),
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': None,
+        'Observações': '',
+    }
+
+
+def rollup_rows(store):
+    return set(store.conn.execute(
+        "SELECT * FROM fleet_rollups WHERE unidades != 0 OR btu != 0").fetchall())
+
+
+def grouped_rows(store):
+    """Agregados calculados direto da tabela de aparelhos"""
+    rows = set()
+    for dimension, name in pmoc.ROLLUP_DIMENSIONS.items():
+        rows.update(store.conn.execute(
+            f"SELECT ?, COALESCE({name}, ''), COALESCE(data_manutencao, ''), COUNT(*), COALESCE(SUM(btu), 0) "
+            f"FROM devices GROUP BY 2, 3", (dimension,)).fetchall())
+    return rows
+
+
+def test_gatilhos_mantem_os_agregados_iguais_ao_recalculo(store):
+    rng = random.Random(22)
+    store.replace_all(pmoc.initial_devices(), synced=True)
+    assert rollup_rows(store) == grouped_rows(store)
+    next_tag = 1000
+    for step in range(150):
+        devices = pmoc.DeviceRepository(store.load_frame())
+        for _ in range(rng.randint(1, 3)):
+            tags = devices.tags()
+            operation = rng.choice(['incluir', 'alterar', 'alterar', 'remover', 'renomear'])
+            if operation == 'incluir' or len(tags) < 5:
+                devices.add(device_row(next_tag, rng))
+                next_tag += 1
+            elif operation == 'alterar':
+                fields = {column: value for column, value in device_row(0, rng).items()
+                          if column != 'TAG' and rng.random() < 0.4}
+                devices.update(rng.choice(tags), fields)
+            elif operation == 'remover':
+                devices.delete(rng.choice(tags))
+            else:
+                devices.update(rng.choice(tags), {'TAG': next_tag})
+                next_tag += 1
+        store.apply_changes(devices.data, *devices.pop_changes())
+        assert rollup_rows(store) == grouped_rows(store), f"passo {step}"
+    incremental = store.rollups('Local', today=date(2025, 9, 1))
+    with store.conn:
+        store._rebuild_rollups()
+    assert rollup_rows(store) == grouped_rows(store)
+    pmoc.pd.testing.assert_frame_equal(store.rollups('Local', today=date(2025, 9, 1)), incremental)
+
+
+def searchable(store):
+    store.replace_all(pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': [1, 2, 3, 4],
+        'Local': 'Matriz',
+        'Setor': ['Sala Reunião', 'CPD', 'Recepção', 'Diretoria'],
+        'Marca': ['GREE', 'LG', 'Midea', 'GREE'],
+        'Modelo': ['GWC24QE-D3NNB4D/I', 'S4-Q12JA3WF', 'MSC09', 'GWC09QB'],
+        'BTU': 12000,
+        'Data Manutenção': '',
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '',
+        'Observações': ['', 'vazamento no dreno', 'near the door', 'ruído "alto" - verificar'],
+    })), synced=True)
+    return store
+
+
+def found(store, text):
+    tags = store.search(text)
+    return None if tags is None else sorted(int(tag) for tag in tags)
+
+
+def test_busca_ignora_acentos_e_maiusculas(store):
+    searchable(store)
+    assert found(store, "reuniao") == [1]
+    assert found(store, "REUNIÃO") == [1]
+    assert found(store, "recepcao") == [3]
+    assert found(store, "ruido") == [4]
+
+
+def test_busca_por_inicio_de_palavra_no_modelo_e_na_marca(store):
+    searchable(store)
+    assert found(store, "GWC24") == [1]
+    assert found(store, "gwc") == [1, 4]
+    assert found(store, "D3NN") == [1]
+    assert found(store, "gre") == [1, 4]
+    # Todos os termos precisam ser encontrados
+    assert found(store, "gree reun") == [1]
+    assert found(store, "gree cpd") == []
+
+
+def test_sintaxe_do_fts_no_texto_e_tratada_como_palavra(store):
+    searchable(store)
+    assert found(store, 'vazamento"') == [2]
+    assert found(store, '"alto" -') == [4]
+    assert found(store, 'dreno*') == [2]
+    assert found(store, '-vazamento') == [2]
+    # Operadores viram termos comuns: NEAR, OR e colunas não mudam o sentido da busca
+    assert found(store, 'NEAR') == [3]
+    assert found(store, 'near door') == [3]
+    assert found(store, 'NEAR(vazamento dreno)') == []
+    assert found(store, 'vazamento OR ruido') == []
+    assert found(store, 'observacoes:vazamento') == []
+    assert found(store, '^cpd') == [2]
+    assert found(store, '" * - ( )') is None
+
+
+def maintained(store, dates):
+    """Frota com uma manutenção registrada por data, cada uma como o app registra"""
+    store.replace_all(pmoc.initial_devices(), synced=True)
+    devices = pmoc.DeviceRepository(store.load_frame())
+    for tag, day, technician in dates:
+        devices.update(tag, {'Data Manutenção': day, 'Técnico Executante': technician})
+        changed, deleted = devices.pop_changes()
+        store.apply_changes(devices.data, changed, deleted, events=devices.data.loc[[devices.label(tag)]])
+    return devices
+
+
+def latest(store):
+    events = store.latest_events()
+    return {tag: (day.date(), technician) for tag, day, technician
+            in zip(events['TAG'], events['Data Manutenção'], events['Técnico Executante'])}
+
+
+def test_historico_so_aceita_inclusoes(store):
+    maintained(store, [(1, date(2025, 4, 1), 'Ana')])
+    total = store.count_events()
+    with pytest.raises(sqlite3.DatabaseError, match="não pode ser alterado"):
+        with store.conn:
+            store.conn.execute("UPDATE maintenance_events SET tecnico = 'Bruno'")
+    with pytest.raises(sqlite3.DatabaseError, match="não pode ser alterado"):
+        with store.conn:
+            store.conn.execute("DELETE FROM maintenance_events")
+    # Recarregar a frota inteira não apaga o histórico
+    store.replace_all(pmoc.initial_devices(), synced=True)
+    assert store.count_events() == total
+    assert store.query_events(tag=1)['Técnico Executante'].tolist() == ['Ana']
+
+
+def test_ultima_manutencao_de_cada_aparelho(store):
+    maintained(store, [(1, date(2025, 4, 1), 'Ana'), (1, date(2025, 6, 1), 'Bruno'),
+                       (2, date(2025, 5, 1), 'Ana'), (2, date(2025, 5, 1), 'Carla')])
+    # Registro atrasado de uma manutenção antiga não substitui a mais recente
+    store.conn.execute("INSERT INTO maintenance_events (tag, data_manutencao, tecnico, origem, registrado_em) "
+                       "VALUES ('1', '2025-01-15', 'Davi', 'registro', '2025-06-02T10:00:00')")
+    assert latest(store)[1] == (date(2025, 6, 1), 'Bruno')
+    # Na mesma data, vale o registro mais recente
+    assert latest(store)[2] == (date(2025, 5, 1), 'Carla')
+    assert store.query_events(tag=1)['Técnico Executante'].tolist() == ['Bruno', 'Ana', 'Davi']
+
+
+def test_tag_renomeada_leva_a_ultima_manutencao(store):
+    devices = maintained(store, [(5, date(2025, 4, 1), 'Ana'), (5, date(2025, 6, 1), 'Bruno')])
+    devices.update(5, {'TAG': 500})
+    store.apply_changes(devices.data, *devices.pop_changes())
+    ultimas = latest(store)
+    assert 5 not in ultimas
+    assert ultimas[500] == (date(2025, 6, 1), 'Bruno')
+    # O histórico da TAG antiga é mantido como foi registrado
+    assert store.query_events(tag=5)['Técnico Executante'].tolist() == ['Bruno', 'Ana']
+    maintained_again = pmoc.DeviceRepository(store.load_frame())
+    maintained_again.update(500, {'Data Manutenção': date(2025, 9, 1), 'Técnico Executante': 'Carla'})
+    changed, deleted = maintained_again.pop_changes()
+    store.apply_changes(maintained_again.data, changed, deleted,
+                        events=maintained_again.data.loc[[maintained_again.label(500)]])
+    assert latest(store)[500] == (date(2025, 9, 1), 'Carla')
+    assert store.query_events(tag=500)['origem'].tolist() == ['registro', 'cadastro']
+
+
+def test_historico_por_faixas_de_tag(store):
+    maintained(store, [(tag, date(2025, 4, tag), 'Ana') for tag in (1, 2, 3, 10, 12, 20)])
+    events = store.query_events(tag_ranges=pmoc.parse_tag_ranges("2, 10-12"))
+    assert sorted(events['TAG'].tolist()) == [2, 10, 12]
+    assert len(store.query_events(tag_ranges=[])) == 6
@@ -0,0 +1,133 @@
+import pytest
+
+import pmoc
+
+REPO = "empresa/pmoc"
+FILE = "pmoc.csv"
+
+
+def fleet(rows=5):
+    return pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': range(1, rows + 1),
+        'Local': 'Matriz',
+        'Setor': 'CPD',
+        'Marca': 'GREE',
+        'Modelo': 'Split',
+        'BTU': 12000,
+        'Data Manutenção': '01/03/2025',
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '01/09/2025',
+        'Observações': '',
+    }))
+
+
+def with_observation(data, tag, text):
+    data = data.copy()
+    data.loc[data['TAG'] == tag, 'Observações'] = text
+    return data
+
+
+def observations(data):
+    return dict(zip(data['TAG'].astype(int), data['Observações']))
+
+
+def test_edicao_so_de_um_lado_prevalece():
+    base = fleet()
+    ours = with_observation(base, 1, 'nosso')
+    theirs = with_observation(base, 2, 'deles')
+    merged, conflicts = pmoc.merge_device_frames(base, ours, theirs)
+    assert conflicts == []
+    assert observations(merged) == {1: 'nosso', 2: 'deles', 3: '', 4: '', 5: ''}
+
+
+def test_inclusao_e_remocao_de_um_lado_prevalecem():
+    base = fleet()
+    ours = pmoc.concat_devices([base[base['TAG'] != 3], fleet(1).assign(TAG=9)], ignore_index=True)
+    theirs = base[base['TAG'] != 5]
+    merged, conflicts = pmoc.merge_device_frames(base, ours, theirs)
+    assert conflicts == []
+    assert sorted(merged['TAG'].astype(int)) == [1, 2, 4, 9]
+
+
+def test_mesma_tag_editada_dos_dois_lados_e_conflito():
+    base = fleet()
+    ours = with_observation(base, 2, 'nosso')
+    theirs = with_observation(base, 2, 'deles')
+    merged, conflicts = pmoc.merge_device_frames(base, ours, theirs)
+    assert [c['TAG'] for c in conflicts] == ['2']
+    assert conflicts[0]['local']['Observações'] == 'nosso'
+    assert conflicts[0]['remoto']['Observações'] == 'deles'
+    assert observations(merged)[2] == 'deles'
+
+
+def test_edicao_contra_remocao_e_conflito():
+    base = fleet()
+    ours = with_observation(base, 4, 'nosso')
+    theirs = base[base['TAG'] != 4]
+    merged, conflicts = pmoc.merge_device_frames(base, ours, theirs)
+    assert [(c['TAG'], c['remoto']) for c in conflicts] == [('4', None)]
+    assert 4 not in set(merged['TAG'])
+
+
+def test_sem_base_toda_diferenca_e_conflito():
+    # Ex.: dados iniciais semeados localmente, sem nenhuma versão do GitHub como base
+    seed = fleet()
+    theirs = with_observation(fleet(), 3, 'deles')
+    merged, conflicts = pmoc.merge_device_frames(None, with_observation(seed, 1, 'nosso'), theirs)
+    assert sorted(c['TAG'] for c in conflicts) == ['1', '3']
+    assert observations(merged) == observations(theirs)
+
+
+def test_conflito_409_mescla_e_grava_de_novo(github):
+    github.put_file(REPO, FILE, pmoc.to_csv_text(fleet()))
+    ours = pmoc.fetch_github_frame(REPO, FILE)
+    # Outra gravação chega depois da nossa leitura
+    github.put_file(REPO, FILE, pmoc.to_csv_text(with_observation(fleet(), 2, 'deles')))
+    merged, conflicts = pmoc.push_to_github(REPO, FILE, with_observation(ours, 1, 'nosso'))
+    assert conflicts == []
+    assert github.count("PUT", 409) == 1
+    assert github.count("PUT", 200) == 1
+    saved = pmoc.read_devices_csv(pmoc.io.StringIO(github.get_file(REPO, FILE)))
+    assert observations(saved) == observations(merged)
+    assert observations(saved)[1] == 'nosso' and observations(saved)[2] == 'deles'
+    # A versão gravada vira a nova base: a próxima gravação não precisa mesclar
+    assert pmoc.push_to_github(REPO, FILE, with_observation(merged, 3, 'depois')) is None
+    assert github.count("PUT", 409) == 1
+
+
+def test_conflito_409_na_mesma_tag_mantem_a_versao_remota(github):
+    github.put_file(REPO, FILE, pmoc.to_csv_text(fleet()))
+    ours = pmoc.fetch_github_frame(REPO, FILE)
+    github.put_file(REPO, FILE, pmoc.to_csv_text(with_observation(fleet(), 2, 'deles')))
+    merged, conflicts = pmoc.push_to_github(REPO, FILE, with_observation(ours, 2, 'nosso'))
+    assert [c['TAG'] for c in conflicts] == ['2']
+    assert observations(merged)[2] == 'deles'
+
+
+def test_conflitos_seguidos_desistem(github, monkeypatch):
+    github.put_file(REPO, FILE, pmoc.to_csv_text(fleet()))
+    ours = pmoc.fetch_github_frame(REPO, FILE)
+    fetch = pmoc.fetch_github_file
+    writes = []
+
+    def fetch_and_change(*args, **kwargs):
+        # Outra gravação chega logo depois de cada releitura
+        result = fetch(*args, **kwargs)
+        writes.append(github.put_file(REPO, FILE, pmoc.to_csv_text(with_observation(fleet(), 2, str(len(writes))))))
+        return result
+
+    github.put_file(REPO, FILE, pmoc.to_csv_text(with_observation(fleet(), 2, 'deles')))
+    monkeypatch.setattr(pmoc, "fetch_github_file", fetch_and_change)
+    with pytest.raises(pmoc.GitHubConflict):
+        pmoc.push_to_github(REPO, FILE, with_observation(ours, 1, 'nosso'))
+    assert github.count("PUT", 409) == pmoc.GITHUB_MERGE_ATTEMPTS
+
+
+def test_gravacao_sem_base_conhecida_vira_conflito(github):
+    # Dados semeados localmente: nada foi lido do GitHub, então não há versão de base em cache
+    github.put_file(REPO, FILE, pmoc.to_csv_text(with_observation(fleet(), 3, 'deles')))
+    merged, conflicts = pmoc.push_to_github(REPO, FILE, with_observation(fleet(), 1, 'nosso'))
+    assert sorted(c['TAG'] for c in conflicts) == ['1', '3']
+    assert github.get_file(REPO, FILE) == pmoc.to_csv_text(merged)
+    assert observations(merged)[3] == 'deles' and observations(merged)[1] == ''
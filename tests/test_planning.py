@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import pmoc
+
+MONDAY = date(2025, 9, 1)
+TECHNICIANS = ['Ana', 'Bruno']
+
+
+def fleet(last_dates):
+    return pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': range(1, len(last_dates) + 1),
+        'Local': 'Matriz',
+        'Setor': 'CPD',
+        'Marca': 'GREE',
+        'Modelo': 'Split',
+        'BTU': 12000,
+        'Data Manutenção': [day.strftime('%d/%m/%Y') if day else '' for day in last_dates],
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '',
+        'Observações': '',
+    }))
+
+
+def plan(last_dates, start=MONDAY, horizon_days=20, technicians=TECHNICIANS, daily_capacity=2, default_days=30):
+    return pmoc.build_maintenance_plan(fleet(last_dates), start, horizon_days, technicians, daily_capacity,
+                                       default_days=default_days)
+
+
+def day(value):
+    return value.date()
+
+
+def test_capacidade_diaria_por_tecnico():
+    # Dez aparelhos vencendo no mesmo dia, dois técnicos com duas manutenções por dia
+    result = plan([MONDAY - timedelta(days=30)] * 10)
+    per_day = result.groupby('Data planejada').size()
+    assert [(day(d), n) for d, n in per_day.items()] == [
+        (MONDAY, 4), (MONDAY + timedelta(days=1), 4), (MONDAY + timedelta(days=2), 2)]
+    assert result.groupby(['Data planejada', 'Técnico'], observed=True).size().max() == 2
+    assert result['Atraso (dias)'].tolist() == [0] * 4 + [1] * 4 + [2] * 2
+
+
+def test_fim_de_semana_fica_para_segunda():
+    saturday = date(2025, 9, 6)
+    result = plan([saturday - timedelta(days=30)], technicians=['Ana'], daily_capacity=1)
+    first = result.iloc[0]
+    assert day(first['Vencimento']) == saturday
+    assert day(first['Data planejada']) == date(2025, 9, 8)
+    assert first['Atraso (dias)'] == 2
+
+
+def test_sobra_da_sexta_vai_para_o_dia_util_seguinte():
+    friday = date(2025, 9, 5)
+    result = plan([friday - timedelta(days=30)] * 3, technicians=['Ana'], daily_capacity=2)
+    assert [day(d) for d in result['Data planejada']] == [friday, friday, date(2025, 9, 8)]
+    assert all(d.weekday() < 5 for d in result['Data planejada'])
+
+
+def test_atrasados_e_nunca_mantidos_entram_no_inicio():
+    saturday = date(2025, 9, 6)
+    result = plan([date(2024, 1, 10), None, saturday - timedelta(days=10)], start=saturday,
+                  horizon_days=40, daily_capacity=5)
+    first = result.drop_duplicates('TAG').set_index('TAG')
+    assert day(first.loc[1, 'Vencimento']) == saturday
+    assert day(first.loc[2, 'Vencimento']) == saturday
+    assert day(first.loc[3, 'Vencimento']) == saturday + timedelta(days=20)
+    # O início cai num sábado: os atrasados vão para segunda
+    assert day(first.loc[1, 'Data planejada']) == date(2025, 9, 8)
+    # Depois da primeira, as ocorrências seguem o intervalo a partir do início
+    assert [day(d) for d in result.loc[result['TAG'] == 1, 'Vencimento']] == [saturday, saturday + timedelta(days=30)]
+
+
+def test_distribuicao_igual_a_uma_alocacao_dia_a_dia():
+    rng = np.random.default_rng(19)
+    last = [MONDAY - timedelta(days=int(offset)) if offset >= 0 else None
+            for offset in rng.integers(-5, 60, size=80)]
+    result = plan(last, horizon_days=60, technicians=['Ana', 'Bruno', 'Carla'], daily_capacity=3)
+    start = np.datetime64(MONDAY, 'D')
+    used = {}
+    expected = []
+    for due in result['Vencimento'].to_numpy(dtype='datetime64[D]'):
+        current = np.busday_offset(due, 0, roll='forward')
+        while used.get(current, 0) >= 9:
+            current = np.busday_offset(current, 1)
+        used[current] = used.get(current, 0) + 1
+        expected.append(current)
+    assert (result['Data planejada'].to_numpy(dtype='datetime64[D]') == np.array(expected)).all()
+    assert result['Data planejada'].min() >= pmoc.pd.Timestamp(start)
+    assert result.groupby(['Data planejada', 'Técnico'], observed=True).size().max() <= 3
@@ -0,0 +1,32 @@
+import pmoc
+
+
+def fleet():
+    return pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': [1, 2],
+        'Local': 'Matriz',
+        'Setor': 'CPD',
+        'Marca': 'GREE',
+        'Modelo': 'Split',
+        'BTU': 12000,
+        'Data Manutenção': ['01/03/2025', ''],
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': ['01/09/2025', ''],
+        'Observações': '',
+    }))
+
+
+def test_relatorio_gerado_em_processo_spawn_e_reaproveitado(tmp_path):
+    jobs = pmoc.ReportJobs(pmoc.ReportCache(str(tmp_path)), workers=1)
+    try:
+        key = jobs.submit(fleet(), "Relatório")
+        assert jobs.executor._mp_context.get_start_method() == "spawn"
+        situacao, content = jobs.status(key, wait=60)
+        assert situacao == 'pronto'
+        assert content.startswith(b"%PDF")
+        # O mesmo pedido sai do cache, sem novo processo
+        assert jobs.submit(fleet(), "Relatório") == key
+        assert jobs.status(key) == ('pronto', content)
+    finally:
+        jobs.executor.shutdown()
@@ -0,0 +1,95 @@
+import time
+
+import pmoc
+
+
+class Writer:
+    """Writer que falha enquanto `error` estiver definido"""
+
+    def __init__(self):
+        self.error = RuntimeError("401 Unauthorized")
+        self.calls = []
+
+    def __call__(self, repo, file_path, data, token):
+        self.calls.append(token)
+        if self.error:
+            raise self.error
+
+
+def frame():
+    return pmoc.pd.DataFrame({'TAG': [1]})
+
+
+def wait_for(queue):
+    return queue._due_at - time.monotonic()
+
+
+def test_falhas_seguidas_dobram_a_espera_ate_o_teto():
+    writer = Writer()
+    queue = pmoc.SaveQueue("repo", "pmoc.csv", window=100, writer=writer, max_backoff=500)
+    queue.submit(frame(), "token")
+    delays = []
+    for _ in range(5):
+        assert not queue.flush()
+        delays.append(round(wait_for(queue), -1))
+    assert delays == [100, 200, 400, 500, 500]
+    status = queue.status()
+    assert status["failures"] == 5
+    assert status["last_error"] == "401 Unauthorized"
+    assert status["pending_edits"] == 1
+    assert status["next_retry_at"] is not None
+
+
+def test_nova_alteracao_nao_encurta_a_espera():
+    writer = Writer()
+    queue = pmoc.SaveQueue("repo", "pmoc.csv", window=100, writer=writer, max_backoff=1000)
+    queue.submit(frame(), "token")
+    queue.flush()
+    queue.flush()
+    queue.submit(frame(), "token novo")
+    assert round(wait_for(queue), -1) == 200
+    assert queue.status()["pending_edits"] == 2
+
+
+def test_envio_bem_sucedido_zera_as_falhas():
+    writer = Writer()
+    queue = pmoc.SaveQueue("repo", "pmoc.csv", window=100, writer=writer)
+    queue.submit(frame(), "token")
+    queue.flush()
+    queue.submit(frame(), "token corrigido")
+    writer.error = None
+    assert queue.flush()
+    assert writer.calls[-1] == "token corrigido"
+    status = queue.status()
+    assert (status["failures"], status["last_error"], status["next_retry_at"]) == (0, None, None)
+    assert (status["pending_edits"], status["commits"], status["flushed_edits"]) == (0, 1, 2)
+
+
+
+def test_erro_apos_o_envio_nao_para_a_fila():
+    writer = Writer()
+    writer.error = None
+    flushed = []
+
+    def on_flushed(version, data, result):
+        flushed.append(version)
+        if len(flushed) == 1:
+            raise RuntimeError("database is locked")
+
+    queue = pmoc.SaveQueue("repo", "pmoc.csv", window=0.05, writer=writer, on_flushed=on_flushed)
+    queue.submit(frame(), "token", version=1)
+    deadline = time.monotonic() + 5
+    while not flushed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert queue._worker.is_alive()
+    status = queue.status()
+    assert "database is locked" in status["last_error"]
+    assert (status["commits"], status["failures"], status["pending_edits"]) == (1, 0, 0)
+    # A thread continua enviando as alterações seguintes
+    queue.submit(frame(), "token", version=2)
+    deadline = time.monotonic() + 5
+    while len(flushed) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flushed == [1, 2]
+    assert queue.status()["last_error"] is None
@@ -0,0 +1,121 @@
+import pytest
+
+import pmoc
+
+REPO = "empresa/pmoc"
+FILE = "pmoc.csv"
+
+
+@pytest.fixture
+def storage(github):
+    return pmoc.GitHubStorage(REPO, FILE, layout="sharded")
+
+
+@pytest.fixture
+def synced(store, monkeypatch):
+    monkeypatch.setattr(pmoc, "get_local_store", lambda: store)
+    pmoc.get_shared_state("save_queues").clear()
+    yield store
+    pmoc.get_shared_state("save_queues").clear()
+
+
+def fresh_process(tmp_path, monkeypatch, name):
+    """Cache em disco vazio e sem quadros em memória, como num processo recém-iniciado"""
+    monkeypatch.setattr(pmoc, "CACHE_DIR", str(tmp_path / name))
+    pmoc.get_shared_state("github_frames").clear()
+
+
+def edit(store, tag, text):
+    data = store.load_frame()
+    label = data.index[data['TAG'] == tag][0]
+    data.loc[label, 'Observações'] = text
+    store.apply_changes(data, [label], [])
+
+
+def observation(data, tag):
+    return data.loc[data['TAG'] == tag, 'Observações'].iloc[0]
+
+
+def test_processo_novo_le_grava_e_envia(github, storage, synced, tmp_path, monkeypatch):
+    assert storage.save(pmoc.initial_devices()) is None
+    fresh_process(tmp_path, monkeypatch, "novo")
+    assert storage.identity() is None
+    pmoc.adopt_remote(synced, storage, "token")
+    manifest_sha = storage.identity()
+    assert manifest_sha is not None
+    assert synced.has_remote_base() and synced.get_meta('remote_sha') == manifest_sha
+    # Sem mudanças remotas, a sincronização não substitui a base a cada ciclo
+    version = synced.version
+    monkeypatch.setattr(pmoc, "get_storage", lambda config=None: storage)
+    monkeypatch.setattr(pmoc, "load_config", lambda: {'github_token': "token"})
+    syncer = pmoc.StoreSyncer(synced, interval=3600)
+    syncer.sync_once()
+    syncer.sync_once()
+    assert syncer.last_error is None
+    assert synced.version == version
+    edit(synced, 30, 'processo novo')
+    queue = pmoc.get_save_queue(storage)
+    queue.submit(synced.load_frame(), "token", version=synced.version)
+    assert queue.flush()
+    assert queue.status()["last_error"] is None
+    assert not synced.is_dirty()
+    assert synced.get_meta('remote_sha') == storage.identity() != manifest_sha
+    fresh_process(tmp_path, monkeypatch, "outro")
+    assert observation(storage.load("token"), 30) == 'processo novo'
+
+
+def test_manifesto_inalterado_tambem_registra_a_identidade(github, storage, tmp_path, monkeypatch):
+    data = pmoc.initial_devices()
+    assert storage.save(data) is None
+    fresh_process(tmp_path, monkeypatch, "novo")
+    assert storage.save(data) is None
+    assert storage.identity() is not None
+
+
+def test_repositorio_ainda_em_arquivo_unico(github, storage):
+    github.put_file(REPO, FILE, pmoc.to_csv_text(pmoc.initial_devices()))
+    assert len(storage.load("token")) == 41
+    assert storage.identity() == pmoc.read_github_cache(REPO, FILE)["sha"]
+
+
+def puts(github):
+    """Arquivos gravados, na ordem das requisições"""
+    return sorted(path.split("/contents/")[1] for method, path, _ in github.requests if method == "PUT")
+
+
+def test_build_shards_separa_por_local():
+    data = pmoc.initial_devices()
+    data['Local'] = data['Local'].cat.add_categories(['Filíal']).astype(object)
+    data.loc[data['TAG'] == 41, 'Local'] = 'Filíal'
+    shards = pmoc.build_shards(pmoc.to_typed(data))
+    assert set(shards) == {'Matriz', 'Filial', 'Filíal'}
+    assert sum(shard["rows"] for shard in shards.values()) == 41
+    assert shards['Filial']["path"] == f"{pmoc.SHARD_DIR}/filial.csv"
+    # Locais que só diferem no acento não dividem o arquivo
+    assert shards['Filíal']["path"] != shards['Filial']["path"]
+    assert shards['Filíal']["path"].startswith(f"{pmoc.SHARD_DIR}/filial-")
+    for local, shard in shards.items():
+        back = pmoc.read_devices_csv(pmoc.io.StringIO(shard["text"]))
+        assert set(back['Local']) == {local} and len(back) == shard["rows"]
+
+
+def test_alterar_um_local_grava_so_ele_e_o_manifesto(github, storage):
+    data = pmoc.initial_devices()
+    assert storage.save(data) is None
+    github.requests.clear()
+    data.loc[data['TAG'] == 25, 'Observações'] = 'só na Filial'
+    assert storage.save(data) is None
+    assert puts(github) == [f"{pmoc.SHARD_DIR}/filial.csv", pmoc.SHARD_MANIFEST]
+    github.requests.clear()
+    # Sem mudanças, nada é gravado
+    assert storage.save(data) is None
+    assert puts(github) == []
+
+
+def test_processo_novo_le_os_locais_gravados(github, storage, tmp_path, monkeypatch):
+    data = pmoc.initial_devices()
+    data.loc[data['TAG'] == 3, 'Observações'] = 'na Matriz'
+    assert storage.save(data) is None
+    fresh_process(tmp_path, monkeypatch, "novo")
+    loaded = pmoc.GitHubStorage(REPO, FILE, layout="sharded").load("token")
+    pmoc.pd.testing.assert_frame_equal(pmoc.to_csv_frame(loaded), pmoc.to_csv_frame(data))
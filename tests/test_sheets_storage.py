@@ -0,0 +1,134 @@
+import pytest
+
+import pmoc
+from fake_sheets import FakeSheetsClient
+
+
+def fleet(rows=20):
+    return pmoc.to_typed(pmoc.pd.DataFrame({
+        'TAG': range(1, rows + 1),
+        'Local': 'Matriz',
+        'Setor': [f'Setor {i % 4}' for i in range(rows)],
+        'Marca': 'GREE',
+        'Modelo': 'Split',
+        'BTU': 12000,
+        'Data Manutenção': '01/03/2025',
+        'Técnico Executante': '',
+        'Aprovação Supervisor': '',
+        'Próxima manutenção': '01/09/2025',
+        'Observações': '',
+    }))
+
+
+def observation(data, tag):
+    return data.loc[data['TAG'] == tag, 'Observações'].iloc[0]
+
+
+def with_observation(data, tag, text):
+    data = data.copy()
+    data.loc[data['TAG'] == tag, 'Observações'] = text
+    return data
+
+
+@pytest.fixture
+def client():
+    return FakeSheetsClient()
+
+
+@pytest.fixture
+def storage(client):
+    storage = pmoc.SheetsStorage("planilha", client=client)
+    assert storage.save(fleet(), "credencial") is None
+    return storage
+
+
+def remote(client):
+    """Aba como outro usuário a veria agora"""
+    return pmoc.SheetsStorage("planilha", client=client).load("credencial")
+
+
+def test_grava_so_a_linha_alterada(client, storage):
+    client.reset()
+    data = with_observation(fleet(), 5, 'filtro trocado')
+    assert storage.save(data, "credencial", base_id=storage.identity()) is None
+    assert client.count("batch_update") == 1
+    assert client.count("append_rows") == 0
+    assert client.cells_written() == len(pmoc.DEVICE_COLUMNS)
+    assert observation(remote(client), 5) == 'filtro trocado'
+
+
+def test_identidade_igual_para_quem_le_a_mesma_aba(client, storage):
+    other = pmoc.SheetsStorage("planilha", client=client)
+    other.load("credencial")
+    assert other.identity() == storage.identity()
+
+
+def test_inclusao_e_remocao_deslocam_as_linhas(client, storage):
+    data = fleet().iloc[[i for i in range(20) if i not in (2, 9)]]
+    new = fleet(1).assign(TAG=99)
+    data = pmoc.concat_devices([data, new], ignore_index=True)
+    client.reset()
+    assert storage.save(data, "credencial") is None
+    assert client.count("append_rows") == 1
+    assert client.count("spreadsheet_batch_update") == 1
+    assert client.cells_written() == len(pmoc.DEVICE_COLUMNS)
+    assert remote(client)['TAG'].tolist() == data['TAG'].tolist()
+    # Depois das remoções, a próxima edição cai na linha certa
+    assert storage.save(with_observation(data, 20, 'última'), "credencial") is None
+    assert observation(remote(client), 20) == 'última'
+    assert remote(client)['Observações'].tolist().count('última') == 1
+
+
+def test_remocao_por_outro_usuario_acima_da_linha_editada(client, storage):
+    other = pmoc.SheetsStorage("planilha", client=client)
+    theirs = other.load("credencial")
+    assert other.save(theirs[theirs['TAG'] != 1], "credencial") is None
+    # A linha do TAG 10 subiu; a conferência percebe e a edição é mesclada por TAG
+    ours = with_observation(fleet(), 10, 'nosso')
+    merged, conflicts = storage.save(ours, "credencial", base_id=storage.identity())
+    assert conflicts == []
+    assert 1 not in set(merged['TAG'])
+    final = remote(client)
+    assert 1 not in set(final['TAG'])
+    assert observation(final, 10) == 'nosso'
+    assert observation(final, 11) == ''
+
+
+def test_edicao_de_outro_usuario_em_outra_linha_e_preservada(client, storage):
+    other = pmoc.SheetsStorage("planilha", client=client)
+    assert other.save(with_observation(other.load("credencial"), 3, 'deles'), "credencial") is None
+    # Só a linha do TAG 7 é conferida e gravada; a do TAG 3 não é tocada
+    ours = with_observation(fleet(), 7, 'nosso')
+    assert storage.save(ours, "credencial", base_id=storage.identity()) is None
+    assert storage.save(with_observation(ours, 8, 'depois'), "credencial") is None
+    final = remote(client)
+    assert observation(final, 3) == 'deles'
+    assert observation(final, 7) == 'nosso'
+    assert observation(final, 8) == 'depois'
+
+
+def test_edicao_concorrente_da_mesma_linha_gera_conflito(client, storage):
+    base = storage.identity()
+    other = pmoc.SheetsStorage("planilha", client=client)
+    assert other.save(with_observation(other.load("credencial"), 7, 'deles'), "credencial") is None
+    ours = with_observation(with_observation(fleet(), 7, 'nosso'), 8, 'sem disputa')
+    merged, conflicts = storage.save(ours, "credencial", base_id=base)
+    assert [c['TAG'] for c in conflicts] == ['7']
+    assert conflicts[0]['local']['Observações'] == 'nosso'
+    assert conflicts[0]['remoto']['Observações'] == 'deles'
+    # A versão remota fica na aba até o conflito ser resolvido; a outra edição é gravada
+    final = remote(client)
+    assert observation(final, 7) == 'deles'
+    assert observation(final, 8) == 'sem disputa'
+    assert observation(merged, 7) == 'deles'
+
+
+def test_edicao_direta_na_planilha_e_detectada(client, storage):
+    worksheet = client.spreadsheets["planilha"].worksheet(pmoc.SHEETS_WORKSHEET)
+    row = list(pmoc.sheet_rows(fleet())[4])
+    row[-1] = 'editado na planilha'
+    worksheet.set_row(6, row)
+    merged, conflicts = storage.save(with_observation(fleet(), 5, 'pelo app'), "credencial",
+                                     base_id=storage.identity())
+    assert [c['TAG'] for c in conflicts] == ['5']
+    assert observation(remote(client), 5) == 'editado na planilha'
@@ -0,0 +1,38 @@
+import json
+
+import pmoc
+
+
+def entry(i):
+    # Linhas do mesmo tamanho, para o limite caber um número exato delas
+    return {'span': 'teste', 'ms': float(i % 10), 'at': f'{i:08d}'}
+
+
+def test_sem_log_os_spans_ficam_so_em_memoria(tmp_path):
+    recorder = pmoc.SpanRecorder(log_path="", history=5)
+    for i in range(20):
+        recorder.record(entry(i))
+    assert [e['at'] for e in recorder.samples['teste']] == ['00000015', '00000016', '00000017', '00000018', '00000019']
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_log_e_rotacionado_ao_passar_do_limite(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    line = len(json.dumps(entry(0)) + "\n")
+    recorder = pmoc.SpanRecorder(log_path=str(path), max_bytes=10 * line)
+    for i in range(25):
+        recorder.record(entry(i))
+    current = [json.loads(text)['at'] for text in path.read_text().splitlines()]
+    rotated = [json.loads(text)['at'] for text in (tmp_path / "spans.jsonl.1").read_text().splitlines()]
+    assert rotated == [f'{i:08d}' for i in range(10, 20)]
+    assert current == [f'{i:08d}' for i in range(20, 25)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["spans.jsonl", "spans.jsonl.1"]
+
+
+def test_log_existente_conta_para_o_limite(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    line = len(json.dumps(entry(0)) + "\n")
+    path.write_text("x" * (10 * line - 1) + "\n")
+    pmoc.SpanRecorder(log_path=str(path), max_bytes=10 * line).record(entry(1))
+    assert path.read_text() == json.dumps(entry(1)) + "\n"
+    assert (tmp_path / "spans.jsonl.1").read_text().startswith("xxx")
@@ -0,0 +1,7 @@
+import check_startup
+
+
+def test_partida_dentro_do_orcamento():
+    """Importação e primeira renderização em processos novos, sem dependências adiadas"""
+    result = check_startup.measure(runs=1)
+    assert check_startup.budget_failures(result) == [], result
@@ -0,0 +1,47 @@
+import io
+
+import pandas as pd
+
+import pmoc
+
+CSV = """TAG,Local,Setor,Marca,Modelo,BTU,Data Manutenção,Técnico Executante,Aprovação Supervisor,Próxima manutenção,Observações
+1,Matriz,CPD,GREE,X,12.000,2025-03-01,,,,
+2,Matriz,CPD,GREE,X,12000,31/02/2025,,,01/01/2026,
+3,Matriz,CPD,GREE,X,doze mil,01/02/2025,,,,
+4,Matriz,CPD,GREE,X,,,,,,
+"""
+
+
+def read():
+    return pmoc.read_devices_csv(io.StringIO(CSV))
+
+
+def test_btu_aceita_separador_de_milhar():
+    data = read()
+    assert data['BTU'].tolist()[:2] == [12000, 12000]
+    assert pd.isna(data['BTU'].iloc[2])
+
+
+def test_valores_invalidos_voltam_intactos_ao_csv():
+    lines = pmoc.to_csv_text(read()).splitlines()
+    assert lines[1].split(',')[5:7] == ['12000', '2025-03-01']
+    assert lines[2].split(',')[6] == '31/02/2025'
+    assert lines[3].split(',')[5] == 'doze mil'
+    assert 'original' not in lines[0]
+
+
+def test_data_invalida_nao_fica_como_aguardando_programacao():
+    status = pmoc.compute_maintenance_schedule(read())['Situação'].tolist()
+    assert status == [pmoc.STATUS_INVALID, pmoc.STATUS_INVALID, pmoc.STATUS_OVERDUE, pmoc.STATUS_PENDING]
+
+
+def test_texto_original_passa_pela_base_local(store):
+    data = read()
+    store.replace_all(data)
+    assert pmoc.to_csv_text(store.load_frame()) == pmoc.to_csv_text(data)
+
+
+def test_nova_data_substitui_o_texto_invalido():
+    devices = pmoc.DeviceRepository(read())
+    devices.update(1, {'Data Manutenção': pd.Timestamp('2025-03-01')})
+    assert pmoc.to_csv_text(devices.data).splitlines()[1].split(',')[6] == '01/03/2025'